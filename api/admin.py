@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Programs, Clearance, Signature, Student, ClearanceSignature, Notification, StudentClearance
+from .models import Programs, Clearance, Signature, Student, ClearanceSignature, ClearanceProgress, Notification, StudentClearance, BackgroundJob, RevokedToken, Club, ClubDepartment
 
 class CustomUserAdmin(BaseUserAdmin):
     list_display = ('id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser')
@@ -20,3 +20,28 @@ admin.site.register(Programs)
 admin.site.register(Clearance)
 admin.site.register(Signature)
 admin.site.register(Notification)
+
+@admin.register(ClearanceProgress)
+class ClearanceProgressAdmin(admin.ModelAdmin):
+    list_display = ('id', 'student', 'clearance', 'total', 'approved', 'pending', 'rejected', 'completed')
+    list_filter = ('completed', 'clearance')
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'processed', 'total', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('id', 'jti', 'user_id', 'reason', 'expires_at', 'created_by', 'created_at')
+    search_fields = ('jti', 'user__username')
+
+class ClubDepartmentInline(admin.TabularInline):
+    model = ClubDepartment
+    extra = 1
+
+@admin.register(Club)
+class ClubAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'slug', 'program')
+    prepopulated_fields = {'slug': ('name',)}
+    inlines = [ClubDepartmentInline]
@@ -0,0 +1,112 @@
+import time
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .caches import is_token_revoked, user_revocation_cutoff
+from .models import RevokedToken
+
+# User fields copied into every token at login, so requests can be
+# authorised without loading the User.
+USER_CLAIMS = ('username', 'first_name', 'last_name', 'is_staff', 'is_superuser')
+# Changing any of these revokes the user's tokens (api/signals.py).
+PRIVILEGE_FIELDS = ('is_active', 'is_staff', 'is_superuser')
+
+
+def revoke_user_tokens(user, reason='', created_by=None):
+    """Revoke every token issued to `user` so far."""
+    # No token issued before now outlives the longest lifetime.
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    return RevokedToken.objects.create(
+        user=user, expires_at=timezone.now() + lifetime, reason=reason, created_by=created_by,
+    )
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """A refresh token (and the access tokens it issues) carrying USER_CLAIMS."""
+
+    @classmethod
+    def for_user(cls, user):
+        # A token issued in the same second as a revocation of the user
+        # would be revoked too (`iat` is whole seconds), so wait that out.
+        cutoff = user_revocation_cutoff(user.pk)
+        if cutoff is not None and time.time() < cutoff + 1:
+            time.sleep(cutoff + 1 - time.time())
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user built from the token's claims. Anything the claims do not
+    cover (email, relations, a claim missing from a token issued before
+    the claims were added) is read from the real User, loaded on first
+    use as `db_user`.
+    """
+
+    @cached_property
+    def db_user(self):
+        return User.objects.get(pk=self.id)
+
+    def _claim(self, name):
+        if name in self.token:
+            return self.token[name]
+        return getattr(self.db_user, name)
+
+    @cached_property
+    def username(self):
+        return self._claim('username')
+
+    @cached_property
+    def first_name(self):
+        return self._claim('first_name')
+
+    @cached_property
+    def last_name(self):
+        return self._claim('last_name')
+
+    @cached_property
+    def is_staff(self):
+        return self._claim('is_staff')
+
+    @cached_property
+    def is_superuser(self):
+        return self._claim('is_superuser')
+
+    def __getattr__(self, attr):
+        if attr.startswith('_') or attr == 'token':
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.db_user, attr)
+
+
+class DenylistMixin:
+    """Rejects tokens in api.caches.token_denylist, checked in memory."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_token_revoked(token):
+            raise InvalidToken("Token has been revoked.")
+        return token
+
+
+class DenylistJWTAuthentication(DenylistMixin, JWTAuthentication):
+    pass
+
+
+class StatelessJWTAuthentication(DenylistMixin, JWTStatelessUserAuthentication):
+    """
+    JWTAuthentication without the per-request User query: the user is a
+    ClaimsUser (settings.SIMPLE_JWT['TOKEN_USER_CLASS']). Activating,
+    deactivating, promoting or demoting a user revokes the tokens carrying
+    their old claims (api/signals.py).
+    """
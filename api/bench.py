@@ -0,0 +1,481 @@
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, connections, transaction
+
+from .models import Programs, Signature, Student, Clearance, StudentClearance, ClearanceSignature, Notification, Club, department_code
+from .caches import get_club
+from .routers import use_primary
+from .views import club_signatures
+
+YEAR_LEVELS = ('First Year', 'Second Year', 'Third Year', 'Fourth Year')
+DEPARTMENTS = ('BIT', 'BSIT', 'BTVTED-FSM', 'BTLED-AP', 'BTLED-HE', 'BSED', 'BEED')
+PROGRAM_NAMES = (
+    'Club Treasurer', 'SSC Treasurer', 'PTA Treasurer', 'Library', 'Guidance Office',
+    'Registrar', 'Cashier', 'Dean', 'Clinic', 'Laboratory',
+)
+BENCH_PASSWORD = 'bench-password'
+
+# Routes the harness deliberately does not call.
+SKIPPED_ROUTES = {
+    'notifications/<int:user_id>/stream/': "Server-Sent Events stream; it never completes.",
+    'upload-signature/': "Replacing the staff signature cascades to every ClearanceSignature it signed.",
+}
+
+
+@contextmanager
+def scratch_database(verbosity=0, path=None, options=None):
+    """
+    Run the block against a freshly migrated throwaway test database: in
+    memory, or the file at `path`, opened with `options` instead of the
+    configured DATABASES OPTIONS if given.
+    """
+    settings_dict = connection.settings_dict
+    old_name, old_test_name, old_options = settings_dict['NAME'], settings_dict['TEST'].get('NAME'), settings_dict['OPTIONS']
+    settings_dict['TEST']['NAME'] = path
+    if options is not None:
+        settings_dict['OPTIONS'] = options
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        # Any configured replicas are copies of the real database.
+        with use_primary():
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        settings_dict['TEST']['NAME'], settings_dict['OPTIONS'] = old_test_name, old_options
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000
+
+
+def ensure_programs(count):
+    existing = list(Programs.objects.order_by('id')[:count])
+    for name in PROGRAM_NAMES[len(existing):count]:
+        existing.append(Programs.objects.create(program_name=name, status=True))
+    for n in range(len(existing), count):
+        existing.append(Programs.objects.create(program_name=f'Office {n}', status=True))
+    return existing
+
+
+def ensure_clearance(programs, academic_year='2025-2026', semester='First Semester'):
+    clearance = Clearance.objects.filter(academic_year=academic_year, semester=semester).first()
+    if clearance is None:
+        clearance = Clearance.objects.create(academic_year=academic_year, semester=semester)
+        clearance.programs.set(programs)
+    return clearance
+
+
+def ensure_clubs():
+    """Link the Iron and Fuel clubs, which migrations seed before any program exists, to the treasurer."""
+    treasurer = Programs.objects.get(program_name=PROGRAM_NAMES[0])
+    for club in Club.objects.filter(slug__in=['iron-club', 'fuel-club'], program=None):
+        club.program = treasurer
+        club.save()
+
+
+def terms(count):
+    """`count` (academic_year, semester) pairs, oldest first, ending with the default current term."""
+    result = []
+    for back in range(count):
+        year = 2025 - (back + 1) // 2
+        semester = 'First Semester' if back % 2 == 0 else 'Second Semester'
+        result.append((f'{year}-{year + 1}', semester))
+    return result[::-1]
+
+
+def populate(students, programs=8, start=0, batch_size=5000, clearances=1, coverage=1.0, notifications=0):
+    """
+    Bulk-insert synthetic students numbered from `start`. Each gets a
+    StudentClearance on each of `clearances` terms (the last is current)
+    and a ClearanceSignature for `coverage` of the programs, plus
+    `notifications` Notification rows. Bypasses model signals, so derived
+    tables (search index, progress summaries) must be rebuilt afterwards.
+    """
+    program_rows = ensure_programs(programs)
+    clearance_rows = [
+        ensure_clearance(program_rows, academic_year, semester) for academic_year, semester in terms(clearances)
+    ]
+    per_student = max(1, round(coverage * len(program_rows)))
+    statuses = ('Pending', 'Approved', 'Rejected')
+
+    for offset in range(start, start + students, batch_size):
+        numbers = range(offset, min(offset + batch_size, start + students))
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=f'bench{n}@example.com', password='!',
+                    first_name=f'Student {n}', last_name=DEPARTMENTS[n % len(DEPARTMENTS)],
+                )
+                for n in numbers
+            ])
+            Student.objects.bulk_create([
+                Student(
+                    user=user, year_level=YEAR_LEVELS[n % len(YEAR_LEVELS)], major='',
+                    department=department_code(user.last_name),
+                )
+                for n, user in zip(numbers, users)
+            ])
+            for clearance in clearance_rows:
+                student_clearances = StudentClearance.objects.bulk_create([
+                    StudentClearance(student=user, clearance=clearance) for user in users
+                ])
+                ClearanceSignature.objects.bulk_create([
+                    ClearanceSignature(
+                        student=user, clearance=student_clearance,
+                        programs=program_rows[(n + index) % len(program_rows)],
+                        status=statuses[(n + index) % len(statuses)],
+                    )
+                    for n, user, student_clearance in zip(numbers, users, student_clearances)
+                    for index in range(per_student)
+                ], batch_size=batch_size)
+            if notifications:
+                Notification.objects.bulk_create([
+                    Notification(user=user, title=f'Notice {k}', message='Synthetic benchmark notification.')
+                    for user in users for k in range(notifications)
+                ], batch_size=batch_size)
+
+
+def prepare_dataset(students, programs=8, clearances=1, coverage=1.0, notifications=0):
+    """populate() plus the derived tables and the staff account the route benchmark uses."""
+    from . import progress, search
+    populate(students, programs=programs, clearances=clearances, coverage=coverage, notifications=notifications)
+    search.rebuild()
+    progress.rebuild()
+    ensure_clubs()
+    staff = User.objects.create_user(
+        username='bench-staff', password=BENCH_PASSWORD, first_name='Bench', last_name='Staff',
+        is_staff=True, is_superuser=True,
+    )
+    Signature.objects.create(staff=staff, description='Benchmark signature')
+    return staff
+
+
+def club_signature_id(slug):
+    return club_signatures(get_club(slug)).order_by('id').values_list('id', flat=True).first()
+
+
+def route_context(staff, calls):
+    """Ids and tokens the route cases are filled in with, plus `calls` students who have not requested a clearance yet."""
+    from .authentication import ClaimsRefreshToken
+    from .caches import get_current_clearance
+    from .models import BackgroundJob
+    from .utils import clearance_token
+
+    clearance = get_current_clearance()
+    student_clearance = StudentClearance.objects.filter(clearance=clearance).select_related('student').order_by('id').first()
+    student = student_clearance.student
+    signature = ClearanceSignature.objects.filter(clearance=student_clearance).select_related('programs').order_by('id').first()
+    signature.feedback = 'Benchmark feedback'
+    signature.save()
+    refresh = ClaimsRefreshToken.for_user(staff)
+    first = User.objects.filter(username__startswith='bench-newcomer').count()
+    newcomers = User.objects.bulk_create([
+        User(username=f'bench-newcomer{n}', password='!', first_name='Newcomer', last_name=DEPARTMENTS[0])
+        for n in range(first, first + calls)
+    ])
+    Student.objects.bulk_create([
+        Student(user=user, year_level=YEAR_LEVELS[0], major='', department=DEPARTMENTS[0]) for user in newcomers
+    ])
+    return {
+        'clearance_id': clearance.id,
+        'student_clearance_id': student_clearance.id,
+        'user_id': student.id,
+        'student_id': student.id,
+        'first_name': student.first_name,
+        'last_name': student.last_name,
+        'year_level': student.student_profile.year_level,
+        'program_id': signature.programs_id,
+        'program_name': signature.programs.program_name,
+        'signature_id': signature.id,
+        'iron_signature_id': club_signature_id('iron-club'),
+        'fuel_signature_id': club_signature_id('fuel-club'),
+        'staff_id': staff.id,
+        'staff_username': staff.username,
+        'job_id': BackgroundJob.objects.create(kind='open_clearance', params={}).id,
+        'qr_token': clearance_token(student_clearance),
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'newcomer_ids': [user.id for user in newcomers],
+    }
+
+
+def route_cases(ctx):
+    """
+    One request per route in api/urls.py (see SKIPPED_ROUTES), reads
+    first. `data` may be a callable taking the call number, for requests
+    that must differ each time. Creating a clearance changes the current
+    term, so it runs last.
+    """
+    unique = lambda prefix: (lambda n: f'{prefix}{n}')
+    cases = [
+        ('metrics/', 'get', 'metrics/', None),
+        ('programs/', 'get', 'programs/', None),
+        ('user/<int:user_id>/', 'get', 'user/{user_id}/', None),
+        ('signature/<int:staff_id>/', 'get', 'signature/{staff_id}/', None),
+        ('student/<int:user_id>/', 'get', 'student/{user_id}/', None),
+        ('clearances/', 'get', 'clearances/', None),
+        ('jobs/<int:id>/', 'get', 'jobs/{job_id}/', None),
+        ('clearance/latest/', 'get', 'clearance/latest/', None),
+        ('clearances/<int:id>/', 'get', 'clearances/{clearance_id}/', None),
+        ('student-clearance/<int:student_id>/', 'get', 'student-clearance/{student_id}/', None),
+        ('student-clearances/', 'get', 'student-clearances/', None),
+        ('student-clearances/export/', 'get', 'student-clearances/export/', None),
+        ('student-clearances/<int:pk>/qr-code/', 'get', 'student-clearances/{student_clearance_id}/qr-code/', None),
+        ('clearance-qr/verify/', 'get', 'clearance-qr/verify/?token={qr_token}', None),
+        ('students/count/', 'get', 'students/count/', None),
+        ('clearance-progress/', 'get', 'clearance-progress/?clearance_id={clearance_id}', None),
+        ('clearance-signatures/', 'get', 'clearance-signatures/', None),
+        ('clearance-signatures/export/', 'get', 'clearance-signatures/export/', None),
+        ('clearance-signatures/status/<int:clearance_id>/<int:student_id>/<int:program_id>/', 'get',
+         'clearance-signatures/status/{student_clearance_id}/{student_id}/{program_id}/', None),
+        ('clearance-signatures/<str:program_name>/<str:last_name>/<str:year_level>/', 'get',
+         'clearance-signatures/{program_name}/{last_name}/{year_level}/', None),
+        ('feedback/<int:program_id>/<int:user_id>/', 'get', 'feedback/{program_id}/{user_id}/', None),
+        ('notifications/<int:user_id>/', 'get', 'notifications/{user_id}/', None),
+        ('users/by-first-name/<str:first_name>/', 'get', 'users/by-first-name/{first_name}/', None),
+        ('clubs/', 'get', 'clubs/', None),
+        ('clubs/<slug:slug>/signatures/', 'get', 'clubs/fuel-club/signatures/', None),
+        ('clearance/iron-club/', 'get', 'clearance/iron-club/', None),
+        ('clearance/fuel-club/', 'get', 'clearance/fuel-club/', None),
+        ('clearance/<int:id>/', 'get', 'clearance/{clearance_id}/', None),
+
+        ('login/', 'post', 'login/', {'username': ctx['staff_username'], 'password': BENCH_PASSWORD}),
+        ('token/refresh/', 'post', 'token/refresh/', {'refresh': ctx['refresh']}),
+        ('register/', 'post', 'register/', lambda n: {
+            'username': f'bench-new{n}', 'password': 'bench-pass-1', 'first_name': 'New', 'last_name': 'BSIT',
+            'year_level': 'First Year',
+        }),
+        ('students/import/', 'post', 'students/import/', lambda n: [{
+            'username': f'bench-import{n}', 'password': 'bench-pass-1', 'first_name': 'Imported',
+            'last_name': 'BSIT', 'year_level': 'First Year',
+        }]),
+        ('student-clearance/request-latest/', 'post', 'student-clearance/request-latest/',
+         lambda n: {'student_id': ctx['newcomer_ids'][n]}),
+        ('student-clearances/<int:pk>/update-status/', 'patch', 'student-clearances/{student_clearance_id}/update-status/',
+         {'status': 'Pending'}),
+        ('clearance-signatures/create/<int:student_id>/<int:program_id>/', 'multipart',
+         'clearance-signatures/create/{student_id}/{program_id}/', {'status': 'Pending'}),
+        ('clearance-signatures/<int:signature_id>/update-status/', 'patch',
+         'clearance-signatures/{signature_id}/update-status/', {'status': 'Approved', 'staffId': ctx['staff_id']}),
+        ('clearance-signatures/bulk-update-status/', 'post', 'clearance-signatures/bulk-update-status/',
+         {'status': 'Approved', 'staffId': ctx['staff_id'], 'ids': [ctx['signature_id']]}),
+        ('clearance-signatures/update/<int:id>/', 'patch', 'clearance-signatures/update/{signature_id}/',
+         {'feedback': 'Benchmark feedback'}),
+        ('clubs/<slug:slug>/signatures/<int:signature_id>/update-status/', 'patch',
+         'clubs/iron-club/signatures/{iron_signature_id}/update-status/',
+         {'status': 'Approved', 'staffId': ctx['staff_id']}),
+        ('clearance/iron-club/<int:signature_id>/update-status/', 'patch',
+         'clearance/iron-club/{iron_signature_id}/update-status/', {'status': 'Approved', 'staffId': ctx['staff_id']}),
+        ('clearance/fuel-club/<int:signature_id>/update-status/', 'patch',
+         'clearance/fuel-club/{fuel_signature_id}/update-status/', {'status': 'Approved', 'staffId': ctx['staff_id']}),
+        ('notifications/<int:user_id>/', 'post', 'notifications/{user_id}/', {'title': 'Bench', 'message': 'Hello'}),
+        ('tokens/revoke/', 'post', 'tokens/revoke/', {'user': ctx['user_id'], 'reason': 'Benchmark'}),
+        ('notifications/broadcast/', 'post', 'notifications/broadcast/',
+         {'title': 'Bench', 'message': 'Hello', 'department': ctx['last_name']}),
+        ('clearances/<int:id>/open/', 'post', 'clearances/{clearance_id}/open/', {'year_level': ctx['year_level']}),
+        ('clearances/create/', 'post', 'clearances/create/', lambda n: {
+            'academic_year': f'bench-{n}', 'semester': 'First Semester',
+        }),
+    ]
+    return [
+        {'pattern': pattern, 'method': method, 'path': '/api/' + path.format(**ctx), 'data': data}
+        for pattern, method, path, data in cases
+    ]
+
+
+def uncovered_routes(cases):
+    from .urls import urlpatterns
+    covered = {case['pattern'] for case in cases} | set(SKIPPED_ROUTES)
+    return [str(pattern.pattern) for pattern in urlpatterns if str(pattern.pattern) not in covered]
+
+
+def call_route(client, case, n, headers):
+    data = case['data'](n) if callable(case['data']) else case['data']
+    if case['method'] == 'get':
+        response = client.get(case['path'], headers=headers)
+    elif case['method'] == 'multipart':
+        response = client.post(case['path'], data or {}, headers=headers)
+    else:
+        response = getattr(client, case['method'])(case['path'], data, content_type='application/json', headers=headers)
+    if getattr(response, 'streaming', False):
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure_route(client, case, repeat, headers):
+    """First call: status and query count. Then `repeat` timed calls, then one under tracemalloc."""
+    import tracemalloc
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        response = call_route(client, case, 0, headers)
+    # Counted now: every request clears the connection's query log.
+    query_count = len(queries)
+    samples = []
+    for n in range(1, repeat + 1):
+        started = time.perf_counter()
+        call_route(client, case, n, headers)
+        samples.append(time.perf_counter() - started)
+    tracemalloc.start()
+    call_route(client, case, repeat + 1, headers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'method': case['method'].upper() if case['method'] != 'multipart' else 'POST',
+        'status': response.status_code,
+        'queries': query_count,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_route_benchmark(staff, repeat=20, patterns=None, methods=None):
+    from django.test import Client
+
+    ctx = route_context(staff, repeat + 2)
+    cases = route_cases(ctx)
+    missing = uncovered_routes(cases)
+    if missing:
+        raise ValueError(f"No benchmark case for: {', '.join(missing)}")
+    if patterns:
+        cases = [case for case in cases if case['pattern'] in patterns]
+    if methods:
+        cases = [case for case in cases if case['method'] in methods]
+    client = Client()
+    headers = {'Authorization': f"Bearer {ctx['access']}"}
+    results = {}
+    for case in cases:
+        result = measure_route(client, case, repeat, headers)
+        results[f"{result['method']} {case['pattern']}"] = result
+    return results
+
+
+# Connection settings bench_writes compares. "stock" is what Django does
+# without OPTIONS: rollback journal, 5 s busy timeout, deferred transactions.
+def tuned_options():
+    options = dict(settings.DATABASES['default']['OPTIONS'])
+    if 'journal_mode' not in options.get('init_command', ''):
+        # The scratch file may use WAL even where the configured database
+        # does not (settings.SQLITE_JOURNAL_MODE).
+        options['init_command'] = ';'.join(filter(None, ['PRAGMA journal_mode=WAL', options.get('init_command')]))
+    return options
+
+
+SQLITE_PROFILES = {
+    'stock': lambda: {'init_command': 'PRAGMA journal_mode=DELETE'},
+    'tuned': tuned_options,
+}
+
+
+def contention_worker(signature_ids, writes, start_at):
+    """
+    Approve or reopen signatures the way the status views do: read, save,
+    notify, in one transaction. Runs in a forked process.
+    """
+    connections.close_all()
+    time.sleep(max(0.0, start_at - time.time()))
+    latencies, errors = [], 0
+    for n in range(writes):
+        signature_id = signature_ids[n % len(signature_ids)]
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                signature = ClearanceSignature.objects.get(id=signature_id)
+                signature.status = 'Approved' if signature.status != 'Approved' else 'Pending'
+                signature.save(update_fields=['status'])
+                Notification.objects.create(
+                    user_id=signature.student_id, title='Clearance updated',
+                    message=f'Your signature is now {signature.status}.',
+                )
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+    finished = time.time()
+    connections.close_all()
+    return latencies, errors, finished
+
+
+def run_write_contention(profile, processes=4, writes=100, students=200):
+    """
+    Run `processes` forked writers against one SQLite file opened with a
+    SQLITE_PROFILES entry; each makes `writes` transactions.
+    """
+    with tempfile.TemporaryDirectory() as directory, scratch_database(
+        path=os.path.join(directory, 'contention.sqlite3'), options=SQLITE_PROFILES[profile](),
+    ):
+        populate(students, programs=4)
+        ids = list(ClearanceSignature.objects.order_by('id').values_list('id', flat=True))
+        # Forked children must not share the parent's open connection.
+        connection.close()
+        start_at = time.time() + 0.5
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            results = pool.starmap(contention_worker, [
+                (ids[worker::processes], writes, start_at) for worker in range(processes)
+            ])
+
+    latencies = [seconds for worker_latencies, _, _ in results for seconds in worker_latencies]
+    wall = max(finished for _, _, finished in results) - start_at
+    summary = {
+        'profile': profile,
+        'processes': processes,
+        'attempted': processes * writes,
+        'committed': len(latencies),
+        'locked': sum(errors for _, errors, _ in results),
+        'seconds': round(wall, 3),
+        'writes_per_second': round(len(latencies) / wall, 1) if wall else None,
+    }
+    for pct in (50, 95, 99):
+        summary[f'p{pct}_ms'] = round(percentile(latencies, pct) * 1000, 2) if latencies else None
+    return summary
+
+
+# Cheap token-authenticated reads, where the User query is a large share
+# of the request. Reads only, so both modes see the same data.
+AUTH_BENCH_ROUTES = (
+    'programs/', 'clearance/latest/', 'students/count/', 'notifications/<int:user_id>/',
+    'student-clearance/<int:student_id>/', 'jobs/<int:id>/', 'clearance-progress/',
+)
+
+
+def run_auth_benchmark(staff, repeat=50, patterns=AUTH_BENCH_ROUTES):
+    """run_route_benchmark once per JWT authentication class, keyed 'database' and 'stateless'."""
+    from rest_framework.views import APIView
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from .authentication import StatelessJWTAuthentication
+
+    results = {}
+    default_classes = APIView.authentication_classes
+    try:
+        for mode, auth_class in (('database', JWTAuthentication), ('stateless', StatelessJWTAuthentication)):
+            APIView.authentication_classes = [auth_class]
+            results[mode] = run_route_benchmark(staff, repeat=repeat, patterns=patterns, methods=['get'])
+    finally:
+        APIView.authentication_classes = default_classes
+    return results
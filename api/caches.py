@@ -0,0 +1,187 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import registry
+from .models import Clearance, Club, RevokedToken, Signature
+from .routers import use_primary
+
+
+class VersionedCache:
+    """
+    Process-local copy of a value, validated against a version token kept in
+    the shared Django cache.
+
+    Readers pay one cache lookup and no database query while the token is
+    unchanged. `invalidate()` swaps the token, so every worker sharing the
+    cache backend reloads on its next read. The token expires after
+    `version_timeout` seconds, which bounds staleness when the cache backend
+    is not shared between workers (e.g. the default local-memory cache).
+
+    Reads are counted in api.metrics.registry as hits (served without
+    `load()`) and misses, exported as api_cache_reads_total.
+    """
+    version_timeout = 60
+    shared_timeout = 300
+
+    def __init__(self, name):
+        self.name = name
+        self.version_key = f'api:{name}:version'
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def get(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, self.version_timeout)
+            version = cache.get(self.version_key)
+        with self._lock:
+            cached = version is not None and version == self._version
+            value = self._value
+        if cached:
+            registry.record_cache_read(self.name, hit=True)
+            return value
+
+        value_key = f'api:{self.name}:{version}'
+        value = cache.get(value_key)
+        loaded = value is None
+        if loaded:
+            # From the primary: a lagging replica would be cached under
+            # the token that invalidate() just issued.
+            with use_primary():
+                value = self.load()
+            cache.set(value_key, value, self.shared_timeout)
+        with self._lock:
+            self._version, self._value = version, value
+        registry.record_cache_read(self.name, hit=not loaded)
+        return value
+
+    def invalidate(self):
+        self._reset()
+        # Again after commit, so a reader racing the writing transaction
+        # cannot cache the pre-commit state under the new token.
+        transaction.on_commit(self._reset)
+
+    def _reset(self):
+        cache.set(self.version_key, uuid.uuid4().hex, self.version_timeout)
+        with self._lock:
+            self._version, self._value = None, None
+
+
+class CurrentClearanceCache(VersionedCache):
+    """
+    The most recently created Clearance plus every Clearance sharing its
+    academic year and semester, with programs prefetched, keyed by id.
+    """
+
+    def load(self):
+        latest = Clearance.objects.order_by('-created_at').first()
+        if latest is None:
+            return {'current': None, 'siblings': {}}
+        siblings = Clearance.objects.filter(
+            academic_year=latest.academic_year,
+            semester=latest.semester,
+        ).prefetch_related('programs')
+        siblings = {clearance.id: clearance for clearance in siblings}
+        return {'current': siblings.get(latest.id, latest), 'siblings': siblings}
+
+
+current_clearance = CurrentClearanceCache('current-clearance')
+
+
+def get_current_clearance():
+    return current_clearance.get()['current']
+
+
+def get_current_clearance_siblings():
+    return current_clearance.get()['siblings']
+
+
+class StaffSignatureCache(VersionedCache):
+    """
+    Staff user id -> Signature. Staff are few and approve many rows in a
+    row, so the whole table is held; a staff member with several rows gets
+    the newest, as SignatureSerializer only keeps one.
+    """
+
+    def load(self):
+        return {signature.staff_id: signature for signature in Signature.objects.order_by('id')}
+
+
+staff_signatures = StaffSignatureCache('staff-signatures')
+
+
+def get_staff_signature(staff_id):
+    """Like Signature.objects.get(staff_id=...), served from staff_signatures."""
+    try:
+        signature = staff_signatures.get().get(int(staff_id))
+    except (TypeError, ValueError):
+        signature = None
+    if signature is None:
+        raise Signature.DoesNotExist(f"No signature for staff {staff_id}.")
+    return signature
+
+
+class ClubCache(VersionedCache):
+    """Club slug -> Club with its departments prefetched."""
+
+    def load(self):
+        return {club.slug: club for club in Club.objects.prefetch_related('departments').order_by('name')}
+
+
+clubs = ClubCache('clubs')
+
+
+def get_club(slug):
+    club = clubs.get().get(slug)
+    if club is None:
+        raise Club.DoesNotExist(f"No club {slug!r}.")
+    return club
+
+
+class TokenDenylistCache(VersionedCache):
+    """
+    Unexpired RevokedToken rows as a set of jtis plus user id -> cutoff
+    (whole epoch seconds; tokens issued before it are revoked). Every
+    authenticated request checks it, so it stays in process memory and
+    costs one version lookup in the shared cache, not a query.
+    """
+
+    def load(self):
+        jtis, users = set(), {}
+        for jti, user_id, created_at in RevokedToken.objects.filter(
+            expires_at__gt=timezone.now(),
+        ).values_list('jti', 'user_id', 'created_at'):
+            if jti:
+                jtis.add(jti)
+            else:
+                # `iat` has whole-second resolution, so every token issued
+                # in the revocation's own second is revoked with it; see
+                # ClaimsRefreshToken.for_user for logins in that second.
+                users[user_id] = max(users.get(user_id, 0), int(created_at.timestamp()))
+        return {'jtis': frozenset(jtis), 'users': users}
+
+
+token_denylist = TokenDenylistCache('token-denylist')
+
+
+def is_token_revoked(token):
+    """True if the validated simplejwt `token`, or every token of its user issued by then, was revoked."""
+    from rest_framework_simplejwt.settings import api_settings
+    denylist = token_denylist.get()
+    if token.get(api_settings.JTI_CLAIM) in denylist['jtis']:
+        return True
+    cutoff = denylist['users'].get(token.get(api_settings.USER_ID_CLAIM))
+    return cutoff is not None and token.get('iat', 0) <= cutoff
+
+
+def user_revocation_cutoff(user_id):
+    """Epoch second up to which every token issued to `user_id` is revoked, or None."""
+    return token_denylist.get()['users'].get(user_id)
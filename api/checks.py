@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .events import broker_class
+
+
+@register()
+def check_event_broker(app_configs, **kwargs):
+    # Writes happen in WSGI workers while streams are held by the ASGI
+    # process, so a broker confined to one process never delivers them.
+    if not getattr(settings, 'NOTIFICATION_STREAM', False) or broker_class().reaches_other_processes():
+        return []
+    return [Error(
+        f'NOTIFICATION_STREAM is on but EVENT_BROKER ({settings.EVENT_BROKER}) cannot reach other processes.',
+        hint=(
+            "Use 'api.events.CacheBroker' with a Redis or Memcached CACHE_BACKEND shared by all "
+            "workers; other backends cannot allocate event sequence numbers atomically. If one ASGI "
+            "process serves every request, silence api.E001."
+        ),
+        id='api.E001',
+    )]
@@ -0,0 +1,82 @@
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .caches import current_clearance, get_current_clearance, get_staff_signature, staff_signatures
+from .models import Programs, Signature, Clearance
+
+# Validators for conditional GET. Everything is read from the database
+# (Clearance.updated_at, Programs/Signature.version), never from the
+# VersionedCache copies in api/caches.py: with the default local-memory
+# cache their version token is per process, so another worker's copy can
+# lag a write by up to a minute. Reading the database keeps every worker's
+# ETag for the same data identical. The query string is part of the ETag
+# because ?fields=/?expand=/?cursor= change the representation.
+
+
+def make_etag(request, *parts):
+    digest = hashlib.md5(repr((request.get_full_path(),) + parts).encode(), usedforsecurity=False)
+    return digest.hexdigest()
+
+
+def programs_etag(request, *args, **kwargs):
+    state = Programs.objects.aggregate(count=Count('id'), ids=Sum('id'), versions=Sum('version'))
+    return make_etag(request, state['count'], state['ids'], state['versions'])
+
+
+def clearance_list_etag(request, *args, **kwargs):
+    # Clearance.updated_at is bumped whenever its programs change (see signals).
+    state = Clearance.objects.aggregate(count=Count('id'), ids=Sum('id'), updated=Max('updated_at'))
+    return make_etag(request, state['count'], state['ids'], state['updated'])
+
+
+def clearance_updated_at(request, id, *args, **kwargs):
+    return Clearance.objects.filter(id=id).values_list('updated_at', flat=True).first()
+
+
+def clearance_etag(request, id, *args, **kwargs):
+    updated_at = clearance_updated_at(request, id)
+    return make_etag(request, id, updated_at) if updated_at else None
+
+
+def latest_clearance_state(request):
+    # (id, updated_at) of the newest Clearance: one read on
+    # clearance_created_idx, shared by the ETag and Last-Modified.
+    if not hasattr(request, '_latest_clearance_state'):
+        state = Clearance.objects.order_by('-created_at').values_list('id', 'updated_at').first()
+        cached = get_current_clearance()
+        if state != ((cached.id, cached.updated_at) if cached else None):
+            # The view answers from this process's copy; reload it so the
+            # body matches the validator.
+            current_clearance.invalidate()
+        request._latest_clearance_state = state
+    return request._latest_clearance_state
+
+
+def latest_clearance_updated_at(request, *args, **kwargs):
+    state = latest_clearance_state(request)
+    return state[1] if state else None
+
+
+def latest_clearance_etag(request, *args, **kwargs):
+    state = latest_clearance_state(request)
+    return make_etag(request, *state) if state else None
+
+
+def signature_etag(request, staff_id, *args, **kwargs):
+    # The newest row, as StaffSignatureCache keeps per staff member.
+    state = Signature.objects.filter(staff_id=staff_id).order_by('-id').values_list('id', 'version').first()
+    try:
+        cached = get_staff_signature(staff_id)
+    except Signature.DoesNotExist:
+        cached = None
+    if state != ((cached.id, cached.version) if cached else None):
+        staff_signatures.invalidate()
+    return make_etag(request, staff_id, state) if state else None
+
+
+def conditional_get(etag_func=None, last_modified_func=None):
+    """Class decorator: answer GET with 304 when the validators still match."""
+    return method_decorator(condition(etag_func=etag_func, last_modified_func=last_modified_func), name='get')
@@ -0,0 +1,173 @@
+import asyncio
+import collections
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.memcached import PyLibMCCache, PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Events are dicts: {'type': ..., 'data': {...}} plus an 'id' for
+# notifications, which clients send back as Last-Event-ID to catch up.
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class InMemoryBroker:
+    """
+    Pub/sub inside one process: every subscription owns an asyncio.Queue.
+    publish() is safe to call from sync code on any thread (sync views run
+    in a thread pool under ASGI). A subscription that falls `max_queue`
+    events behind loses the overflow; clients catch up from
+    notifications/<user_id>/.
+    """
+    max_queue = 100
+
+    @classmethod
+    def reaches_other_processes(cls):
+        return False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = collections.defaultdict(set)
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+    def subscribe(self, channel):
+        """Start receiving `channel`'s events; call from the event loop that will read them."""
+        subscription = self.Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    async def asubscribe(self, channel):
+        return self.subscribe(channel)
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    class Subscription:
+        def __init__(self, broker, channel):
+            self.broker = broker
+            self.channel = channel
+            self.loop = asyncio.get_running_loop()
+            self.queue = asyncio.Queue(broker.max_queue)
+
+        def offer(self, event):
+            if not self.queue.full():
+                self.queue.put_nowait(event)
+
+        async def get(self, timeout):
+            """The next event, or None if none arrives within `timeout` seconds."""
+            try:
+                return await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        def close(self):
+            self.broker._unsubscribe(self)
+
+
+class CacheBroker:
+    """
+    Pub/sub through the Django cache, for deployments where the process
+    that publishes (e.g. a WSGI worker) is not the one streaming. Each
+    channel is a sequence counter plus one key per event, and
+    subscriptions poll every `poll_interval` seconds. Needs Redis or
+    Memcached: the other backends' incr() is a read-modify-write, so
+    publishers in different workers could draw the same sequence number
+    and overwrite each other's event.
+    """
+    poll_interval = 0.5
+    event_timeout = 60
+    atomic_backends = (RedisCache, PyMemcacheCache, PyLibMCCache)
+
+    @classmethod
+    def reaches_other_processes(cls):
+        return isinstance(caches[DEFAULT_CACHE_ALIAS], cls.atomic_backends)
+
+    @staticmethod
+    def key(channel, suffix):
+        return f'api:events:{channel}:{suffix}'
+
+    def publish(self, channel, event):
+        sequence_key = self.key(channel, 'seq')
+        cache.add(sequence_key, 0, None)
+        sequence = cache.incr(sequence_key)
+        cache.set(self.key(channel, sequence), event, self.event_timeout)
+
+    def subscribe(self, channel):
+        return self.Subscription(self, channel, cache.get(self.key(channel, 'seq'), 0))
+
+    async def asubscribe(self, channel):
+        return self.Subscription(self, channel, await cache.aget(self.key(channel, 'seq'), 0))
+
+    class Subscription:
+        def __init__(self, broker, channel, seen):
+            self.broker = broker
+            self.channel = channel
+            self.sequence_key = broker.key(channel, 'seq')
+            self.seen = seen
+            self.pending = collections.deque()
+
+        async def get(self, timeout):
+            deadline = time.monotonic() + timeout
+            while not self.pending:
+                if time.monotonic() >= deadline:
+                    return None
+                await asyncio.sleep(self.broker.poll_interval)
+                latest = await cache.aget(self.sequence_key, 0)
+                if latest > self.seen:
+                    keys = [self.broker.key(self.channel, n) for n in range(self.seen + 1, latest + 1)]
+                    events = await cache.aget_many(keys)
+                    self.pending.extend(events[key] for key in keys if key in events)
+                    self.seen = latest
+            return self.pending.popleft()
+
+        def close(self):
+            pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker_class():
+    return import_string(getattr(settings, 'EVENT_BROKER', 'api.events.CacheBroker'))
+
+
+def get_broker():
+    """The broker named by settings.EVENT_BROKER (a dotted path), created once per process."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = broker_class()()
+        return _broker
+
+
+def publish_on_commit(channel, event):
+    # Subscribers may query for what the event announces, so only tell
+    # them once it is committed.
+    transaction.on_commit(lambda: get_broker().publish(channel, event))
+
+
+def format_sse(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.extend(f'data: {line}' for line in data.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
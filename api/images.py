@@ -0,0 +1,74 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import ClearanceSignature
+from .storage import release
+from .tasks import run_in_background
+
+RECEIPT_MAX_DIMENSION = 1600
+THUMBNAIL_MAX_DIMENSION = 320
+JPEG_QUALITY = 82
+
+
+def encode_jpeg(image, max_dimension):
+    image = image.copy()
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    buffer = BytesIO()
+    # Saving without exif=/icc_profile= drops the metadata (GPS, device info).
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def flatten(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def process_receipt(signature_id, name):
+    """
+    Replace an uploaded receipt with an upright, metadata-free, downscaled
+    JPEG and store a review-size thumbnail next to it.
+    """
+    field = ClearanceSignature._meta.get_field('receipt')
+    storage = field.storage
+    try:
+        with storage.open(name, 'rb') as original:
+            image = Image.open(original)
+            image.load()
+    except (FileNotFoundError, UnidentifiedImageError, OSError):
+        return None
+
+    image = flatten(image)
+    stem = os.path.splitext(os.path.basename(name))[0]
+    receipt_name = storage.save(f'receipts/{stem}.jpg', ContentFile(encode_jpeg(image, RECEIPT_MAX_DIMENSION)))
+    thumbnail_name = storage.save(
+        f'receipts/thumbs/{stem}.jpg', ContentFile(encode_jpeg(image, THUMBNAIL_MAX_DIMENSION)),
+    )
+
+    # Only swap files if the row still points at the upload we processed.
+    updated = ClearanceSignature.objects.filter(pk=signature_id, receipt=name).update(
+        receipt=receipt_name, receipt_thumbnail=thumbnail_name,
+    )
+    if not updated:
+        release(receipt_name)
+        release(thumbnail_name)
+        return None
+    if receipt_name != name:
+        release(name)
+    return receipt_name
+
+
+def schedule_receipt_processing(clearance_signature):
+    if not clearance_signature.receipt:
+        return
+    signature_id, name = clearance_signature.pk, clearance_signature.receipt.name
+    transaction.on_commit(lambda: run_in_background(process_receipt, signature_id, name))
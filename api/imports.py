@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .models import Student, department_code
+from .serializers import StudentImportRowSerializer
+from .utils import hash_passwords
+
+IMPORT_FORMATS = ('csv', 'json')
+IMPORT_CHUNK_SIZE = 500
+
+
+def parse_rows(data, input_format):
+    """Rows from CSV text (with a header line) or a JSON list of objects."""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if input_format == 'csv':
+        return list(csv.DictReader(io.StringIO(data)))
+    rows = json.loads(data)
+    if isinstance(rows, dict):
+        rows = rows.get('rows')
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON list of rows.")
+    return rows
+
+
+def validate_rows(rows):
+    """
+    One pass over the file: field validation per row, then a single query
+    for usernames that already exist. Returns (valid rows as (row number,
+    data) pairs, errors).
+    """
+    valid, errors, seen = [], [], set()
+    for number, row in enumerate(rows, start=1):
+        serializer = StudentImportRowSerializer(data=row if isinstance(row, dict) else {})
+        if not serializer.is_valid():
+            errors.append({"row": number, "errors": serializer.errors})
+        elif serializer.validated_data['username'] in seen:
+            errors.append({"row": number, "errors": {"username": ["Duplicated in this file."]}})
+        else:
+            seen.add(serializer.validated_data['username'])
+            valid.append((number, serializer.validated_data))
+
+    taken = set()
+    usernames = [data['username'] for _, data in valid]
+    for start in range(0, len(usernames), IMPORT_CHUNK_SIZE):
+        taken.update(User.objects.filter(username__in=usernames[start:start + IMPORT_CHUNK_SIZE])
+                     .values_list('username', flat=True))
+    if taken:
+        errors.extend(
+            {"row": number, "errors": {"username": ["A user with that username already exists."]}}
+            for number, data in valid if data['username'] in taken
+        )
+        valid = [(number, data) for number, data in valid if data['username'] not in taken]
+    errors.sort(key=lambda error: error["row"])
+    return valid, errors
+
+
+def _create_chunk(chunk):
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=data['username'], email=data['email'], password=password,
+                first_name=data['first_name'], last_name=data['last_name'],
+            )
+            for _, data, password in chunk
+        ])
+        Student.objects.bulk_create([
+            Student(
+                user=user, year_level=data['year_level'], major=data['major'],
+                department=department_code(data['last_name']),
+            )
+            for user, (_, data, _) in zip(users, chunk)
+        ])
+
+
+def insert_rows(pending, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Insert (row number, data, password hash) triples a chunk at a time.
+    Returns (created count, errors for usernames taken since validation).
+    """
+    created, errors = 0, []
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        try:
+            _create_chunk(chunk)
+            created += len(chunk)
+        except IntegrityError:
+            # Someone registered one of these usernames since validation;
+            # retry the chunk row by row so only the clash is reported.
+            for row in chunk:
+                try:
+                    _create_chunk([row])
+                    created += 1
+                except IntegrityError:
+                    errors.append({"row": row[0], "errors": {"username": ["A user with that username already exists."]}})
+    return created, errors
+
+
+def import_students(rows, workers=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """
+    Create a User and Student for every valid row. Passwords are hashed in
+    a process pool, then rows are inserted with bulk_create, one
+    transaction per chunk. Returns a report with per-row errors and
+    throughput. For the import_students command; the API queues an
+    'import_students' job (api/jobs.py) instead.
+    """
+    started = time.perf_counter()
+    valid, errors = validate_rows(rows)
+    validated = time.perf_counter()
+
+    created = 0
+    if valid and not dry_run:
+        passwords = hash_passwords([data['password'] for _, data in valid], workers=workers)
+        hashed = time.perf_counter()
+        pending = [(number, data, password) for (number, data), password in zip(valid, passwords)]
+        created, clashes = insert_rows(pending, chunk_size)
+        errors = sorted(errors + clashes, key=lambda error: error["row"])
+    else:
+        hashed = validated
+
+    finished = time.perf_counter()
+    elapsed = finished - started
+    return {
+        "rows": len(rows),
+        "valid": len(valid),
+        "created": created,
+        "failed": len(errors),
+        "dry_run": dry_run,
+        "seconds": {
+            "validate": round(validated - started, 3),
+            "hash": round(hashed - validated, 3),
+            "insert": round(finished - hashed, 3),
+            "total": round(elapsed, 3),
+        },
+        "rows_per_second": round(created / elapsed, 1) if created and elapsed else 0,
+        "errors": errors,
+    }
@@ -0,0 +1,270 @@
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import progress, search
+from .caches import get_current_clearance_siblings
+from .imports import insert_rows
+from .models import BackgroundJob, Clearance, ClearanceSignature, Notification, Student, StudentClearance, department_code
+from .signals import StatusChange, clearance_signatures_changed, push_notifications
+from .tasks import run_in_background
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+JOB_CHUNK_SIZE = 500
+
+
+def job_handler(kind):
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def create_job(kind, params, user=None, payload=None, result=None):
+    return BackgroundJob.objects.create(
+        kind=kind, params=params, payload=payload or {}, result=result or {},
+        # request.user may be a token-backed ClaimsUser, not a User.
+        created_by_id=user.id if user is not None and user.is_authenticated else None,
+    )
+
+
+def start_job(kind, params, user=None, payload=None, result=None):
+    """Record a job and run it on the background pool once the caller's transaction commits."""
+    job = create_job(kind, params, user=user, payload=payload, result=result)
+    transaction.on_commit(lambda: run_in_background(run_job, job.id))
+    return job
+
+
+def start_import(rows, params, user=None, result=None):
+    """
+    Queue an 'import_students' job for the (row number, data) pairs
+    api.imports.validate_rows accepted. The passwords are hashed on the
+    background pool before the rows are stored, so neither the request
+    nor the job's payload ever holds them in plaintext.
+    """
+    job = create_job('import_students', params, user=user, result=result)
+    transaction.on_commit(lambda: run_in_background(store_import_rows, job.id, rows))
+    return job
+
+
+def store_import_rows(job_id, rows):
+    stored = []
+    for number, data in rows:
+        data = dict(data)
+        data['password_hash'] = make_password(data.pop('password'))
+        stored.append([number, data])
+    BackgroundJob.objects.filter(id=job_id).update(payload={'rows': stored}, updated_at=timezone.now())
+    return run_job(job_id)
+
+
+def run_job(job_id, resume=False):
+    """
+    Run a job from its cursor. A job is only claimed from Pending, unless
+    `resume` is set, which also takes over Running (e.g. the process died)
+    and Failed jobs.
+    """
+    statuses = [BackgroundJob.PENDING]
+    if resume:
+        statuses += [BackgroundJob.RUNNING, BackgroundJob.FAILED]
+    claimed = BackgroundJob.objects.filter(id=job_id, status__in=statuses).update(
+        status=BackgroundJob.RUNNING, error='', updated_at=timezone.now(),
+    )
+    if not claimed:
+        return None
+
+    job = BackgroundJob.objects.get(id=job_id)
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception as exc:
+        logger.exception("Background job %s failed", job_id)
+        BackgroundJob.objects.filter(id=job_id).update(
+            status=BackgroundJob.FAILED, error=f"{type(exc).__name__}: {exc}", updated_at=timezone.now(),
+        )
+    else:
+        BackgroundJob.objects.filter(id=job_id).update(
+            status=BackgroundJob.COMPLETED, finished_at=timezone.now(), updated_at=timezone.now(),
+        )
+    job.refresh_from_db()
+    return job
+
+
+def set_total(job, total):
+    if job.cursor == 0 and not job.total:
+        job.total = total
+        BackgroundJob.objects.filter(id=job.id).update(total=total)
+
+
+def advance(job, cursor, count):
+    # Called inside the chunk's transaction, so the cursor only moves
+    # forward together with the rows it accounts for.
+    job.cursor = cursor
+    job.processed += count
+    BackgroundJob.objects.filter(id=job.id).update(
+        cursor=cursor, processed=F('processed') + count, updated_at=timezone.now(),
+    )
+
+
+def pause(job):
+    # Spreads the writes out so the job never monopolises the database.
+    seconds = job.params.get('pause', getattr(settings, 'BACKGROUND_JOB_PAUSE', 0))
+    if seconds:
+        time.sleep(seconds)
+
+
+def eligible_students(params):
+    students = Student.objects.filter(user__is_active=True)
+    if params.get('year_level'):
+        students = students.filter(year_level=params['year_level'])
+    if params.get('major'):
+        students = students.filter(major=params['major'])
+    if params.get('department'):
+        students = students.filter(department=department_code(params['department']))
+    return students
+
+
+def open_clearance_chunk(clearance_id, program_ids, student_ids):
+    """
+    Create the StudentClearance and pending ClearanceSignature rows that
+    the given students are still missing for one clearance. bulk_create
+    sends no post_save, so the progress summaries and the search index are
+    updated here explicitly.
+    """
+    existing = dict(
+        StudentClearance.objects.filter(clearance_id=clearance_id, student_id__in=student_ids)
+        .values_list('student_id', 'id')
+    )
+    created = StudentClearance.objects.bulk_create([
+        StudentClearance(student_id=student_id, clearance_id=clearance_id)
+        for student_id in student_ids if student_id not in existing
+    ])
+    progress.create_for(created)
+
+    student_clearances = {**existing, **{sc.student_id: sc.id for sc in created}}
+    have = set(
+        ClearanceSignature.objects.filter(clearance_id__in=student_clearances.values())
+        .values_list('clearance_id', 'programs_id')
+    )
+    signatures = ClearanceSignature.objects.bulk_create([
+        ClearanceSignature(student_id=student_id, clearance_id=sc_id, programs_id=program_id, status='Pending')
+        for student_id, sc_id in student_clearances.items()
+        for program_id in program_ids if (sc_id, program_id) not in have
+    ], batch_size=JOB_CHUNK_SIZE)
+
+    clearance_signatures_changed.send(sender=ClearanceSignature, changes=[
+        StatusChange(signature.id, signature.student_id, signature.clearance_id, None, signature.status)
+        for signature in signatures
+    ])
+    search.index_signatures([signature.id for signature in signatures])
+    return len(created), len(signatures)
+
+
+@job_handler('open_clearance')
+def open_clearance(job):
+    """Pre-create StudentClearance and pending signatures for a cohort, by ascending user id."""
+    params = job.params
+    clearance = Clearance.objects.get(id=params['clearance_id'])
+    program_ids = list(clearance.programs.values_list('id', flat=True))
+    students = eligible_students(params)
+    set_total(job, students.count())
+    chunk_size = params.get('chunk_size') or JOB_CHUNK_SIZE
+
+    while True:
+        student_ids = list(
+            students.filter(user_id__gt=job.cursor).order_by('user_id').values_list('user_id', flat=True)[:chunk_size]
+        )
+        if not student_ids:
+            break
+        with transaction.atomic():
+            open_clearance_chunk(clearance.id, program_ids, student_ids)
+            advance(job, student_ids[-1], len(student_ids))
+        pause(job)
+
+
+def notification_recipients(params):
+    """Active students matching a BroadcastNotificationSerializer's filters."""
+    users = User.objects.filter(is_active=True, student_profile__isnull=False)
+    if params.get('department'):
+        users = users.filter(student_profile__department=department_code(params['department']))
+    if params.get('year_level'):
+        users = users.filter(student_profile__year_level=params['year_level'])
+    if params.get('major'):
+        users = users.filter(student_profile__major=params['major'])
+
+    if params.get('program_id') or params.get('clearance_status'):
+        if params.get('clearance_id'):
+            clearance_ids = [params['clearance_id']]
+        else:
+            clearance_ids = list(get_current_clearance_siblings())
+        if params.get('program_id'):
+            # Status of the student's signature for that program.
+            signatures = ClearanceSignature.objects.filter(
+                programs_id=params['program_id'], clearance__clearance_id__in=clearance_ids,
+            )
+            if params.get('clearance_status'):
+                signatures = signatures.filter(status=params['clearance_status'])
+            users = users.filter(id__in=signatures.values('student_id'))
+        else:
+            student_clearances = StudentClearance.objects.filter(
+                clearance_id__in=clearance_ids, status=params['clearance_status'],
+            )
+            users = users.filter(id__in=student_clearances.values('student_id'))
+    return users
+
+
+@job_handler('broadcast_notification')
+def broadcast_notification(job):
+    """One Notification per recipient, inserted a chunk at a time by ascending user id."""
+    params = job.params
+    recipients = notification_recipients(params)
+    set_total(job, recipients.count())
+    chunk_size = params.get('chunk_size') or JOB_CHUNK_SIZE
+
+    while True:
+        user_ids = list(recipients.filter(id__gt=job.cursor).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not user_ids:
+            break
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(user_id=user_id, title=params['title'], message=params['message'])
+                for user_id in user_ids
+            ])
+            push_notifications(notifications)
+            advance(job, user_ids[-1], len(user_ids))
+        pause(job)
+
+
+@job_handler('import_students')
+def import_students(job):
+    """
+    Register the rows stored by store_import_rows in job.payload['rows']
+    as [row number, data] pairs, data carrying a `password_hash`. The
+    payload is dropped once every row is in; a failed job keeps it (hashes
+    only) to resume from.
+    """
+    rows = job.payload.get('rows')
+    if rows is None:
+        raise RuntimeError("The rows were lost before they were stored; upload the file again.")
+    set_total(job, len(rows))
+    chunk_size = job.params.get('chunk_size') or JOB_CHUNK_SIZE
+
+    while job.cursor < len(rows):
+        chunk = rows[job.cursor:job.cursor + chunk_size]
+        pending = [(number, data, data['password_hash']) for number, data in chunk]
+        with transaction.atomic():
+            created, errors = insert_rows(pending)
+            job.result['created'] = job.result.get('created', 0) + created
+            job.result['errors'] = sorted(job.result.get('errors', []) + errors, key=lambda error: error['row'])
+            job.result['failed'] = len(job.result['errors'])
+            BackgroundJob.objects.filter(id=job.id).update(result=job.result)
+            advance(job, job.cursor + len(chunk), len(chunk))
+        pause(job)
+    BackgroundJob.objects.filter(id=job.id).update(payload={})
@@ -0,0 +1,76 @@
+import json
+import platform
+import resource
+import sqlite3
+import subprocess
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api.bench import SKIPPED_ROUTES, prepare_dataset, run_route_benchmark, scratch_database
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Call every API route through the test client against a synthetic scratch database and "
+        "record latency percentiles, queries per request and memory as a JSON baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--programs', type=int, default=8)
+        parser.add_argument('--clearances', type=int, default=2, help="Terms per student; the last is current.")
+        parser.add_argument('--coverage', type=float, default=1.0, help="Share of programs each student has a signature for.")
+        parser.add_argument('--notifications', type=int, default=5, help="Notifications per student.")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed calls per route.")
+        parser.add_argument('--route', action='append', dest='routes', help="Only this URL pattern (repeatable).")
+        parser.add_argument('--output', help="Write the baseline JSON here.")
+
+    def handle(self, *args, **options):
+        dataset = {name: options[name] for name in ('students', 'programs', 'clearances', 'coverage', 'notifications')}
+        # Jobs run inline so their cost is part of the request that started
+        # them; uploads and QR codes go to a throwaway MEDIA_ROOT.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            DEBUG=False, MEDIA_ROOT=media_root, METRICS_DIR='',
+            BACKGROUND_TASKS_EAGER=True, BACKGROUND_JOB_PAUSE=0, PASSWORD_HASH_WORKERS=1,
+        ), scratch_database():
+            staff = prepare_dataset(**dataset)
+            routes = run_route_benchmark(staff, repeat=options['repeat'], patterns=options['routes'])
+
+        baseline = {
+            'meta': {
+                'dataset': dataset,
+                'repeat': options['repeat'],
+                'skipped': SKIPPED_ROUTES,
+                'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'commit': git_commit(),
+                'created_at': timezone.now().isoformat(),
+            },
+            'routes': routes,
+        }
+
+        self.stdout.write(f"{'route':<90} {'status':>6} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>9}")
+        for name, result in routes.items():
+            self.stdout.write(
+                f"{name:<90} {result['status']:>6} {result['queries']:>7} {result['p50_ms']:>9.2f} "
+                f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['peak_kb']:>9.1f}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(baseline, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(routes)} routes to {options['output']}."))
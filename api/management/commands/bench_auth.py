@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from api.bench import prepare_dataset, run_auth_benchmark, scratch_database
+
+
+class Command(BaseCommand):
+    help = "Compare queries and latency per request for database-backed and stateless JWT authentication."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=50, help="Timed calls per route and mode.")
+
+    def handle(self, *args, **options):
+        with override_settings(DEBUG=False), scratch_database():
+            staff = prepare_dataset(options['students'], notifications=5)
+            results = run_auth_benchmark(staff, repeat=options['repeat'])
+
+        database, stateless = results['database'], results['stateless']
+        self.stdout.write(
+            f"{'route':<45} {'queries':>9} {'db p50 ms':>10} {'jwt p50 ms':>11} {'change':>8}"
+        )
+        for name, before in database.items():
+            after = stateless[name]
+            change = (after['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+            self.stdout.write(
+                f"{name:<45} {before['queries']:>4} -> {after['queries']:<2} {before['p50_ms']:>10.2f} "
+                f"{after['p50_ms']:>11.2f} {change:>+7.1f}%"
+            )
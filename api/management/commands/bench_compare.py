@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'peak_kb')
+
+
+class Command(BaseCommand):
+    help = "Compare two bench_api baselines route by route."
+
+    def add_arguments(self, parser):
+        parser.add_argument('base')
+        parser.add_argument('head')
+        parser.add_argument('--metric', choices=METRICS, default='p50_ms')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help="Percent slowdown that counts as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit non-zero on a regression or a route that now runs more queries.")
+
+    def load(self, path):
+        try:
+            with open(path) as handle:
+                return json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {path}: {exc}")
+
+    def handle(self, *args, **options):
+        base, head = self.load(options['base']), self.load(options['head'])
+        metric, threshold = options['metric'], options['threshold']
+        if base['meta'].get('dataset') != head['meta'].get('dataset'):
+            self.stderr.write(self.style.WARNING("The baselines were taken on different datasets."))
+
+        regressions = []
+        self.stdout.write(f"{'route':<90} {'base':>9} {'head':>9} {'change':>8} {'queries':>9}")
+        for name in sorted(base['routes'].keys() | head['routes'].keys()):
+            before, after = base['routes'].get(name), head['routes'].get(name)
+            if before is None or after is None:
+                self.stdout.write(f"{name:<90} {'only in ' + ('head' if before is None else 'base'):>38}")
+                continue
+            change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            queries = f"{before['queries']}" if before['queries'] == after['queries'] else f"{before['queries']}->{after['queries']}"
+            flag = ''
+            if change > threshold or after['queries'] > before['queries']:
+                regressions.append(name)
+                flag = '  !'
+            self.stdout.write(
+                f"{name:<90} {before[metric]:>9.2f} {after[metric]:>9.2f} {change:>+7.1f}% {queries:>9}{flag}"
+            )
+
+        if regressions:
+            message = f"{len(regressions)} route(s) regressed beyond {threshold:g}% {metric} or added queries."
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No regressions."))
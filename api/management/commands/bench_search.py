@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from api import search
+from api.bench import scratch_database, populate, timed, median_ms, percentile
+from api.models import ClearanceSignature
+
+# Representative searches from the registrar pages: (program, last name, year).
+QUERIES = (
+    ('Club Treasurer', None, None),
+    (None, 'BIT', None),
+    (None, None, 'Third'),
+    ('Treasurer', 'BTLED', 'Year'),
+    ('Library', 'BSIT', 'Fourth Year'),
+)
+
+
+class Command(BaseCommand):
+    help = "Compare icontains and FTS5-backed signature search latency on a scratch database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000],
+                            help='Total ClearanceSignature counts to measure at.')
+        parser.add_argument('--programs', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        programs = options['programs']
+        with scratch_database():
+            students = 0
+            self.stdout.write(f"{'signatures':>12} {'like p50 ms':>12} {'fts p50 ms':>12} {'like max':>10} {'fts max':>10}")
+            for size in sorted(options['sizes']):
+                target = size // programs
+                populate(target - students, programs=programs, start=students)
+                students = target
+                search.rebuild()
+
+                like, fts = [], []
+                for query in QUERIES:
+                    like_ids = ClearanceSignature.objects.filter(search.like_filters(*query)).values_list('id', flat=True)
+                    fts_ids = ClearanceSignature.objects.filter(search.index_filters(*query)).values_list('id', flat=True)
+                    like += timed(lambda: list(like_ids.all()), options['repeat'])
+                    fts += timed(lambda: list(fts_ids.all()), options['repeat'])
+
+                self.stdout.write(
+                    f"{students * programs:>12} {median_ms(like):>12.2f} {median_ms(fts):>12.2f} "
+                    f"{percentile(like, 100) * 1000:>10.2f} {percentile(fts, 100) * 1000:>10.2f}"
+                )
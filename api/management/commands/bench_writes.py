@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import SQLITE_PROFILES, run_write_contention
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writer processes against a scratch SQLite file, once per connection profile, "
+        "and report throughput, latency and 'database is locked' failures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles', choices=sorted(SQLITE_PROFILES),
+                            help="Connection profile to run (repeatable; default: all).")
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--writes', type=int, default=100, help="Transactions per process.")
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--fail-on-errors', action='store_true',
+                            help="Exit non-zero if any write failed with a lock error.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'profile':<8} {'procs':>5} {'committed':>9} {'locked':>6} {'writes/s':>9} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        failed = []
+        for profile in options['profiles'] or sorted(SQLITE_PROFILES, reverse=True):
+            result = run_write_contention(
+                profile, processes=options['processes'], writes=options['writes'], students=options['students'],
+            )
+            self.stdout.write(
+                f"{profile:<8} {result['processes']:>5} {result['committed']:>9} {result['locked']:>6} "
+                f"{result['writes_per_second'] or 0:>9.1f} {result['p50_ms'] or 0:>8.2f} "
+                f"{result['p95_ms'] or 0:>8.2f} {result['p99_ms'] or 0:>8.2f}"
+            )
+            if result['locked']:
+                failed.append(profile)
+        if failed and options['fail_on_errors']:
+            raise CommandError(f"Lock errors with: {', '.join(failed)}.")
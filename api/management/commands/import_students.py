@@ -0,0 +1,46 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, import_students, parse_rows
+
+
+class Command(BaseCommand):
+    help = "Register students in bulk from a CSV (with header) or JSON file of registration rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--input', choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--workers', type=int, help="Password hashing processes (default: PASSWORD_HASH_WORKERS or CPU count).")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only.")
+        parser.add_argument('--errors', help="Write per-row errors to this JSON file.")
+
+    def handle(self, *args, **options):
+        input_format = options['input'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if input_format not in IMPORT_FORMATS:
+            raise CommandError(f"Pass --input ({', '.join(IMPORT_FORMATS)}).")
+        try:
+            with open(options['path'], 'rb') as handle:
+                rows = parse_rows(handle.read(), input_format)
+        except (OSError, ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Could not read {options['path']}: {exc}")
+
+        report = import_students(
+            rows, workers=options['workers'], chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+        )
+        seconds = report['seconds']
+        self.stdout.write(
+            f"{report['rows']} rows, {report['valid']} valid, {report['created']} created, "
+            f"{report['failed']} failed in {seconds['total']:.2f}s "
+            f"(validate {seconds['validate']:.2f}s, hash {seconds['hash']:.2f}s, insert {seconds['insert']:.2f}s; "
+            f"{report['rows_per_second']} rows/s)."
+        )
+        for error in report['errors'][:20]:
+            self.stdout.write(self.style.WARNING(f"row {error['row']}: {json.dumps(error['errors'])}"))
+        if len(report['errors']) > 20:
+            self.stdout.write(self.style.WARNING(f"... {len(report['errors']) - 20} more."))
+        if options['errors']:
+            with open(options['errors'], 'w') as handle:
+                json.dump(report['errors'], handle, indent=2)
@@ -0,0 +1,96 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.storage import HASHED_NAME, content_addressed_storage, file_references, reference_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete content-addressed receipt/signature files that no row refers to, and abandoned "
+        "upload temp files. With --dedupe, first move legacy uploads into the content-addressed "
+        "layout so duplicates collapse to one file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dedupe', action='store_true')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help="Keep unreferenced files younger than this (uploads still in flight).")
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        if options['dedupe']:
+            self.dedupe(storage, options['dry_run'])
+
+        referenced = set()
+        directories = set()
+        for model, field_name in file_references():
+            directories.add(model._meta.get_field(field_name).upload_to.split('/')[0])
+            referenced.update(
+                model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .values_list(field_name, flat=True)
+            )
+
+        cutoff = time.time() - options['grace_minutes'] * 60
+        removed = freed = 0
+        for directory in sorted(directories):
+            root = storage.path(directory)
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    full_path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(full_path, storage.location).replace(os.sep, '/')
+                    # Other files under these directories (legacy uploads
+                    # without --dedupe, generated QR codes) are not ours.
+                    if not (HASHED_NAME.search(name) or filename.startswith('.upload-')):
+                        continue
+                    if name in referenced or storage.saved_since(name, cutoff):
+                        continue
+                    size = os.path.getsize(full_path)
+                    if not options['dry_run']:
+                        with storage.lock():
+                            # Re-saved since the references were read.
+                            if storage.saved_since(name, cutoff):
+                                continue
+                            storage.delete(name)
+                    removed += 1
+                    freed += size
+
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} unreferenced files ({freed / 1024 / 1024:.1f} MiB)."))
+
+    def dedupe(self, storage, dry_run):
+        moved = 0
+        legacy = set()
+        for model, field_name in file_references():
+            rows = (model._default_manager.exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__isnull': True})
+                    .values_list('pk', field_name))
+            for pk, name in rows.iterator():
+                if HASHED_NAME.search(name) or not storage.exists(name):
+                    continue
+                moved += 1
+                legacy.add(name)
+                if dry_run:
+                    continue
+                with storage.open(name, 'rb') as content:
+                    hashed = storage.save(name, content)
+                # .update() keeps this out of the post_save file release.
+                model._default_manager.filter(pk=pk, **{field_name: name}).update(**{field_name: hashed})
+
+        # The sweep below never touches non-hashed names, so the legacy
+        # copies go here, once every row that shared one has moved off it.
+        removed = 0
+        for name in sorted(legacy):
+            if dry_run:
+                removed += 1
+                continue
+            with storage.lock():
+                if reference_count(name) == 0:
+                    storage.delete(name)
+                    removed += 1
+        verb = "Would move" if dry_run else "Moved"
+        self.stdout.write(
+            f"{verb} {moved} files into the content-addressed layout, {removed} legacy copies removed."
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import run_job
+from api.models import BackgroundJob, Clearance
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-create StudentClearance and pending ClearanceSignature rows for every eligible "
+        "student, in chunks. Interrupted runs continue with `resume_jobs`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('clearance_id', type=int)
+        parser.add_argument('--year-level')
+        parser.add_argument('--major')
+        parser.add_argument('--department', help="Course code, e.g. BSIT.")
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--pause', type=float, help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        if not Clearance.objects.filter(id=options['clearance_id']).exists():
+            raise CommandError(f"Clearance {options['clearance_id']} does not exist.")
+        params = {'clearance_id': options['clearance_id']}
+        for name in ('year_level', 'major', 'department', 'chunk_size', 'pause'):
+            if options[name] is not None:
+                params[name] = options[name]
+
+        job = BackgroundJob.objects.create(kind='open_clearance', params=params)
+        self.stdout.write(f"Job {job.id} started.")
+        job = run_job(job.id)
+        style = self.style.SUCCESS if job.status == BackgroundJob.COMPLETED else self.style.ERROR
+        self.stdout.write(style(f"Job {job.id} {job.status.lower()}: {job.processed}/{job.total} students. {job.error}".strip()))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import progress
+
+
+class Command(BaseCommand):
+    help = "Recount every ClearanceProgress summary from the ClearanceSignature rows."
+
+    def handle(self, *args, **options):
+        count = progress.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} clearance progress summaries."))
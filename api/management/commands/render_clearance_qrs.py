@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Clearance, StudentClearance
+from api.utils import generate_clearance_qrs
+
+
+class Command(BaseCommand):
+    help = (
+        "Render certificate QR codes for a clearance cohort. Images whose token "
+        "is unchanged are already on disk and are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clearance-id', type=int, action='append', dest='clearance_ids')
+        parser.add_argument('--academic-year')
+        parser.add_argument('--semester')
+        parser.add_argument('--workers', type=int, help="Process pool size (default: QR_RENDER_WORKERS or CPU count).")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        clearances = Clearance.objects.all()
+        if options['clearance_ids']:
+            clearances = clearances.filter(id__in=options['clearance_ids'])
+        if options['academic_year']:
+            clearances = clearances.filter(academic_year=options['academic_year'])
+        if options['semester']:
+            clearances = clearances.filter(semester=options['semester'])
+        if not any(options[name] for name in ('clearance_ids', 'academic_year', 'semester')):
+            raise CommandError("Pass --clearance-id, --academic-year and/or --semester.")
+
+        queryset = (StudentClearance.objects
+                    .filter(clearance_id__in=list(clearances.values_list('id', flat=True)))
+                    .only('id', 'student_id', 'clearance_id', 'status')
+                    .order_by('id'))
+        started = time.perf_counter()
+        total = rendered = 0
+        batch = []
+        for student_clearance in queryset.iterator(chunk_size=options['batch_size']):
+            batch.append(student_clearance)
+            if len(batch) == options['batch_size']:
+                rendered += generate_clearance_qrs(batch, workers=options['workers'])[1]
+                total += len(batch)
+                batch = []
+        if batch:
+            rendered += generate_clearance_qrs(batch, workers=options['workers'])[1]
+            total += len(batch)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} clearances: rendered {rendered}, reused {total - rendered} in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import run_job
+from api.models import BackgroundJob
+
+
+class Command(BaseCommand):
+    help = "Continue unfinished background jobs (Pending, Running or Failed) from their last committed chunk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', type=int, help="Default: every unfinished job.")
+
+    def handle(self, *args, **options):
+        jobs = BackgroundJob.objects.exclude(status=BackgroundJob.COMPLETED).order_by('id')
+        if options['job_ids']:
+            jobs = jobs.filter(id__in=options['job_ids'])
+        for job_id in list(jobs.values_list('id', flat=True)):
+            job = run_job(job_id, resume=True)
+            if job is None:
+                continue
+            style = self.style.SUCCESS if job.status == BackgroundJob.COMPLETED else self.style.ERROR
+            self.stdout.write(style(f"{job}{': ' + job.error if job.error else ''}"))
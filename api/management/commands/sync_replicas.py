@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api.routers import copy_database
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into each read replica file (settings.READ_REPLICAS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', action='append', dest='aliases', help="Only this replica (repeatable).")
+        parser.add_argument('--interval', type=float,
+                            help="Keep syncing every this many seconds; replicas lag by up to this much.")
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.READ_REPLICAS
+        unknown = set(aliases) - set(settings.READ_REPLICAS)
+        if unknown:
+            raise CommandError(f"Not a replica: {', '.join(sorted(unknown))}.")
+        if not aliases:
+            raise CommandError("No replicas configured; set SQLITE_REPLICAS.")
+
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                copy_database(source, connections[alias].settings_dict['NAME'])
+                self.stdout.write(f"{alias}: synced in {time.perf_counter() - started:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
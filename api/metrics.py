@@ -0,0 +1,341 @@
+import glob
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+UNMATCHED = ('unmatched', '')
+
+
+class Registry:
+    """
+    Per-process request statistics, keyed by (route, name, method), and
+    cache read counts, keyed by (cache, result). Recording is a few dict updates under a lock. With
+    settings.METRICS_DIR set, each process writes a snapshot to its own
+    file there at most every METRICS_FLUSH_INTERVAL seconds, and the
+    scrape endpoint sums every file, so gunicorn workers are aggregated
+    without any shared memory. Files are named <host>-<pid>-<token>, the
+    token being drawn when the process starts, so a reused pid never
+    overwrites a live worker's file; files of this host's dead processes
+    are pruned at scrape time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._owner = None
+        self.reset()
+
+    def snapshot_path(self, directory):
+        # Re-drawn in a forked child, which inherits the parent's registry.
+        if self._owner != os.getpid():
+            self._owner, self._token = os.getpid(), uuid.uuid4().hex[:12]
+        return os.path.join(directory, f'{socket.gethostname()}-{self._owner}-{self._token}.json')
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)          # (route, name, method, status) -> count
+            self.latency = {}                          # (route, name, method) -> [bucket counts..., sum]
+            self.queries = {}                          # (route, name, method) -> [bucket counts..., sum]
+            self.db_seconds = defaultdict(float)       # (route, name, method) -> seconds
+            self.response_bytes = defaultdict(int)     # (route, name, method) -> bytes
+            self.cache_reads = defaultdict(int)        # (cache, 'hit' | 'miss') -> count
+
+    @staticmethod
+    def _observe(histograms, key, buckets, value):
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(buckets) + 2)
+        counts[bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def record(self, key, status, seconds, queries=None, db_seconds=0.0, size=None):
+        with self._lock:
+            self.requests[key + (str(status),)] += 1
+            self._observe(self.latency, key, LATENCY_BUCKETS, seconds)
+            if queries is not None:
+                self._observe(self.queries, key, QUERY_BUCKETS, queries)
+                self.db_seconds[key] += db_seconds
+            if size is not None:
+                self.response_bytes[key] += size
+        self.maybe_flush()
+
+    def record_cache_read(self, cache_name, hit):
+        # Flushed with the next request's record().
+        with self._lock:
+            self.cache_reads[(cache_name, 'hit' if hit else 'miss')] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': [list(key) + [value] for key, value in self.requests.items()],
+                'latency': [list(key) + [counts] for key, counts in self.latency.items()],
+                'queries': [list(key) + [counts] for key, counts in self.queries.items()],
+                'db_seconds': [list(key) + [value] for key, value in self.db_seconds.items()],
+                'response_bytes': [list(key) + [value] for key, value in self.response_bytes.items()],
+                'cache_reads': [list(key) + [value] for key, value in self.cache_reads.items()],
+            }
+
+    def maybe_flush(self, force=False):
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+            return
+        self._last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temp_path, self.snapshot_path(directory))
+
+    def collect(self):
+        """Snapshots of every process writing to METRICS_DIR, or just this one."""
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if not directory:
+            return [self.snapshot()]
+        self.maybe_flush(force=True)
+        snapshots = []
+        for path in live_snapshot_paths(directory, self.snapshot_path(directory)):
+            try:
+                with open(path) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+def pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill(pid, 0) would send CTRL_C_EVENT there.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def live_snapshot_paths(directory, own_path):
+    """
+    The snapshot files in `directory`, after deleting those of this host's
+    dead processes and all but the newest file per pid (an earlier process
+    that had the same pid). Other hosts' files are left to their own scrapes.
+    """
+    host = socket.gethostname()
+    paths, by_pid = [], defaultdict(list)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        file_host, _, pid = os.path.basename(path)[:-len('.json')].rpartition('-')[0].rpartition('-')
+        if not file_host:
+            continue
+        if file_host != host:
+            paths.append(path)
+        elif not pid.isdigit():
+            continue
+        elif path != own_path and not pid_alive(int(pid)):
+            _remove(path)
+        else:
+            by_pid[pid].append(path)
+    for group in by_pid.values():
+        group.sort(key=lambda path: (path == own_path, _modified(path)))
+        for stale in group[:-1]:
+            _remove(stale)
+        paths.append(group[-1])
+    return paths
+
+
+def _modified(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+registry = Registry()
+
+
+def merge(snapshots):
+    counters = ('requests', 'db_seconds', 'response_bytes', 'cache_reads')
+    merged = {name: defaultdict(int) for name in counters}
+    merged['latency'] = {}
+    merged['queries'] = {}
+    for snapshot in snapshots:
+        for name in counters:
+            for *key, value in snapshot.get(name, ()):
+                merged[name][tuple(key)] += value
+        for name in ('latency', 'queries'):
+            for *key, counts in snapshot.get(name, ()):
+                total = merged[name].setdefault(tuple(key), [0] * len(counts))
+                for index, value in enumerate(counts):
+                    total[index] += value
+    return merged
+
+
+def _labels(route, name, method, **extra):
+    return _format_labels({'route': route, 'name': name, 'method': method, **extra})
+
+
+def _format_labels(pairs):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in pairs.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(pairs, escaped)) + '}'
+
+
+def _histogram(lines, metric, description, buckets, histograms):
+    lines.append(f'# HELP {metric} {description}')
+    lines.append(f'# TYPE {metric} histogram')
+    for key, counts in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(buckets + ('+Inf',), counts[:-1]):
+            cumulative += count
+            lines.append(f'{metric}_bucket{_labels(*key, le=bound)} {cumulative}')
+        lines.append(f'{metric}_sum{_labels(*key)} {counts[-1]}')
+        lines.append(f'{metric}_count{_labels(*key)} {cumulative}')
+
+
+def render(snapshots):
+    """Prometheus text exposition format (version 0.0.4)."""
+    merged = merge(snapshots)
+    lines = [
+        '# HELP api_http_requests_total Requests by route, method and status code.',
+        '# TYPE api_http_requests_total counter',
+    ]
+    for (route, name, method, code), value in sorted(merged['requests'].items()):
+        lines.append(f'api_http_requests_total{_labels(route, name, method, status=code)} {value}')
+    _histogram(lines, 'api_http_request_duration_seconds', 'Time until the response was returned.',
+               LATENCY_BUCKETS, merged['latency'])
+    _histogram(lines, 'api_http_request_db_queries', 'SQL statements run per request.',
+               QUERY_BUCKETS, merged['queries'])
+    lines += [
+        '# HELP api_http_request_db_seconds_total Time spent in SQL.',
+        '# TYPE api_http_request_db_seconds_total counter',
+    ]
+    for key, value in sorted(merged['db_seconds'].items()):
+        lines.append(f'api_http_request_db_seconds_total{_labels(*key)} {value}')
+    lines += [
+        '# HELP api_http_response_bytes_total Response body bytes (not counting streamed responses).',
+        '# TYPE api_http_response_bytes_total counter',
+    ]
+    for key, value in sorted(merged['response_bytes'].items()):
+        lines.append(f'api_http_response_bytes_total{_labels(*key)} {value}')
+    lines += [
+        '# HELP api_cache_reads_total Reads of the in-process caches (api/caches.py); a miss reloads from the database.',
+        '# TYPE api_cache_reads_total counter',
+    ]
+    for (cache_name, result), value in sorted(merged['cache_reads'].items()):
+        lines.append(f'api_cache_reads_total{_format_labels({"cache": cache_name, "result": result})} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def route_labels(request):
+    # The URL pattern, never the raw path, so ids do not multiply series;
+    # the name is there for readability (some routes have none).
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED
+    return match.route, match.view_name or ''
+
+
+def response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def instrument(timer):
+    """An ExitStack wrapping every connection of the calling thread with `timer`."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(timer))
+    return stack
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status, SQL count and time, and response size per
+    route into `registry`. Put it first in MIDDLEWARE so the timing
+    covers the rest of the stack. Under ASGI the SQL wrapper is installed
+    on the thread that runs the request's sync code (views and ORM calls
+    via sync_to_async), where its queries are executed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timer = QueryTimer()
+        with instrument(timer):
+            response = self.get_response(request)
+        registry.record(
+            route_labels(request) + (request.method,), response.status_code, time.perf_counter() - started,
+            queries=timer.count, db_seconds=timer.seconds, size=response_size(response),
+        )
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timer = QueryTimer()
+        # Thread-sensitive, so the same thread the request's sync code uses.
+        stack = await sync_to_async(instrument)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        registry.record(
+            route_labels(request) + (request.method,), response.status_code, time.perf_counter() - started,
+            queries=timer.count, db_seconds=timer.seconds, size=response_size(response),
+        )
+        return response
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(render(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'api_clearancesignature_search'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        "USING fts5(program_name, last_name, year_level, tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE}(rowid, program_name, last_name, year_level) "
+        "SELECT cs.id, p.program_name, u.last_name, COALESCE(s.year_level, '') "
+        "FROM api_clearancesignature cs "
+        "INNER JOIN api_programs p ON p.id = cs.programs_id "
+        "INNER JOIN auth_user u ON u.id = cs.student_id "
+        "LEFT OUTER JOIN api_student s ON s.user_id = cs.student_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_notification'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
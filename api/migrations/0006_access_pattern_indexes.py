@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_clearancesignature_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clearance',
+            index=models.Index(fields=['-created_at'], name='clearance_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clearance',
+            index=models.Index(fields=['academic_year', 'semester'], name='clearance_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clearancesignature',
+            index=models.Index(fields=['student', 'programs', 'clearance'], name='clearsig_student_prog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clearancesignature',
+            index=models.Index(fields=['programs', 'student', '-id'], name='clearsig_prog_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notification_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='clearancesignature',
+            constraint=models.CheckConstraint(condition=models.Q(('status__in', ['Approved', 'Pending', 'Rejected'])), name='clearsig_status_valid'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentclearance',
+            constraint=models.UniqueConstraint(fields=('student', 'clearance'), name='studentclear_unique_student'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentclearance',
+            constraint=models.CheckConstraint(condition=models.Q(('status__in', ['Approved', 'Pending', 'Rejected'])), name='studentclear_status_valid'),
+        ),
+    ]
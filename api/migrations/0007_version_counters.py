@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='programs',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='signature',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
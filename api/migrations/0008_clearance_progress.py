@@ -0,0 +1,57 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_progress(apps, schema_editor):
+    StudentClearance = apps.get_model('api', 'StudentClearance')
+    Clearance = apps.get_model('api', 'Clearance')
+    ClearanceProgress = apps.get_model('api', 'ClearanceProgress')
+
+    totals = dict(Clearance.objects.annotate(total=Count('programs')).values_list('id', 'total'))
+    rows = StudentClearance.objects.annotate(
+        approved=Count('clearancesignature', filter=Q(clearancesignature__status='Approved')),
+        pending=Count('clearancesignature', filter=Q(clearancesignature__status='Pending')),
+        rejected=Count('clearancesignature', filter=Q(clearancesignature__status='Rejected')),
+    ).values_list('id', 'student_id', 'clearance_id', 'approved', 'pending', 'rejected')
+    ClearanceProgress.objects.bulk_create([
+        ClearanceProgress(
+            student_clearance_id=sc_id, student_id=student_id, clearance_id=clearance_id,
+            total=totals.get(clearance_id, 0), approved=approved, pending=pending, rejected=rejected,
+            completed=totals.get(clearance_id, 0) > 0 and approved >= totals.get(clearance_id, 0),
+        )
+        for sc_id, student_id, clearance_id, approved, pending, rejected in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_version_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClearanceProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('approved', models.PositiveIntegerField(default=0)),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('rejected', models.PositiveIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('clearance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='api.clearance')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clearance_progress', to=settings.AUTH_USER_MODEL)),
+                ('student_clearance', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='api.studentclearance')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['clearance', 'completed'], name='progress_clearance_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_clearance_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clearancesignature',
+            name='receipt_thumbnail',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='receipts/thumbs/'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:48
+
+import api.storage
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_clearancesignature_receipt_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='clearancesignature',
+            name='receipt',
+            field=models.FileField(blank=True, null=True, storage=api.storage.ContentAddressedStorage(), upload_to='receipts/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['png', 'jpeg', 'jpg'])]),
+        ),
+        migrations.AlterField(
+            model_name='clearancesignature',
+            name='receipt_thumbnail',
+            field=models.FileField(blank=True, editable=False, null=True, storage=api.storage.ContentAddressedStorage(), upload_to='receipts/thumbs/'),
+        ),
+        migrations.AlterField(
+            model_name='signature',
+            name='image',
+            field=models.FileField(blank=True, null=True, storage=api.storage.ContentAddressedStorage(), upload_to='signatures/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['png', 'jpeg', 'jpg'])]),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:31
+
+import django.db.models.deletion
+import re
+
+from django.db import migrations, models
+
+# The clubs IronClubSignatureByParamsView and FuelClubSignatureByParamsView
+# used to hard-code, both served by the "Club Treasurer" program.
+CLUBS = (
+    ('Iron Club', 'iron-club', ('BIT',)),
+    ('Fuel Club', 'fuel-club', ('BTVTED-FSM', 'BTLED-AP', 'BTLED-HE')),
+)
+
+
+def department_code(last_name):
+    # Frozen copy of api.models.department_code.
+    match = re.match(r'[A-Za-z][A-Za-z-]*', (last_name or '').strip())
+    return match.group().upper() if match else ''
+
+
+def backfill_departments(apps, schema_editor):
+    Student = apps.get_model('api', 'Student')
+    students = list(Student.objects.select_related('user').only('id', 'user__last_name'))
+    for student in students:
+        student.department = department_code(student.user.last_name)
+    Student.objects.bulk_update(students, ['department'], batch_size=1000)
+
+
+def create_clubs(apps, schema_editor):
+    Programs = apps.get_model('api', 'Programs')
+    Club = apps.get_model('api', 'Club')
+    ClubDepartment = apps.get_model('api', 'ClubDepartment')
+    program = Programs.objects.filter(program_name__icontains='Club Treasurer').order_by('id').first()
+    if program is None:
+        return
+    for name, slug, departments in CLUBS:
+        club = Club.objects.create(name=name, slug=slug, program=program)
+        ClubDepartment.objects.bulk_create([
+            ClubDepartment(club=club, department=department) for department in departments
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_token_denylist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='department',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50),
+        ),
+        migrations.CreateModel(
+            name='Club',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('slug', models.SlugField(unique=True)),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clubs', to='api.programs')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClubDepartment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=50, unique=True)),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departments', to='api.club')),
+            ],
+        ),
+        migrations.RunPython(backfill_departments, migrations.RunPython.noop),
+        migrations.RunPython(create_clubs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Same as 0013, which skipped them on databases without the program.
+CLUBS = (
+    ('Iron Club', 'iron-club', ('BIT',)),
+    ('Fuel Club', 'fuel-club', ('BTVTED-FSM', 'BTLED-AP', 'BTLED-HE')),
+)
+
+
+def seed_clubs(apps, schema_editor):
+    # The legacy clearance/iron-club/ and clearance/fuel-club/ routes need
+    # their Club rows whether or not the "Club Treasurer" program exists yet.
+    Programs = apps.get_model('api', 'Programs')
+    Club = apps.get_model('api', 'Club')
+    ClubDepartment = apps.get_model('api', 'ClubDepartment')
+    program = Programs.objects.filter(program_name__icontains='Club Treasurer').order_by('id').first()
+    for name, slug, departments in CLUBS:
+        club, created = Club.objects.get_or_create(slug=slug, defaults={'name': name, 'program': program})
+        if created:
+            taken = set(ClubDepartment.objects.filter(department__in=departments).values_list('department', flat=True))
+            ClubDepartment.objects.bulk_create([
+                ClubDepartment(club=club, department=department) for department in departments if department not in taken
+            ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_clubs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='club',
+            name='program',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clubs', to='api.programs'),
+        ),
+        migrations.RunPython(seed_clubs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_seed_clubs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clearancesignature',
+            index=models.Index(fields=['receipt'], name='clearsig_receipt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clearancesignature',
+            index=models.Index(fields=['receipt_thumbnail'], name='clearsig_receipt_thumb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signature',
+            index=models.Index(fields=['image'], name='signature_image_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_file_reference_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='result',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
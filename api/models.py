@@ -1,12 +1,66 @@
+import re
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
 
+from .storage import content_addressed_storage
+
+CLEARANCE_STATUSES = ['Approved', 'Pending', 'Rejected']
+
+
+def bump_version(instance, save_kwargs):
+    # Increment in SQL so concurrent saves from different workers never
+    # reuse a version number (it backs the ETags in api/conditional.py).
+    if instance.pk is None or save_kwargs.get('force_insert'):
+        return
+    instance.version = models.F('version') + 1
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None:
+        save_kwargs['update_fields'] = set(update_fields) | {'version'}
+
+
+def loaded_file_names(instance, field_names):
+    # Raw column values as loaded, before FileDescriptor wraps them.
+    names = {}
+    for field_name in field_names:
+        value = instance.__dict__.get(field_name)
+        names[field_name] = getattr(value, 'name', value) or None
+    return names
+
+
+def refresh_version(instance):
+    if isinstance(instance.version, models.expressions.Combinable):
+        instance.refresh_from_db(fields=['version'])
+
+
+DEPARTMENT_PATTERN = re.compile(r'[A-Za-z][A-Za-z-]*')
+
+
+def department_code(last_name):
+    # Students register with their course code as the last name, sometimes
+    # followed by the year: "BIT", "BTVTED-FSM - Second Year".
+    match = DEPARTMENT_PATTERN.match((last_name or '').strip())
+    return match.group().upper() if match else ''
+
 
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='student_profile')
     year_level = models.CharField(max_length=50)
     major = models.TextField(blank=True, null=True)
+    # department_code(user.last_name), kept in sync by save() and the User
+    # post_save signal; bulk inserts must set it themselves.
+    department = models.CharField(max_length=50, blank=True, db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        # Only from a User already in hand; loading it here would cost a
+        # query per save, and the signal covers later last_name changes.
+        if Student.user.is_cached(self):
+            self.department = department_code(self.user.last_name)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'department'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - ({self.year_level})"
@@ -16,9 +70,45 @@ class Programs(models.Model):
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    def save(self, *args, **kwargs):
+        bump_version(self, kwargs)
+        super().save(*args, **kwargs)
+        refresh_version(self)
+
     def __str__(self):
         return self.program_name
 
+class Club(models.Model):
+    # A club whose treasurer signs off `program` for the students of its
+    # departments; the queue is clubs/<slug>/signatures/, empty until a
+    # program is set.
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(unique=True)
+    program = models.ForeignKey(Programs, on_delete=models.SET_NULL, null=True, blank=True, related_name='clubs')
+
+    @property
+    def department_codes(self):
+        return [department.department for department in self.departments.all()]
+
+    def __str__(self):
+        return self.name
+
+
+class ClubDepartment(models.Model):
+    club = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='departments')
+    # Matches Student.department; a department belongs to one club.
+    department = models.CharField(max_length=50, unique=True)
+
+    def save(self, *args, **kwargs):
+        self.department = self.department.strip().upper()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.department} → {self.club}"
+
+
 class Clearance(models.Model):
     programs = models.ManyToManyField(Programs, related_name='clearances')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -26,6 +116,12 @@ class Clearance(models.Model):
     semester = models.CharField(max_length=50, blank=True, null=True)   
     academic_year = models.CharField(max_length=50, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='clearance_created_idx'),
+            models.Index(fields=['academic_year', 'semester'], name='clearance_term_idx'),
+        ]
+
     def __str__(self):
         return f"{self.academic_year}"
 
@@ -33,28 +129,61 @@ class StudentClearance(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE)
     clearance = models.ForeignKey(Clearance, on_delete=models.CASCADE)
     status = models.CharField(max_length=50, default='Pending')
-    
-    
+
+    class Meta:
+        constraints = [
+            # RequestLatestClearanceView already refuses a second request per clearance.
+            models.UniqueConstraint(fields=['student', 'clearance'], name='studentclear_unique_student'),
+            models.CheckConstraint(
+                condition=models.Q(status__in=CLEARANCE_STATUSES), name='studentclear_status_valid',
+            ),
+        ]
+
+
 class Signature(models.Model):
     staff = models.ForeignKey(User, on_delete=models.CASCADE, related_name='signatures')
     image = models.FileField(
         upload_to='signatures/',
+        storage=content_addressed_storage,
         validators=[FileExtensionValidator(allowed_extensions=['png', 'jpeg', 'jpg'])],
         null=True,
         blank=True
     )
     description = models.TextField()
-    
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_files = loaded_file_names(instance, ['image'])
+        return instance
+
+    class Meta:
+        indexes = [
+            # api.storage.reference_count looks files up by name.
+            models.Index(fields=['image'], name='signature_image_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        bump_version(self, kwargs)
+        super().save(*args, **kwargs)
+        refresh_version(self)
+
+
 class ClearanceSignature(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clearance_signature')
     clearance = models.ForeignKey(StudentClearance, on_delete=models.CASCADE)
     programs = models.ForeignKey(Programs, on_delete=models.CASCADE, related_name='clearance_signature')
     receipt = models.FileField(
         upload_to='receipts/',
+        storage=content_addressed_storage,
         validators=[FileExtensionValidator(allowed_extensions=['png', 'jpeg', 'jpg'])],
         null=True,
         blank=True
     )
+    receipt_thumbnail = models.FileField(
+        upload_to='receipts/thumbs/', storage=content_addressed_storage, null=True, blank=True, editable=False,
+    )
     signature = models.ForeignKey(
         Signature,
         on_delete=models.CASCADE,
@@ -64,8 +193,51 @@ class ClearanceSignature(models.Model):
     )
     status = models.CharField(max_length=50, default='Pending')
     feedback = models.TextField(blank=True, null=True)
-    
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so post_save can tell a status change from a plain save.
+        instance._loaded_status = instance.__dict__.get('status')
+        # The search index only covers text reached through these.
+        instance._loaded_search_keys = (instance.__dict__.get('student_id'), instance.__dict__.get('programs_id'))
+        instance._loaded_files = loaded_file_names(instance, ['receipt', 'receipt_thumbnail'])
+        return instance
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'programs', 'clearance'], name='clearsig_student_prog_idx'),
+            models.Index(fields=['programs', 'student', '-id'], name='clearsig_prog_student_idx'),
+            models.Index(fields=['receipt'], name='clearsig_receipt_idx'),
+            models.Index(fields=['receipt_thumbnail'], name='clearsig_receipt_thumb_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(status__in=CLEARANCE_STATUSES), name='clearsig_status_valid',
+            ),
+        ]
+
+
+
+class ClearanceProgress(models.Model):
+    # Per-StudentClearance counters, maintained incrementally by api.progress.
+    student_clearance = models.OneToOneField(StudentClearance, on_delete=models.CASCADE, related_name='progress')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clearance_progress')
+    clearance = models.ForeignKey(Clearance, on_delete=models.CASCADE, related_name='progress')
+    total = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['clearance', 'completed'], name='progress_clearance_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}: {self.approved}/{self.total}"
 
 
 class Notification(models.Model):
@@ -74,5 +246,73 @@ class Notification(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} → {self.user.username}"
+
+
+class BackgroundJob(models.Model):
+    # A resumable bulk operation run by api.jobs. Each chunk commits its
+    # writes together with the new `cursor`, so a job stopped midway picks
+    # up after the last committed chunk.
+    PENDING, RUNNING, COMPLETED, FAILED = 'Pending', 'Running', 'Completed', 'Failed'
+    STATUS_CHOICES = [(value, value) for value in (PENDING, RUNNING, COMPLETED, FAILED)]
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    params = models.JSONField(default=dict, blank=True)
+    # Input too large or too sensitive for `params` (which the API shows),
+    # e.g. imported rows with their password hashes (never plaintext);
+    # cleared once the job completes, kept by a failed job to resume from.
+    payload = models.JSONField(default=dict, blank=True, editable=False)
+    # Outcome details beyond the counters, e.g. per-row import errors.
+    result = models.JSONField(default=dict, blank=True)
+    cursor = models.BigIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'kind'], name='backgroundjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status}, {self.processed}/{self.total})"
+
+
+class RevokedToken(models.Model):
+    # A revoked JWT (`jti` set) or every token a user was issued up to
+    # `created_at` (`user` set). Rows past `expires_at` cover only tokens
+    # that have expired anyway. Held in memory by api.caches.token_denylist.
+    jti = models.CharField(max_length=255, blank=True, db_index=True)
+    # Outlives the user: deleting one records a revocation (api/signals.py)
+    # that must keep their unexpired tokens out.
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='revoked_tokens',
+    )
+    expires_at = models.DateTimeField()
+    reason = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='revokedtoken_expires_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(jti='') | models.Q(user__isnull=False), name='revokedtoken_has_target',
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.title} → {self.user.username}"
\ No newline at end of file
+        return f"{self.jti or f'user {self.user_id}'} (until {self.expires_at:%Y-%m-%d})"
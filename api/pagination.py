@@ -0,0 +1,142 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in cursor pagination over an ordered, unique key such as
+    ('-created_at', '-id') or ('id',).
+
+    Pages are fetched with a range condition on the key instead of OFFSET,
+    so every page is an index range scan. Requests without `cursor` or
+    `page_size` are left unpaginated.
+    """
+    ordering = ('id',)
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.reversed_ordering() if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.first_position = self.position_of(rows[0]) if rows else position
+        self.last_position = self.position_of(rows[-1]) if rows else position
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.link_for(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.link_for(self.first_position, reverse=True)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def reversed_ordering(self):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    def after(self, ordering, position):
+        # (a, b) > (x, y) expands to a > x OR (a = x AND b > y).
+        clauses = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): position[f.lstrip('-')] for f in ordering[:index]}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': position[name]}))
+        return reduce(lambda left, right: left | right, clauses)
+
+    def position_of(self, instance):
+        return {field.lstrip('-'): getattr(instance, field.lstrip('-')) for field in self.ordering}
+
+    def link_for(self, position, reverse):
+        payload = {name: (value.isoformat() if hasattr(value, 'isoformat') else value)
+                   for name, value in position.items()}
+        payload = {'p': payload, 'r': reverse}
+        cursor = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            raw, reverse = payload['p'], bool(payload['r'])
+            position = {}
+            for field in self.ordering:
+                name = field.lstrip('-')
+                value = model._meta.get_field(name).to_python(raw[name])
+                if value is None:
+                    raise ValueError
+                position[name] = value
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError, ValidationError):
+            raise NotFound('Invalid cursor.')
+        return position, reverse
+
+
+class CreatedAtKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class DescendingIdKeysetPagination(KeysetPagination):
+    ordering = ('-id',)
+
+
+class StudentClearanceKeysetPagination(KeysetPagination):
+    # Newest clearance term first, on the table's own columns so pages
+    # walk the clearance_id index (whose entries end in the rowid, id).
+    # Clearance ids follow Clearance.created_at, which never changes.
+    ordering = ('-clearance_id', '-id')
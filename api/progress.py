@@ -0,0 +1,117 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from .models import Clearance, ClearanceSignature, StudentClearance, ClearanceProgress
+
+STATUS_FIELDS = {'Approved': 'approved', 'Pending': 'pending', 'Rejected': 'rejected'}
+
+# The counters count signature rows, and a resubmitted receipt can leave
+# two rows for one program, so completion is decided on the distinct
+# programs of the clearance that have an approved row.
+APPROVED_PROGRAMS = Subquery(
+    ClearanceSignature.objects.filter(
+        clearance_id=OuterRef('student_clearance_id'), status='Approved',
+        programs__clearances=OuterRef('clearance_id'),
+    ).order_by().values('clearance_id').annotate(programs=Count('programs_id', distinct=True)).values('programs')
+)
+
+COMPLETED = Case(
+    When(GreaterThanOrEqual(Coalesce(APPROVED_PROGRAMS, 0), F('total')), total__gt=0, then=Value(True)),
+    default=Value(False),
+)
+
+
+def program_totals(clearance_ids):
+    # Counted on the M2M table alone; clearances without programs are absent.
+    return dict(
+        Clearance.programs.through.objects.filter(clearance_id__in=clearance_ids)
+        .values('clearance_id')
+        .annotate(total=Count('id'))
+        .values_list('clearance_id', 'total')
+    )
+
+
+def create_for(student_clearances):
+    """Start empty summaries for newly created StudentClearance rows."""
+    student_clearances = list(student_clearances)
+    totals = program_totals({sc.clearance_id for sc in student_clearances})
+    ClearanceProgress.objects.bulk_create([
+        ClearanceProgress(
+            student_clearance_id=sc.id, student_id=sc.student_id, clearance_id=sc.clearance_id,
+            total=totals.get(sc.clearance_id, 0),
+        )
+        for sc in student_clearances
+    ], ignore_conflicts=True)
+
+
+def apply_changes(changes):
+    """
+    Fold status transitions into the counters. `changes` holds
+    StatusChange tuples; old_status is None for a new signature and
+    new_status is None for a deleted one. Summaries that end up with the
+    same delta share one UPDATE, so a bulk approval costs two statements.
+    """
+    deltas = defaultdict(Counter)
+    for change in changes:
+        if change.old_status == change.new_status:
+            continue
+        if change.old_status in STATUS_FIELDS:
+            deltas[change.student_clearance_id][STATUS_FIELDS[change.old_status]] -= 1
+        if change.new_status in STATUS_FIELDS:
+            deltas[change.student_clearance_id][STATUS_FIELDS[change.new_status]] += 1
+
+    grouped = defaultdict(list)
+    for student_clearance_id, delta in deltas.items():
+        key = tuple(sorted((field, n) for field, n in delta.items() if n))
+        if key:
+            grouped[key].append(student_clearance_id)
+
+    now = timezone.now()
+    for key, ids in grouped.items():
+        ClearanceProgress.objects.filter(student_clearance_id__in=ids).update(
+            updated_at=now, **{field: F(field) + n for field, n in key},
+        )
+    touched = [sc_id for ids in grouped.values() for sc_id in ids]
+    if touched:
+        ClearanceProgress.objects.filter(student_clearance_id__in=touched).update(completed=COMPLETED)
+
+
+def recount_totals(clearance_ids):
+    """Refresh `total` after a clearance's program list changed."""
+    totals = program_totals(clearance_ids)
+    for clearance_id in clearance_ids:
+        total = totals.get(clearance_id, 0)
+        ClearanceProgress.objects.filter(clearance_id=clearance_id).update(
+            total=total, updated_at=timezone.now(),
+        )
+        ClearanceProgress.objects.filter(clearance_id=clearance_id).update(completed=COMPLETED)
+
+
+def rebuild(student_clearances=None):
+    """Recount summaries from scratch (backfill, or repair after raw SQL edits)."""
+    if student_clearances is None:
+        student_clearances = StudentClearance.objects.all()
+    rows = student_clearances.annotate(**{
+        field: Count('clearancesignature', filter=Q(clearancesignature__status=status))
+        for status, field in STATUS_FIELDS.items()
+    }).values_list('id', 'student_id', 'clearance_id', *STATUS_FIELDS.values())
+    rows = list(rows)
+    totals = program_totals({row[2] for row in rows})
+    summaries = []
+    for sc_id, student_id, clearance_id, approved, pending, rejected in rows:
+        total = totals.get(clearance_id, 0)
+        summaries.append(ClearanceProgress(
+            student_clearance_id=sc_id, student_id=student_id, clearance_id=clearance_id,
+            total=total, approved=approved, pending=pending, rejected=rejected,
+        ))
+    ClearanceProgress.objects.bulk_create(
+        summaries, batch_size=1000, update_conflicts=True,
+        unique_fields=['student_clearance'],
+        update_fields=['total', 'approved', 'pending', 'rejected', 'updated_at'],
+    )
+    ClearanceProgress.objects.filter(student_clearance__in=student_clearances).update(completed=COMPLETED)
+    return len(summaries)
@@ -0,0 +1,148 @@
+import hashlib
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+    # Mutated rather than replaced, so a write inside a sync view that
+    # ASGI runs in a copied context is still seen by the middleware.
+    __slots__ = ('primary', 'wrote')
+
+    def __init__(self, primary=False):
+        self.primary = primary
+        self.wrote = False
+
+
+_state = ContextVar('api_db_routing', default=None)
+
+
+def replicas():
+    return getattr(settings, 'READ_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """Send every read in the block to the primary."""
+    token = _state.set(RoutingState(primary=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary; reads go to a random alias in
+    settings.READ_REPLICAS unless the context is pinned to the primary
+    or a transaction is open there (so a read-modify-write sees the rows
+    it locks). A write pins the rest of the request, or of the thread
+    outside requests. With no replicas configured every query uses the
+    primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        state = _state.get()
+        if state is not None and state.primary:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is None:
+            state = RoutingState()
+            _state.set(state)
+        state.primary = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary, so any pair may relate.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema with the data, from sync_replicas.
+        return db not in replicas()
+
+
+def client_key(request):
+    # Requests carry a JWT rather than a session, and are authenticated
+    # only inside the view, so the client is its token (or address).
+    credentials = request.headers.get('Authorization') or request.META.get('REMOTE_ADDR', '')
+    return 'api:db:sticky:' + hashlib.sha256(credentials.encode()).hexdigest()[:32]
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins a client's reads to the primary for
+    settings.READ_REPLICA_STICKY_SECONDS after any request of theirs that
+    wrote, so they see their own changes before the replicas catch up.
+    The marker lives in the Django cache, which must be shared between
+    workers for this to hold across them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+        key = client_key(request)
+        state = RoutingState(primary=bool(cache.get(key)))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            cache.set(key, 1, self.sticky_seconds())
+        return response
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        key = client_key(request)
+        state = RoutingState(primary=bool(await cache.aget(key)))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            await cache.aset(key, 1, self.sticky_seconds())
+        return response
+
+    @staticmethod
+    def sticky_seconds():
+        return getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 5)
+
+
+def copy_database(source_path, target_path, pages=1024):
+    """
+    Overwrite the SQLite file at `target_path` with a consistent snapshot
+    of `source_path`, using the online backup API. Copying `pages` pages
+    per step lets the primary's writers in between steps; readers of the
+    target keep seeing the old snapshot until the copy commits.
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages)
+    finally:
+        target.close()
+        source.close()
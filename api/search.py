@@ -0,0 +1,124 @@
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# FTS5 shadow table over the columns ClearanceSignatureByParamsView filters
+# on, keyed by ClearanceSignature.id. The trigram tokenizer answers
+# case-insensitive substring matches from the index, which is what the
+# original icontains filters meant.
+SEARCH_TABLE = 'api_clearancesignature_search'
+SEARCH_COLUMNS = ('program_name', 'last_name', 'year_level')
+
+# Trigram MATCH needs at least three characters; shorter terms fall back to
+# LIKE against the shadow table, which is still a single-table scan.
+MIN_MATCH_LENGTH = 3
+
+SOURCE_SQL = """
+SELECT cs.id, p.program_name, u.last_name, COALESCE(s.year_level, '')
+FROM api_clearancesignature cs
+INNER JOIN api_programs p ON p.id = cs.programs_id
+INNER JOIN auth_user u ON u.id = cs.student_id
+LEFT OUTER JOIN api_student s ON s.user_id = cs.student_id
+"""
+
+# Which ClearanceSignature column identifies the rows touched by a change.
+SCOPES = {
+    'signature': 'id',
+    'program': 'programs_id',
+    'student': 'student_id',
+}
+
+
+def is_available():
+    # The shadow table is only created on SQLite (see migration 0005).
+    return connection.vendor == 'sqlite'
+
+
+def rebuild():
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)}) {SOURCE_SQL}")
+
+
+def reindex(scope, value):
+    """Re-copy the indexed columns for every signature in `scope` (see SCOPES)."""
+    if not is_available():
+        return
+    column = SCOPES[scope]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+            f"(SELECT id FROM api_clearancesignature WHERE {column} = %s)",
+            [value],
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)}) "
+            f"{SOURCE_SQL} WHERE cs.{column} = %s",
+            [value],
+        )
+
+
+def index_signatures(signature_ids):
+    """Index rows written with bulk_create, which sends no post_save."""
+    if not is_available() or not signature_ids:
+        return
+    signature_ids = list(signature_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(signature_ids), 500):
+            chunk = signature_ids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)}) "
+                f"{SOURCE_SQL} WHERE cs.id IN ({placeholders})",
+                chunk,
+            )
+
+
+def unindex(signature_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [signature_id])
+
+
+def like_filters(program_name=None, last_name=None, year_level=None):
+    filters = Q()
+    if program_name:
+        filters &= Q(programs__program_name__icontains=program_name)
+    if last_name:
+        filters &= Q(student__last_name__icontains=last_name)
+    if year_level:
+        filters &= Q(student__student_profile__year_level__icontains=year_level)
+    return filters
+
+
+def index_filters(program_name=None, last_name=None, year_level=None):
+    terms = dict(zip(SEARCH_COLUMNS, (program_name, last_name, year_level)))
+    phrases = []
+    where = []
+    params = []
+    for column, term in terms.items():
+        if not term:
+            continue
+        if len(term) >= MIN_MATCH_LENGTH:
+            phrases.append('%s : "%s"' % (column, term.replace('"', '""')))
+        else:
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where.append(f"{column} LIKE %s ESCAPE '\\'")
+            params.append(f'%{escaped}%')
+    if not phrases and not where:
+        return Q()
+    if phrases:
+        where.insert(0, f"{SEARCH_TABLE} MATCH %s")
+        params.insert(0, ' AND '.join(phrases))
+    sql = f"SELECT rowid FROM {SEARCH_TABLE} WHERE {' AND '.join(where)}"
+    return Q(id__in=RawSQL(sql, params))
+
+
+def search_filters(program_name=None, last_name=None, year_level=None):
+    if is_available():
+        return index_filters(program_name, last_name, year_level)
+    return like_filters(program_name, last_name, year_level)
@@ -1,7 +1,123 @@
 # serializers.py
 from rest_framework import serializers
-from .models import Programs, Signature, Student, Clearance, StudentClearance, ClearanceSignature, Notification
+from django.db.models import QuerySet
+from .models import CLEARANCE_STATUSES, Programs, Signature, Student, Clearance, StudentClearance, ClearanceSignature, ClearanceProgress, Notification, BackgroundJob, RevokedToken, Club
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from .images import schedule_receipt_processing
+from .authentication import ClaimsRefreshToken, revoke_user_tokens
+from .caches import is_token_revoked
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from datetime import datetime, timezone as dt_timezone
+
+
+def nested_options(options, name):
+    """Strip the `name.` prefix from the dotted entries that belong to `name`."""
+    prefix = f'{name}.'
+    return [option[len(prefix):] for option in options if option.startswith(prefix)]
+
+
+def resolve_expand(fields=None, expand=None):
+    """
+    Normalise ?fields= / ?expand= into the set of expanded relation paths,
+    or None for the legacy fully nested representation. Asking for a dotted
+    field (`clearance.status`) expands its parents; expanding `a.b` expands `a`.
+    """
+    if fields is None and expand is None:
+        return None
+    paths = set()
+    candidates = list(expand or []) + [field.rsplit('.', 1)[0] for field in fields or [] if '.' in field]
+    for path in candidates:
+        parts = path.split('.')
+        for n in range(1, len(parts) + 1):
+            paths.add('.'.join(parts[:n]))
+    return paths
+
+
+class EagerLoadingMixin:
+    # Relations the serializer walks, joined/prefetched up front so a list
+    # costs a fixed number of queries instead of several per row.
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None):
+        select_related = cls.select_related_fields
+        prefetch_related = cls.prefetch_related_fields
+        paths = resolve_expand(fields, expand)
+        if paths is not None:
+            # Collapsed foreign keys render from the local *_id column, so only
+            # expanded ones need the join. To-many relations render as id lists
+            # and still need their prefetch whenever the owning object is shown.
+            select_related = [
+                lookup for lookup in select_related if lookup.replace('__', '.') in paths
+            ]
+            prefetch_related = [
+                lookup for lookup in prefetch_related
+                if lookup.rsplit('__', 1)[0].replace('__', '.') in paths or '__' not in lookup
+            ]
+        if fields:
+            wanted = {field.split('.')[0] for field in fields}
+            select_related = [lookup for lookup in select_related if lookup.split('__')[0] in wanted]
+            prefetch_related = [lookup for lookup in prefetch_related if lookup.split('__')[0] in wanted]
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # Applied automatically whenever a list view hands us a queryset.
+        options = {'fields': kwargs.get('fields'), 'expand': kwargs.get('expand')}
+        if args and isinstance(args[0], QuerySet):
+            args = (cls.setup_eager_loading(args[0], **options),) + args[1:]
+        elif isinstance(kwargs.get('instance'), QuerySet):
+            kwargs['instance'] = cls.setup_eager_loading(kwargs['instance'], **options)
+        return super().many_init(*args, **kwargs)
+
+
+class DynamicFieldsMixin(EagerLoadingMixin):
+    """
+    Accepts `fields` and `expand` lists (the ?fields= / ?expand= query
+    parameters). Without either, the serializer keeps its fully nested
+    representation. With either, only the listed fields are returned and
+    nested relations collapse to primary keys unless they are expanded.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        paths = resolve_expand(fields, expand)
+        if paths is None:
+            return
+
+        if fields:
+            wanted = {field.split('.')[0] for field in fields}
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+        for name, field in list(self.fields.items()):
+            if not isinstance(field, serializers.BaseSerializer):
+                continue
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if name not in paths:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(many=many, read_only=True)
+            elif isinstance(nested, DynamicFieldsMixin):
+                self.fields[name] = type(nested)(
+                    many=many,
+                    read_only=True,
+                    fields=nested_options(fields or [], name) or None,
+                    expand=nested_options(expand or [], name),
+                )
+
+    @classmethod
+    def get_sideloads(cls, instances):
+        """Response-level tables of objects the (collapsed) rows refer to."""
+        return {}
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -9,12 +125,21 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser']
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = UserSerializer()
+    select_related_fields = ('user',)
 
     class Meta:
         model = Student
-        fields = ['user', 'year_level', 'major']
+        fields = ['user', 'year_level', 'major', 'department']
+
+class ClubSerializer(serializers.ModelSerializer):
+    departments = serializers.ListField(source='department_codes', read_only=True)
+
+    class Meta:
+        model = Club
+        fields = ['id', 'name', 'slug', 'program', 'departments']
+
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -36,10 +161,22 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class StudentImportRowSerializer(serializers.Serializer):
+    # UserRegistrationSerializer's fields without its per-row uniqueness
+    # query; api.imports checks usernames for the whole file at once.
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+    password = serializers.CharField()
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    year_level = serializers.CharField(max_length=50)
+    major = serializers.CharField(required=False, allow_blank=True, default='')
+
+
 class ProgramsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Programs
-        fields = '__all__'
+        exclude = ['version']
 
 
 
@@ -51,23 +188,29 @@ class SignatureSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         staff = validated_data.get("staff")
 
-        # Delete existing signature for this staff
+        # Delete existing signature for this staff; its image file is
+        # released by a post_delete signal once no row refers to it.
         existing_signature = Signature.objects.filter(staff=staff).first()
         if existing_signature:
-            existing_signature.image.delete(save=False)
             existing_signature.delete()
 
         return super().create(validated_data)
 
 
 
-class ClearanceSerializer(serializers.ModelSerializer):
+class ClearanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     programs = ProgramsSerializer(many=True)
+    prefetch_related_fields = ('programs',)
 
     class Meta:
         model = Clearance
         fields = ['id', 'programs', 'created_at', 'updated_at', 'semester', 'academic_year']
 
+    @classmethod
+    def get_sideloads(cls, instances):
+        programs = {program.id: program for clearance in instances for program in clearance.programs.all()}
+        return {'programs': ProgramsSerializer(programs.values(), many=True).data}
+
 
 
 class ClearanceCreateSerializer(serializers.ModelSerializer):
@@ -82,31 +225,61 @@ class ClearanceCreateSerializer(serializers.ModelSerializer):
         return clearance
 
 
-class StudentClearanceSerializer(serializers.ModelSerializer):
+class StudentClearanceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student = UserSerializer()  # 👈
     clearance = ClearanceSerializer()
+    select_related_fields = ('student', 'clearance')
+    prefetch_related_fields = ('clearance__programs',)
 
     class Meta:
         model = StudentClearance
         fields = '__all__'
         read_only_fields = ['status']
 
+    @classmethod
+    def get_sideloads(cls, instances):
+        clearances = Clearance.objects.prefetch_related('programs').in_bulk(
+            {student_clearance.clearance_id for student_clearance in instances}
+        ).values()
+        return {
+            'clearances': ClearanceSerializer(clearances, many=True, expand=[]).data,
+            **ClearanceSerializer.get_sideloads(clearances),
+        }
 
 
-class ClearanceSignatureSerializer(serializers.ModelSerializer):
+
+class ClearanceSignatureSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student = UserSerializer()  # 👈
     programs = ProgramsSerializer()
     signature = SignatureSerializer()
     clearance = StudentClearanceSerializer()
+    select_related_fields = ('student', 'programs', 'signature', 'clearance__student', 'clearance__clearance')
+    prefetch_related_fields = ('clearance__clearance__programs',)
     class Meta:
         model = ClearanceSignature
         fields = '__all__'
 
+    @classmethod
+    def get_sideloads(cls, instances):
+        student_clearances = StudentClearance.objects.in_bulk(
+            {signature.clearance_id for signature in instances}
+        ).values()
+        sideloads = {
+            'student_clearances': StudentClearanceSerializer(student_clearances, many=True, expand=[]).data,
+            **StudentClearanceSerializer.get_sideloads(student_clearances),
+        }
+        listed = {program['id'] for program in sideloads['programs']}
+        missing = {signature.programs_id for signature in instances} - listed
+        if missing:
+            extra = Programs.objects.filter(id__in=missing)
+            sideloads['programs'] = sideloads['programs'] + ProgramsSerializer(extra, many=True).data
+        return sideloads
+
 
 
 class FeedbackSerializer(serializers.ModelSerializer):
     student_name = serializers.CharField(source="student.username", read_only=True)
-    program_name = serializers.CharField(source="programs.name", read_only=True)
+    program_name = serializers.CharField(source="programs.program_name", read_only=True)
 
     class Meta:
         model = ClearanceSignature
@@ -114,21 +287,56 @@ class FeedbackSerializer(serializers.ModelSerializer):
 
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class ClearanceProgressSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    student = UserSerializer()
+    select_related_fields = ('student',)
+
+    class Meta:
+        model = ClearanceProgress
+        fields = ['id', 'student_clearance', 'student', 'clearance', 'total', 'approved', 'pending', 'rejected', 'completed', 'updated_at']
+
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BackgroundJob
+        fields = ['id', 'kind', 'status', 'params', 'result', 'total', 'processed', 'error', 'created_by', 'created_at', 'updated_at', 'finished_at']
+
+
+class NotificationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ["id", "user", "title", "message", "created_at"]
 
 
+class BroadcastNotificationSerializer(serializers.Serializer):
+    # A notification plus the filters choosing its recipients; every filter
+    # is optional and they combine with AND.
+    title = serializers.CharField(max_length=255)
+    message = serializers.CharField()
+    department = serializers.CharField(required=False, help_text="Course code, e.g. BSIT.")
+    year_level = serializers.CharField(required=False)
+    major = serializers.CharField(required=False)
+    program_id = serializers.IntegerField(required=False)
+    clearance_status = serializers.ChoiceField(choices=CLEARANCE_STATUSES, required=False)
+    clearance_id = serializers.IntegerField(required=False, help_text="Defaults to the current term's clearances.")
+    chunk_size = serializers.IntegerField(required=False, min_value=1, max_value=10000)
+
+    def validate_program_id(self, value):
+        if not Programs.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Program not found.")
+        return value
+
+
 class ClearanceSignatureUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = ClearanceSignature
-        fields = ["id", "receipt", "status", "feedback"]
+        fields = ["id", "receipt", "receipt_thumbnail", "status", "feedback"]
 
     def update(self, instance, validated_data):
         # If receipt is uploaded again, reset status to Pending
         if "receipt" in validated_data:
             instance.receipt = validated_data["receipt"]
+            instance.receipt_thumbnail = None  # regenerated in the background
             instance.status = "Pending"
             instance.feedback = ""  # clear old feedback if needed
 
@@ -139,6 +347,51 @@ class ClearanceSignatureUpdateSerializer(serializers.ModelSerializer):
             instance.feedback = validated_data["feedback"]
 
         instance.save()
+        if "receipt" in validated_data:
+            schedule_receipt_processing(instance)
         return instance
 
 
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # login/ issues tokens that StatelessJWTAuthentication can trust alone.
+    token_class = ClaimsRefreshToken
+
+
+class DenylistTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        if is_token_revoked(self.token_class(attrs["refresh"])):
+            raise InvalidToken("Token has been revoked.")
+        return super().validate(attrs)
+
+
+class RevokeTokenSerializer(serializers.ModelSerializer):
+    # Revoke one token by sending it, or every token a user holds by
+    # sending user_id.
+    token = serializers.CharField(write_only=True, required=False)
+
+    class Meta:
+        model = RevokedToken
+        fields = ["id", "token", "jti", "user", "expires_at", "reason", "created_at"]
+        read_only_fields = ["jti", "expires_at", "created_at"]
+
+    def validate(self, attrs):
+        raw_token = attrs.pop("token", None)
+        if bool(raw_token) == bool(attrs.get("user")):
+            raise serializers.ValidationError("Send either token or user.")
+        if raw_token:
+            try:
+                token = UntypedToken(raw_token)
+            except TokenError as exc:
+                raise serializers.ValidationError({"token": str(exc)})
+            attrs["jti"] = token[jwt_settings.JTI_CLAIM]
+            attrs["expires_at"] = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+        return attrs
+
+    def create(self, validated_data):
+        if validated_data.get("jti"):
+            return super().create(validated_data)
+        return revoke_user_tokens(
+            validated_data["user"], validated_data.get("reason", ""), validated_data.get("created_by"),
+        )
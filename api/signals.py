@@ -0,0 +1,254 @@
+from django.contrib.auth.models import User
+from collections import namedtuple
+
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import progress, search
+from .authentication import PRIVILEGE_FIELDS, revoke_user_tokens
+from .events import publish_on_commit, user_channel
+from .serializers import NotificationSerializer
+from .storage import release_on_commit
+from .caches import clubs, current_clearance, staff_signatures, token_denylist
+from .models import Programs, Student, Clearance, StudentClearance, Signature, ClearanceSignature, Notification, RevokedToken, Club, ClubDepartment, department_code
+
+StatusChange = namedtuple('StatusChange', 'signature_id student_id student_clearance_id old_status new_status')
+
+# Sent with `changes`, a list of StatusChange, whenever ClearanceSignature
+# rows are created, deleted or change status -- including bulk writes that
+# bypass post_save, which must send it themselves.
+clearance_signatures_changed = Signal()
+
+
+@receiver(post_save, sender=ClearanceSignature)
+def index_clearance_signature(sender, instance, created, **kwargs):
+    # Status, feedback and receipt saves leave the indexed text alone.
+    keys = (instance.student_id, instance.programs_id)
+    if created or getattr(instance, '_loaded_search_keys', None) != keys:
+        search.reindex('signature', instance.pk)
+    instance._loaded_search_keys = keys
+
+
+@receiver(post_delete, sender=ClearanceSignature)
+def unindex_clearance_signature(sender, instance, **kwargs):
+    search.unindex(instance.pk)
+
+
+@receiver(post_save, sender=ClearanceSignature)
+def track_status_change(sender, instance, created, **kwargs):
+    old_status = None if created else getattr(instance, '_loaded_status', instance.status)
+    instance._loaded_status = instance.status
+    if old_status != instance.status:
+        change = StatusChange(instance.pk, instance.student_id, instance.clearance_id, old_status, instance.status)
+        clearance_signatures_changed.send(sender=ClearanceSignature, changes=[change])
+
+
+@receiver(post_delete, sender=ClearanceSignature)
+def track_deletion(sender, instance, **kwargs):
+    old_status = getattr(instance, '_loaded_status', instance.status)
+    change = StatusChange(instance.pk, instance.student_id, instance.clearance_id, old_status, None)
+    clearance_signatures_changed.send(sender=ClearanceSignature, changes=[change])
+
+
+@receiver(clearance_signatures_changed)
+def update_progress(sender, changes, **kwargs):
+    progress.apply_changes(changes)
+
+
+@receiver(post_save, sender=StudentClearance)
+def start_progress(sender, instance, created, **kwargs):
+    if created:
+        progress.create_for([instance])
+
+
+@receiver(m2m_changed, sender=Clearance.programs.through)
+def recount_progress_totals(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        progress.recount_totals([instance.pk])
+    elif action == 'post_clear':
+        progress.recount_totals(getattr(instance, '_cleared_clearance_ids', []))
+    else:
+        progress.recount_totals(pk_set)
+
+
+@receiver(m2m_changed, sender=Clearance.programs.through)
+def remember_cleared_clearances(sender, instance, action, reverse, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_clearance_ids = list(instance.clearances.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Programs)
+def remember_program_clearances(sender, instance, **kwargs):
+    instance._cleared_clearance_ids = list(instance.clearances.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Programs)
+def recount_after_program_delete(sender, instance, **kwargs):
+    progress.recount_totals(getattr(instance, '_cleared_clearance_ids', []))
+
+
+@receiver(post_save, sender=Programs)
+def reindex_program(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex('program', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_user(sender, instance, created, update_fields, **kwargs):
+    # Only last_name is indexed; logins save last_login alone.
+    if not created and (update_fields is None or 'last_name' in update_fields):
+        search.reindex('student', instance.pk)
+
+
+@receiver(post_save, sender=Student)
+def reindex_student(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'year_level' in update_fields:
+        search.reindex('student', instance.user_id)
+
+
+@receiver(post_delete, sender=Student)
+def unindex_student(sender, instance, **kwargs):
+    # The user's signatures stay, now without a year level.
+    search.reindex('student', instance.user_id)
+
+
+@receiver(post_save, sender=Clearance)
+@receiver(post_delete, sender=Clearance)
+@receiver(post_save, sender=Programs)
+@receiver(post_delete, sender=Programs)
+def invalidate_current_clearance(sender, **kwargs):
+    current_clearance.invalidate()
+
+
+@receiver(post_save, sender=Signature)
+@receiver(post_delete, sender=Signature)
+def invalidate_staff_signatures(sender, **kwargs):
+    staff_signatures.invalidate()
+
+
+@receiver(post_save, sender=Club)
+@receiver(post_delete, sender=Club)
+@receiver(post_save, sender=ClubDepartment)
+@receiver(post_delete, sender=ClubDepartment)
+def invalidate_clubs(sender, **kwargs):
+    clubs.invalidate()
+
+
+@receiver(post_save, sender=User)
+def sync_student_department(sender, instance, created, update_fields, **kwargs):
+    # A new user has no Student yet; Student.save() derives it then. Logins
+    # save last_login alone.
+    if not created and (update_fields is None or 'last_name' in update_fields):
+        department = department_code(instance.last_name)
+        Student.objects.filter(user_id=instance.id).exclude(department=department).update(department=department)
+
+
+@receiver(post_init, sender=User)
+def remember_privileges(sender, instance, **kwargs):
+    # __dict__, so deferred fields are not loaded just to be remembered.
+    instance._loaded_privileges = {name: instance.__dict__.get(name) for name in PRIVILEGE_FIELDS}
+
+
+@receiver(post_save, sender=User)
+def revoke_on_privilege_change(sender, instance, created, **kwargs):
+    # Tokens carry is_staff/is_superuser as claims, and stateless
+    # authentication never checks is_active, so they must not outlive a change.
+    loaded = getattr(instance, '_loaded_privileges', {})
+    current = {name: instance.__dict__.get(name) for name in PRIVILEGE_FIELDS}
+    changed = [
+        name for name, old in loaded.items()
+        if None not in (old, current[name]) and old != current[name]
+    ]
+    if not created and changed:
+        revoke_user_tokens(instance, reason=f"Changed {', '.join(changed)}.")
+    instance._loaded_privileges = current
+
+
+@receiver(pre_delete, sender=User)
+def revoke_on_delete(sender, instance, **kwargs):
+    # Stateless authentication never loads the User, so a deleted user's
+    # tokens would otherwise stay valid until they expire.
+    revoke_user_tokens(instance, reason="User deleted.")
+
+
+@receiver(post_save, sender=RevokedToken)
+@receiver(post_delete, sender=RevokedToken)
+def invalidate_token_denylist(sender, **kwargs):
+    token_denylist.invalidate()
+
+
+@receiver(m2m_changed, sender=Clearance.programs.through)
+def invalidate_current_clearance_programs(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        current_clearance.invalidate()
+
+
+# Clearance.updated_at doubles as the HTTP validator for clearance payloads,
+# which embed their programs, so touch it when those programs change.
+@receiver(m2m_changed, sender=Clearance.programs.through)
+def touch_clearance_programs(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        Clearance.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+    elif action == 'pre_clear':
+        instance.clearances.update(updated_at=timezone.now())
+    else:
+        Clearance.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Programs)
+@receiver(pre_delete, sender=Programs)
+def touch_program_clearances(sender, instance, **kwargs):
+    instance.clearances.update(updated_at=timezone.now())
+
+
+# Files are shared between rows with identical content (api/storage.py), so
+# they are only removed once nothing refers to them any more.
+@receiver(post_save, sender=ClearanceSignature)
+@receiver(post_save, sender=Signature)
+def release_replaced_files(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_files', {})
+    current = {name: getattr(instance, name).name or None for name in loaded}
+    release_on_commit(*(old for name, old in loaded.items() if old != current[name]))
+    instance._loaded_files = current
+
+
+@receiver(post_delete, sender=ClearanceSignature)
+def release_clearance_signature_files(sender, instance, **kwargs):
+    release_on_commit(instance.receipt.name, instance.receipt_thumbnail.name)
+
+
+@receiver(post_delete, sender=Signature)
+def release_signature_image(sender, instance, **kwargs):
+    release_on_commit(instance.image.name)
+
+
+def push_notifications(notifications):
+    """Announce new Notification rows on their users' event channels."""
+    for data in NotificationSerializer(notifications, many=True).data:
+        publish_on_commit(user_channel(data['user']), {'type': 'notification', 'id': data['id'], 'data': data})
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        push_notifications([instance])
+
+
+@receiver(clearance_signatures_changed)
+def push_status_changes(sender, changes, **kwargs):
+    # Only transitions of existing rows; a cohort being opened would
+    # otherwise announce thousands of new Pending rows.
+    for change in changes:
+        if change.old_status is None or change.new_status is None or change.old_status == change.new_status:
+            continue
+        publish_on_commit(user_channel(change.student_id), {'type': 'clearance_signature', 'data': {
+            'id': change.signature_id,
+            'student_clearance': change.student_clearance_id,
+            'old_status': change.old_status,
+            'status': change.new_status,
+        }})
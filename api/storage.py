@@ -0,0 +1,151 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers this process's threads.
+    fcntl = None
+
+# <upload_to>/<first two hex digits>/<sha256>.<ext>, as written by _save.
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.[a-z0-9]+)?$')
+
+_thread_lock = threading.Lock()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each file under the SHA-256 of its bytes, e.g.
+    receipts/3f/3fa9...c1.jpg, keeping the upload_to directory and the
+    extension. Identical uploads resolve to the same name and are written
+    once; since a name never changes meaning, the files can be served
+    with far-future cache headers.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save,
+        # and an existing file with that name is the same file.
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = self.hashed_name(name, digest.hexdigest())
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True, mode=self.directory_permissions_mode or 0o777)
+
+        temp_path = None if self.exists(name) else self._write_temp(content, directory)
+        try:
+            with self.lock():
+                if os.path.exists(full_path):
+                    # Renews the file's lease: release() leaves it alone
+                    # until the row about to refer to it has committed.
+                    os.utime(full_path)
+                else:
+                    if temp_path is None:
+                        # Released since the check above.
+                        temp_path = self._write_temp(content, directory)
+                    os.replace(temp_path, full_path)
+                    temp_path = None
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def _write_temp(self, content, directory):
+        # Written under a temporary name and renamed into place, so
+        # concurrent uploads of the same bytes never expose a half-written file.
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as destination:
+                for chunk in content.chunks():
+                    destination.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path
+
+    @contextmanager
+    def lock(self):
+        """Serialise saves against deletions, across threads and (with fcntl) processes."""
+        with _thread_lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.location, exist_ok=True)
+            with open(os.path.join(self.location, '.content-lock'), 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def saved_since(self, name, cutoff):
+        """True if `name` was written or re-saved after the epoch time `cutoff`."""
+        try:
+            return os.path.getmtime(self.path(name)) > cutoff
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def hashed_name(name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}').replace('\\', '/')
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def file_references():
+    """(model, field name) pairs that store files in content_addressed_storage."""
+    from .models import Signature, ClearanceSignature
+    return [
+        (ClearanceSignature, 'receipt'),
+        (ClearanceSignature, 'receipt_thumbnail'),
+        (Signature, 'image'),
+    ]
+
+
+def reference_count(name):
+    return sum(
+        model._default_manager.filter(**{field: name}).count()
+        for model, field in file_references()
+    )
+
+
+def release_grace_seconds():
+    return getattr(settings, 'MEDIA_RELEASE_GRACE_SECONDS', 120)
+
+
+def release(name):
+    """
+    Delete `name` once no row refers to it any more. A file saved within
+    MEDIA_RELEASE_GRACE_SECONDS may be about to be referenced by a row
+    that has not committed yet, so it is left for media_gc instead.
+    """
+    if not name:
+        return
+    storage = content_addressed_storage
+    with storage.lock():
+        if reference_count(name) == 0 and not storage.saved_since(name, time.time() - release_grace_seconds()):
+            storage.delete(name)
+
+
+def release_on_commit(*names):
+    for name in names:
+        if name:
+            transaction.on_commit(lambda name=name: release(name))
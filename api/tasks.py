@@ -0,0 +1,48 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                thread_name_prefix='api-task',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        # Tasks follow up on writes that may not have reached a replica yet.
+        with use_primary():
+            return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        # Each worker thread has its own connections; keep them only as
+        # long as CONN_MAX_AGE allows, like a request thread would.
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Run `func` on the process-wide worker pool, off the request thread.
+    With BACKGROUND_TASKS_EAGER set (tests, management commands) it runs
+    inline instead.
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        return func(*args, **kwargs)
+    return get_executor().submit(_run, func, args, kwargs)
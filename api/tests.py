@@ -1,3 +1,1428 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from contextlib import closing
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F, Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import bench, progress, routers, search
+from .authentication import USER_CLAIMS, ClaimsRefreshToken, ClaimsUser, StatelessJWTAuthentication, revoke_user_tokens
+from .caches import clubs, get_staff_signature, staff_signatures, token_denylist
+from .storage import content_addressed_storage, reference_count
+from .serializers import SignatureSerializer
+from .utils import clearance_token, generate_clearance_qrs
+from .images import process_receipt
+from .jobs import run_job
+from .checks import check_event_broker
+from .events import CacheBroker, InMemoryBroker, get_broker
+from .exports import CLEARANCE_SIGNATURE_COLUMNS, STUDENT_CLEARANCE_COLUMNS
+from .metrics import registry
+from .routers import PrimaryReplicaRouter, ReadYourWritesMiddleware, copy_database, use_primary
+from .search import search_filters
+from .urls import urlpatterns
+from .models import Programs, Signature, Student, Clearance, StudentClearance, ClearanceSignature, ClearanceProgress, BackgroundJob, Notification, RevokedToken, Club
+
+
+def make_student(n, last_name='BIT', year_level='3rd Year'):
+    user = User.objects.create_user(
+        username=f'student{n}', first_name=f'First{n}', last_name=last_name,
+    )
+    Student.objects.create(user=user, year_level=year_level, major='')
+    return user
+
+
+class ClearanceFixtureMixin:
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.staff_signature = Signature.objects.create(staff=self.staff, description='Treasurer')
+        self.treasurer = Programs.objects.create(program_name='Club Treasurer')
+        self.library = Programs.objects.create(program_name='Library')
+        self.clearance = Clearance.objects.create(academic_year='2025-2026', semester='1st Semester')
+        self.clearance.programs.set([self.treasurer, self.library])
+        # Migrations seed the Iron and Fuel clubs without a program.
+        for club in Club.objects.filter(slug__in=['iron-club', 'fuel-club']):
+            club.program = self.treasurer
+            club.save()
+        clubs.get()
+        self.students = 0
+
+    def add_students(self, count, last_name='BIT'):
+        for _ in range(count):
+            self.students += 1
+            student = make_student(self.students, last_name=last_name)
+            student_clearance = StudentClearance.objects.create(student=student, clearance=self.clearance)
+            for program in (self.treasurer, self.library):
+                ClearanceSignature.objects.create(
+                    student=student, clearance=student_clearance, programs=program,
+                    signature=self.staff_signature,
+                )
+
+
+class ListQueryCountTests(ClearanceFixtureMixin, TestCase):
+    # Each list endpoint must cost the same number of queries for 2 rows as
+    # for 20; a per-row query shows up as a mismatch between the two runs.
+    def assertConstantQueries(self, url, expected, last_name='BIT'):
+        self.add_students(1, last_name=last_name)
+        with self.assertNumQueries(expected):
+            small = self.client.get(url)
+        self.add_students(9, last_name=last_name)
+        with self.assertNumQueries(expected):
+            large = self.client.get(url)
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(large.status_code, 200)
+        self.assertGreater(len(large.json()), len(small.json()))
+
+    def test_clearance_signature_list(self):
+        self.assertConstantQueries(reverse('clearance-signatures'), 2)
+
+    def test_clearance_signature_by_params(self):
+        url = reverse('clearance-signatures-by-params', args=['Club', 'none', '3rd'])
+        self.assertConstantQueries(url, 2)
+
+    def test_iron_club_list(self):
+        self.assertConstantQueries(reverse('iron-club-clearance'), 2)
+
+    def test_fuel_club_list(self):
+        self.assertConstantQueries(reverse('fuel-club-clearance'), 2, last_name='BTLED-HE')
+
+    def test_student_clearance_list(self):
+        self.assertConstantQueries(reverse('student-clearance-list'), 2)
+
+    def test_clearance_list(self):
+        # One extra query computes the ETag.
+        url = reverse('clearance-list')
+        with self.assertNumQueries(3):
+            small = self.client.get(url)
+        Clearance.objects.create(academic_year='2025-2026', semester='2nd Semester').programs.set([self.library])
+        with self.assertNumQueries(3):
+            large = self.client.get(url)
+        self.assertEqual(len(large.json()), len(small.json()) + 1)
+
+
+class KeysetPaginationTests(ClearanceFixtureMixin, TestCase):
+    def test_unpaginated_without_cursor(self):
+        self.add_students(3)
+        response = self.client.get(reverse('clearance-signatures'))
+        self.assertEqual(len(response.json()), 6)
+
+    def test_walks_forward_and_back(self):
+        self.add_students(5)
+        url = reverse('clearance-signatures') + '?page_size=4'
+        seen = []
+        pages = []
+        while url:
+            with self.assertNumQueries(2):
+                body = self.client.get(url).json()
+            pages.append(body)
+            seen.extend(row['id'] for row in body['results'])
+            url = body['next']
+        self.assertEqual(seen, sorted(ClearanceSignature.objects.values_list('id', flat=True)))
+        self.assertIsNone(pages[0]['previous'])
+
+        previous = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_created_at_ordering(self):
+        user = make_student(99)
+        for n in range(5):
+            user.notifications.create(title=f'n{n}', message='m')
+        url = reverse('user-notifications', args=[user.id]) + '?page_size=2'
+        titles = []
+        while url:
+            body = self.client.get(url).json()
+            titles.extend(row['title'] for row in body['results'])
+            url = body['next']
+        self.assertEqual(titles, ['n4', 'n3', 'n2', 'n1', 'n0'])
+
+    def test_student_clearances_page_in_list_order(self):
+        self.add_students(3)
+        newer = Clearance.objects.create(academic_year='2025-2026', semester='2nd Semester')
+        for user in User.objects.filter(username__startswith='student'):
+            StudentClearance.objects.create(student=user, clearance=newer)
+        # Later rows on the older term: -id order would put these first.
+        self.add_students(2)
+
+        url = reverse('student-clearance-list')
+        listed = [row['id'] for row in self.client.get(url).json()]
+        paged = []
+        url += '?page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            paged.extend(row['id'] for row in body['results'])
+            url = body['next']
+        self.assertEqual(paged, listed)
+        self.assertEqual(
+            [StudentClearance.objects.get(pk=pk).clearance_id for pk in listed],
+            [newer.id] * 3 + [self.clearance.id] * 5,
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('clearance-signatures') + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class CurrentClearanceCacheTests(ClearanceFixtureMixin, TestCase):
+    def assertNoClearanceQueries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        touched = [q['sql'] for q in queries if '"api_clearance"' in q['sql']]
+        self.assertEqual(touched, [])
+        return response
+
+    def test_student_endpoints_skip_clearance_table(self):
+        self.add_students(1)
+        student = User.objects.get(username='student1')
+        self.client.get(reverse('latest-clearance'))
+
+        # Only the ETag's read of the newest (id, updated_at); the body is cached.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('latest-clearance'))
+        touched = [q['sql'] for q in queries if '"api_clearance"' in q['sql']]
+        self.assertEqual(len(touched), 1)
+        self.assertNotIn('api_clearance_programs', touched[0])
+        self.assertEqual(response.json()['id'], self.clearance.id)
+        response = self.assertNoClearanceQueries('get', reverse('student-clearance-by-student', args=[student.id]))
+        self.assertEqual(len(response.json()[0]['clearance']['programs']), 2)
+
+        other = make_student(50)
+        response = self.assertNoClearanceQueries(
+            'post', reverse('request-latest-clearance'), data={'student_id': other.id},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['clearance']['id'], self.clearance.id)
+
+    def test_new_clearance_invalidates(self):
+        self.client.get(reverse('latest-clearance'))
+        newer = Clearance.objects.create(academic_year='2025-2026', semester='2nd Semester')
+        self.assertEqual(self.client.get(reverse('latest-clearance')).json()['id'], newer.id)
+
+        newer.programs.set([self.library])
+        self.assertEqual(len(self.client.get(reverse('latest-clearance')).json()['programs']), 1)
+
+
+class QueryPlanTests(ClearanceFixtureMixin, TestCase):
+    # Every query an endpoint runs must be answered from an index; a bare
+    # "SCAN <table>" in SQLite's plan means a full-table scan, and a temp
+    # b-tree means the index does not cover the ORDER BY.
+    def assertIndexedQueries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 500)
+        self.assertTrue(queries.captured_queries)
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if (detail.startswith('SCAN') and 'INDEX' not in detail) or 'TEMP B-TREE' in detail:
+                        self.fail(f'{url}: {detail}\n{query["sql"]}')
+
+    def setUp(self):
+        super().setUp()
+        self.add_students(3)
+        self.student = User.objects.get(username='student2')
+        signature = self.student.clearance_signature.get(programs=self.library)
+        signature.feedback = 'Missing receipt'
+        signature.save()
+        for n in range(3):
+            self.student.notifications.create(title=f'n{n}', message='m')
+
+    def test_get_clearance_signature(self):
+        student_clearance = StudentClearance.objects.get(student=self.student)
+        self.assertIndexedQueries(reverse(
+            'get-clearance-signature', args=[student_clearance.id, self.student.id, self.library.id],
+        ))
+
+    def test_latest_feedback(self):
+        self.assertIndexedQueries(reverse('latest-feedback', args=[self.library.id, self.student.id]))
+
+    def test_user_notifications(self):
+        self.assertIndexedQueries(reverse('user-notifications', args=[self.student.id]))
+        self.assertIndexedQueries(reverse('user-notifications', args=[self.student.id]) + '?page_size=2')
+
+    def test_student_clearance_by_student(self):
+        self.assertIndexedQueries(reverse('student-clearance-by-student', args=[self.student.id]))
+
+    def test_latest_clearance(self):
+        self.assertIndexedQueries(reverse('latest-clearance'))
+
+    def test_student_clearance_list(self):
+        self.assertIndexedQueries(reverse('student-clearance-list'))
+        first = self.client.get(reverse('student-clearance-list') + '?page_size=2').json()
+        self.assertIndexedQueries(first['next'])
+
+    def test_club_signature_queue(self):
+        self.assertIndexedQueries(reverse('club-signature-queue', args=['iron-club']))
+
+
+class ClubTests(ClearanceFixtureMixin, TestCase):
+    def queue(self, slug):
+        return self.client.get(reverse('club-signature-queue', args=[slug]))
+
+    def test_new_club_needs_no_code(self):
+        self.add_students(2, last_name='BSED - First Year')
+        self.add_students(1)
+        self.assertEqual(self.queue('teachers-club').status_code, 404)
+
+        club = Club.objects.create(name='Teachers Club', slug='teachers-club', program=self.treasurer)
+        club.departments.create(department='bsed')
+        response = self.queue('teachers-club')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['student']['last_name'] for row in response.json()}, {'BSED - First Year'})
+        self.assertEqual(len(response.json()), 2)
+        self.assertIn('teachers-club', [row['slug'] for row in self.client.get(reverse('club-list')).json()])
+
+    def test_department_follows_last_name(self):
+        self.add_students(1, last_name='BTLED-HE - Third Year')
+        user = User.objects.get(username='student1')
+        self.assertEqual(user.student_profile.department, 'BTLED-HE')
+        self.assertEqual(len(self.client.get(reverse('fuel-club-clearance')).json()), 1)
+
+        user.last_name = 'BIT'
+        user.save()
+        self.assertEqual(Student.objects.get(user=user).department, 'BIT')
+        self.assertEqual(self.client.get(reverse('fuel-club-clearance')).json(), [])
+        self.assertEqual(len(self.client.get(reverse('iron-club-clearance')).json()), 1)
+
+    def test_legacy_queues_without_a_program_are_empty(self):
+        self.add_students(1)
+        Club.objects.filter(slug='iron-club').update(program=None)
+        clubs.invalidate()
+        self.assertEqual(self.client.get(reverse('iron-club-clearance')).json(), [])
+        signature = ClearanceSignature.objects.get(programs=self.treasurer)
+        response = self.client.patch(
+            reverse('update-iron-club-status', args=[signature.id]), {'status': 'Approved', 'staffId': self.staff.id},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Iron Club ClearanceSignature not found.'})
+
+    def test_student_save_uses_the_loaded_user(self):
+        self.add_students(1, last_name='BSED')
+        student = Student.objects.get(user__username='student1')
+        student.year_level = '4th Year'
+        with CaptureQueriesContext(connection) as queries:
+            student.save(update_fields=['year_level'])
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+        self.assertEqual(Student.objects.get(pk=student.pk).department, 'BSED')
+
+    def test_login_save_leaves_the_department_alone(self):
+        self.add_students(1, last_name='BSED')
+        user = User.objects.get(username='student1')
+        user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+        user.last_name = 'BIT'
+        user.save(update_fields=['last_name'])
+        self.assertEqual(Student.objects.get(user=user).department, 'BIT')
+
+    def test_update_rejects_another_clubs_signature(self):
+        self.add_students(1, last_name='BTLED-AP')
+        fuel = ClearanceSignature.objects.get(programs=self.treasurer)
+        data = {'status': 'Approved', 'staffId': self.staff.id}
+        response = self.client.patch(
+            reverse('update-club-signature-status', args=['iron-club', fuel.id]), data, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.patch(
+            reverse('update-fuel-club-status', args=[fuel.id]), data, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        fuel.refresh_from_db()
+        self.assertEqual(fuel.status, 'Approved')
+
+
+class SignatureSearchTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for last_name in ('BIT', 'BSIT - Second Year', 'btled-he', 'BS_ED', 'AB'):
+            self.add_students(1, last_name=last_name)
+        for n, year_level in ((1, '1st Year'), (2, 'Second Year'), (4, '4th year')):
+            student = Student.objects.select_related('user').get(user__username=f'student{n}')
+            student.year_level = year_level
+            student.save()
+
+    def ids(self, filters):
+        return sorted(ClearanceSignature.objects.filter(filters).values_list('id', flat=True))
+
+    def assertIndexInSync(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid, {', '.join(search.SEARCH_COLUMNS)} FROM {search.SEARCH_TABLE} ORDER BY rowid")
+            indexed = cursor.fetchall()
+            cursor.execute(search.SOURCE_SQL + " ORDER BY cs.id")
+            self.assertEqual(indexed, cursor.fetchall())
+
+    def test_status_update_skips_the_index(self):
+        signature = ClearanceSignature.objects.filter(programs=self.library).first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/clearance-signatures/{signature.id}/update-status/',
+                {'status': 'Rejected', 'feedback': 'Unpaid fine'}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if search.SEARCH_TABLE in query['sql']])
+
+        signature = ClearanceSignature.objects.get(pk=signature.pk)
+        signature.programs = self.treasurer
+        signature.save()
+        self.assertIndexInSync()
+
+    def test_results_match_icontains(self):
+        # Below, at and above the three characters a trigram MATCH needs,
+        # in any case, with LIKE wildcards, quotes and spaces.
+        cases = [
+            *({'program_name': term} for term in ('Club', 'club treasurer', 'rea', 'Li', 'y', 'x', 'Libr"ary')),
+            *({'last_name': term} for term in ('BIT', 'bit', 'IT', 'B', 'S_', '_E', '%', 'led-H', 'e Y', 'AB', 'ab')),
+            *({'year_level': term} for term in ('1st', 'Year', 'year', 'ye', '4', 'nd Y')),
+            {'program_name': 'Club', 'last_name': 'IT', 'year_level': 'Year'},
+            {'program_name': 'Li', 'last_name': 'BSIT - Second Year', 'year_level': 'd'},
+        ]
+        for terms in cases:
+            with self.subTest(**terms):
+                self.assertEqual(self.ids(search.index_filters(**terms)), self.ids(search.like_filters(**terms)))
+        self.assertEqual(len(self.ids(search.index_filters(last_name='IT'))), 4)
+        self.assertEqual(len(self.ids(search.index_filters(last_name='_E'))), 2)
+
+    def test_index_follows_writes(self):
+        self.assertIndexInSync()
+        self.treasurer.program_name = 'SSC Treasurer'
+        self.treasurer.save()
+        self.assertIndexInSync()
+
+        user = User.objects.get(username='student2')
+        user.last_name = 'BEED'
+        user.save()
+        self.assertIndexInSync()
+        student = user.student_profile
+        student.year_level = 'Fifth Year'
+        student.save()
+        self.assertIndexInSync()
+        student.delete()
+        self.assertIndexInSync()
+
+        ClearanceSignature.objects.filter(student=user, programs=self.library).get().delete()
+        self.add_students(1, last_name='BSED')
+        self.assertIndexInSync()
+        User.objects.get(username='student3').delete()
+        self.library.delete()
+        self.assertIndexInSync()
+        self.assertEqual(self.ids(search.index_filters(program_name='SSC')), self.ids(Q(programs=self.treasurer)))
+
+    def test_login_does_not_touch_the_index(self):
+        user = User.objects.get(username='student1')
+        user.last_login = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['last_login'])
+        self.assertFalse([query for query in queries if search.SEARCH_TABLE in query['sql']])
+
+
+class ExportTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_students(2, last_name='BIT')
+        self.add_students(1, last_name='BSIT')
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_clearance_signatures_ndjson(self):
+        response, body = self.export('clearance-signatures-export')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(list(rows[0]), list(CLEARANCE_SIGNATURE_COLUMNS))
+
+        _, body = self.export('clearance-signatures-export', program_name='libr', last_name='bsit', year_level='none')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row['program_name'], row['username']) for row in rows], [('Library', 'student3')])
+
+    def test_student_clearances_csv(self):
+        response, body = self.export('student-clearance-export', output='csv', last_name='it', year_level='3rd')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="student-clearances.csv"', response['Content-Disposition'])
+        header, *rows = csv.reader(io.StringIO(body))
+        self.assertEqual(header, list(STUDENT_CLEARANCE_COLUMNS))
+        self.assertEqual(len(rows), 3)
+
+        _, body = self.export('student-clearance-export', output='csv', last_name='BSIT')
+        header, *rows = csv.reader(io.StringIO(body))
+        self.assertEqual([row[header.index('username')] for row in rows], ['student3'])
+        _, body = self.export('student-clearance-export', year_level='1st')
+        self.assertEqual(body, '')
+
+    def test_unknown_output_is_rejected(self):
+        for name in ('clearance-signatures-export', 'student-clearance-export'):
+            response = self.client.get(reverse(name), {'output': 'xlsx'})
+            self.assertEqual(response.status_code, 400)
+
+
+class BulkStatusUpdateTests(ClearanceFixtureMixin, TestCase):
+    def test_bulk_approve_and_reject(self):
+        self.add_students(5)
+        ClearanceSignature.objects.update(signature=None)
+        ids = list(ClearanceSignature.objects.values_list('id', flat=True))
+        url = reverse('bulk-update-clearance-signature-status')
+
+        # Signature, rows, bulk_update, two progress updates, plus the savepoint pair.
+        with self.assertNumQueries(7):
+            response = self.client.post(url, {
+                'status': 'Approved', 'staffId': self.staff.id, 'ids': ids + [999999],
+            }, content_type='application/json')
+        body = response.json()
+        self.assertEqual(body['updated'], len(ids))
+        self.assertEqual(body['results'][-1], {'id': 999999, 'error': 'ClearanceSignature not found.'})
+        self.assertEqual(ClearanceSignature.objects.filter(status='Approved', signature=self.staff_signature).count(), len(ids))
+        self.assertEqual(ClearanceProgress.objects.filter(completed=True, approved=2, pending=0).count(), 5)
+
+        response = self.client.post(url, {
+            'status': 'Rejected', 'items': [{'id': ids[0], 'feedback': 'Blurry receipt'}, {'id': ids[1]}],
+        }, content_type='application/json')
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(ClearanceSignature.objects.get(id=ids[0]).feedback, 'Blurry receipt')
+
+    def test_approve_requires_staff(self):
+        response = self.client.post(reverse('bulk-update-clearance-signature-status'), {
+            'status': 'Approved', 'ids': [1],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class StaffSignatureCacheTests(ClearanceFixtureMixin, TestCase):
+    def approve(self, clearance_signature):
+        return self.client.patch(
+            f'/api/clearance-signatures/{clearance_signature.id}/update-status/',
+            {'status': 'Approved', 'staffId': self.staff.id}, content_type='application/json',
+        )
+
+    def signature_queries(self, queries):
+        table = Signature._meta.db_table
+        return [query['sql'] for query in queries if f'FROM "{table}"' in query['sql']]
+
+    def test_approvals_do_not_query_signatures(self):
+        self.add_students(3)
+        ClearanceSignature.objects.update(signature=None)
+        self.approve(ClearanceSignature.objects.first())
+        hits, misses = (registry.cache_reads[('staff-signatures', result)] for result in ('hit', 'miss'))
+
+        with CaptureQueriesContext(connection) as queries:
+            for clearance_signature in ClearanceSignature.objects.all()[1:]:
+                self.assertEqual(self.approve(clearance_signature).json()['signature_id'], self.staff_signature.id)
+        self.assertEqual(self.signature_queries(queries), [])
+        self.assertEqual((
+            registry.cache_reads[('staff-signatures', 'hit')] - hits,
+            registry.cache_reads[('staff-signatures', 'miss')] - misses,
+        ), (5, 0))
+
+    def test_replacing_signature_invalidates(self):
+        self.client.get(f'/api/signature/{self.staff.id}/')
+        serializer = SignatureSerializer(data={'staff': self.staff.id, 'description': 'New'})
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            replacement = serializer.save()
+
+        self.staff_signature = None
+        self.add_students(1)
+        response = self.approve(ClearanceSignature.objects.first())
+        self.assertEqual(response.json()['signature_id'], replacement.id)
+        self.assertEqual(self.client.get(f'/api/signature/{self.staff.id}/').json()['id'], replacement.id)
+
+
+class SparseFieldsTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_students(3)
+        self.url = reverse('clearance-signatures')
+
+    def test_default_is_fully_nested(self):
+        row = self.client.get(self.url).json()[0]
+        self.assertEqual(row['clearance']['clearance']['programs'][0]['program_name'], 'Club Treasurer')
+
+    def test_shallow_rows(self):
+        with self.assertNumQueries(1):
+            rows = self.client.get(self.url + '?expand=').json()
+        self.assertIsInstance(rows[0]['clearance'], int)
+        self.assertIsInstance(rows[0]['programs'], int)
+
+    def test_fields_and_nested_expand(self):
+        rows = self.client.get(self.url + '?fields=id,status,clearance.clearance&expand=clearance.clearance').json()
+        self.assertEqual(set(rows[0]), {'id', 'status', 'clearance'})
+        self.assertEqual(set(rows[0]['clearance']), {'clearance'})
+        self.assertEqual(rows[0]['clearance']['clearance']['programs'], [self.treasurer.id, self.library.id])
+
+    def test_sideload(self):
+        with self.assertNumQueries(4):
+            body = self.client.get(self.url + '?sideload=true&page_size=4').json()
+        self.assertEqual(len(body['results']), 4)
+        included = body['included']
+        self.assertEqual(len(included['clearances']), 1)
+        self.assertEqual(len(included['programs']), 2)
+        self.assertEqual(len(included['student_clearances']), 2)
+        self.assertEqual(included['clearances'][0]['programs'], [self.treasurer.id, self.library.id])
+
+
+class ConditionalGetTests(ClearanceFixtureMixin, TestCase):
+    def assertRevalidates(self, url, change, queries=1):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(queries):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        change()
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], first['ETag'])
+
+    def rename_library(self):
+        self.library.program_name = 'Main Library'
+        self.library.save()
+
+    def test_programs_list(self):
+        self.assertRevalidates(reverse('programs-list'), self.rename_library)
+
+    def test_clearance_list(self):
+        self.assertRevalidates(reverse('clearance-list'), lambda: self.clearance.programs.remove(self.library))
+
+    def test_clearance_detail(self):
+        url = f'/api/clearances/{self.clearance.id}/'
+        self.assertRevalidates(url, self.rename_library, queries=2)
+
+    def test_latest_clearance(self):
+        self.client.get(reverse('latest-clearance'))
+        self.assertRevalidates(reverse('latest-clearance'), self.rename_library, queries=1)
+
+    def test_signature_detail(self):
+        def replace_image():
+            self.staff_signature.description = 'Dean'
+            self.staff_signature.save()
+        self.assertRevalidates(f'/api/signature/{self.staff.id}/', replace_image, queries=1)
+
+    def test_validators_follow_writes_this_process_missed(self):
+        # As if another worker saved: the row changes, this process's
+        # cached copy is not told.
+        url = f'/api/signature/{self.staff.id}/'
+        first = self.client.get(url)
+        Signature.objects.filter(pk=self.staff_signature.pk).update(image='signatures/dean.png', version=F('version') + 1)
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertTrue(fresh.json()['image'].endswith('signatures/dean.png'))
+
+        first = self.client.get(reverse('latest-clearance'))
+        Clearance.objects.filter(pk=self.clearance.pk).update(semester='2nd Semester', updated_at=timezone.now())
+        fresh = self.client.get(reverse('latest-clearance'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.json()['semester'], '2nd Semester')
+
+    def test_query_string_changes_etag(self):
+        url = reverse('clearance-list')
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url + '?expand=')['ETag'])
+
+
+class ClearanceProgressTests(ClearanceFixtureMixin, TestCase):
+    def progress(self, student):
+        return ClearanceProgress.objects.get(student=student)
+
+    def test_counts_follow_signature_lifecycle(self):
+        self.add_students(1)
+        student = User.objects.get(username='student1')
+        self.assertEqual(
+            (self.progress(student).total, self.progress(student).pending, self.progress(student).completed),
+            (2, 2, False),
+        )
+
+        for signature in student.clearance_signature.all():
+            signature.status = 'Approved'
+            signature.save()
+        summary = self.progress(student)
+        self.assertEqual((summary.approved, summary.pending, summary.completed), (2, 0, True))
+
+        self.clearance.programs.add(Programs.objects.create(program_name='Registrar'))
+        self.assertFalse(self.progress(student).completed)
+        self.assertEqual(self.progress(student).total, 3)
+
+        student.clearance_signature.first().delete()
+        self.assertEqual(self.progress(student).approved, 1)
+
+    def test_two_rows_for_one_program_do_not_complete(self):
+        self.add_students(1)
+        student = User.objects.get(username='student1')
+        treasurer = student.clearance_signature.get(programs=self.treasurer)
+        # A resubmitted receipt: a second row for the same program.
+        ClearanceSignature.objects.create(
+            student=student, clearance=treasurer.clearance, programs=self.treasurer, status='Approved',
+        )
+        treasurer.status = 'Approved'
+        treasurer.save()
+        summary = self.progress(student)
+        self.assertEqual((summary.total, summary.approved, summary.completed), (2, 2, False))
+
+        progress.rebuild()
+        self.assertFalse(self.progress(student).completed)
+
+        library = student.clearance_signature.get(programs=self.library)
+        library.status = 'Approved'
+        library.save()
+        self.assertTrue(self.progress(student).completed)
+
+    def test_filter_completed_for_term(self):
+        self.add_students(3)
+        done = User.objects.get(username='student2')
+        done.clearance_signature.update(status='Approved')
+        progress.rebuild()
+
+        url = reverse('clearance-progress') + '?academic_year=2025-2026&semester=1st Semester&completed=true'
+        rows = self.client.get(url).json()
+        self.assertEqual([row['student']['id'] for row in rows], [done.id])
+
+
+@override_settings(MEDIA_RELEASE_GRACE_SECONDS=0)
+class ReceiptProcessingTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.add_students(1)
+        self.signature = ClearanceSignature.objects.get(programs=self.treasurer)
+
+    def upload(self, content, filename='receipt.jpg'):
+        self.signature.receipt.save(filename, ContentFile(content))
+        return self.signature.receipt.name
+
+    def sideways_photo(self):
+        # 800x400 as stored, with EXIF saying to rotate it upright (portrait).
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera Maker'
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, format='JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def test_receipt_is_made_upright_and_thumbnailed(self):
+        name = self.upload(self.sideways_photo())
+        receipt_name = process_receipt(self.signature.id, name)
+
+        self.signature.refresh_from_db()
+        self.assertEqual(self.signature.receipt.name, receipt_name)
+        self.assertNotEqual(receipt_name, name)
+        self.assertFalse(content_addressed_storage.exists(name))
+        with content_addressed_storage.open(receipt_name) as handle, Image.open(handle) as receipt:
+            self.assertEqual((receipt.format, receipt.size), ('JPEG', (400, 800)))
+            self.assertEqual(dict(receipt.getexif()), {})
+        self.assertTrue(self.signature.receipt_thumbnail.name.startswith('receipts/thumbs/'))
+        with content_addressed_storage.open(self.signature.receipt_thumbnail.name) as handle, Image.open(handle) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 320))
+
+    def test_row_changed_while_processing_is_left_alone(self):
+        name = self.upload(self.sideways_photo())
+        newer = self.upload(b'\x89PNG newer upload', filename='newer.png')
+        self.assertIsNone(process_receipt(self.signature.id, name))
+
+        self.signature.refresh_from_db()
+        self.assertEqual(self.signature.receipt.name, newer)
+        self.assertFalse(self.signature.receipt_thumbnail)
+        # The processed copies were released.
+        self.assertFalse([files for _, _, files in os.walk(content_addressed_storage.path('receipts/thumbs')) if files])
+
+    def test_undecodable_upload_is_left_alone(self):
+        name = self.upload(b'not an image', filename='receipt.png')
+        self.assertIsNone(process_receipt(self.signature.id, name))
+
+        self.signature.refresh_from_db()
+        self.assertEqual(self.signature.receipt.name, name)
+        self.assertFalse(self.signature.receipt_thumbnail)
+        self.assertTrue(content_addressed_storage.exists(name))
+
+
+class ContentAddressedStorageTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        # Releases are immediate unless a test sets a grace period.
+        settings = override_settings(MEDIA_ROOT=media_root, MEDIA_RELEASE_GRACE_SECONDS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.add_students(2)
+
+    def attach_receipt(self, signature, content):
+        signature.receipt.save('receipt.png', ContentFile(content))
+        return signature.receipt.name
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = ClearanceSignature.objects.filter(programs=self.treasurer)
+        name = self.attach_receipt(first, b'same bytes')
+        self.assertEqual(self.attach_receipt(second, b'same bytes'), name)
+        self.assertRegex(name, r'^receipts/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(len(os.listdir(os.path.dirname(content_addressed_storage.path(name)))), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(content_addressed_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(content_addressed_storage.exists(name))
+
+    def test_replaced_file_is_released(self):
+        signature = ClearanceSignature.objects.filter(programs=self.treasurer).first()
+        old = self.attach_receipt(signature, b'first upload')
+        signature = ClearanceSignature.objects.get(pk=signature.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            new = self.attach_receipt(signature, b'second upload')
+        self.assertNotEqual(old, new)
+        self.assertFalse(content_addressed_storage.exists(old))
+        self.assertTrue(content_addressed_storage.exists(new))
+
+    @override_settings(MEDIA_RELEASE_GRACE_SECONDS=60)
+    def test_release_keeps_a_file_saved_by_an_uncommitted_row(self):
+        first, second = ClearanceSignature.objects.filter(programs=self.treasurer)
+        name = self.attach_receipt(first, b'shared receipt')
+        # Another request saves the same bytes, but has not stored the name
+        # on its row yet when the first row lets go of the file.
+        self.assertEqual(content_addressed_storage.save('receipts/receipt.png', ContentFile(b'shared receipt')), name)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(content_addressed_storage.exists(name))
+        second.receipt.name = name
+        second.save()
+
+        os.utime(content_addressed_storage.path(name), (0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(content_addressed_storage.exists(name))
+
+    def test_release_looks_references_up_by_index(self):
+        name = self.attach_receipt(ClearanceSignature.objects.filter(programs=self.treasurer).first(), b'indexed')
+        with CaptureQueriesContext(connection) as queries:
+            reference_count(name)
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for row in cursor.fetchall():
+                    self.assertIn('INDEX', row[-1], query['sql'])
+
+    def test_media_gc_only_collects_content_addressed_files(self):
+        signature = ClearanceSignature.objects.filter(programs=self.treasurer).first()
+        kept = self.attach_receipt(signature, b'kept')
+        orphan = content_addressed_storage.save('receipts/orphan.png', ContentFile(b'orphan'))
+        qr_code = 'signatures/qr_1.png'
+        legacy = 'receipts/legacy-upload.png'
+        for name in (qr_code, legacy):
+            path = content_addressed_storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as handle:
+                handle.write(b'not hashed')
+        for name in (kept, orphan, qr_code, legacy):
+            os.utime(content_addressed_storage.path(name), (0, 0))
+
+        call_command('media_gc', grace_minutes=0, stdout=io.StringIO())
+        self.assertFalse(content_addressed_storage.exists(orphan))
+        for name in (kept, qr_code, legacy):
+            self.assertTrue(content_addressed_storage.exists(name), name)
+
+
+    def test_dedupe_removes_legacy_copies(self):
+        legacy = 'receipts/legacy-upload.png'
+        path = content_addressed_storage.path(legacy)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(b'legacy bytes')
+        signatures = ClearanceSignature.objects.filter(programs=self.treasurer)
+        signatures.update(receipt=legacy)
+
+        call_command('media_gc', dedupe=True, grace_minutes=0, stdout=io.StringIO())
+        names = set(signatures.values_list('receipt', flat=True))
+        self.assertEqual(len(names), 1)
+        (hashed,) = names
+        self.assertRegex(hashed, r'^receipts/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertTrue(content_addressed_storage.exists(hashed))
+        self.assertFalse(content_addressed_storage.exists(legacy))
+
+
+class ClearanceQRCodeTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.add_students(3)
+
+    def test_unchanged_clearances_are_not_rerendered(self):
+        student_clearances = list(StudentClearance.objects.all())
+        results, rendered = generate_clearance_qrs(student_clearances, workers=1)
+        self.assertEqual(rendered, 3)
+        self.assertTrue(all(os.path.exists(os.path.join(self.media_root, name)) for _, name in results.values()))
+
+        student_clearances[0].status = 'Approved'
+        results_again, rendered = generate_clearance_qrs(student_clearances, workers=1)
+        self.assertEqual(rendered, 1)
+        self.assertNotEqual(results_again[student_clearances[0].id], results[student_clearances[0].id])
+
+    def test_verify(self):
+        student_clearance = StudentClearance.objects.first()
+        url = reverse('verify-clearance-qr-code')
+        with self.assertNumQueries(1):
+            body = self.client.get(url, {'token': clearance_token(student_clearance)}).json()
+        self.assertEqual((body['valid'], body['student_clearance_id'], body['status']), (True, student_clearance.id, 'Pending'))
+
+        forged = clearance_token(student_clearance)[:-2] + 'xx'
+        self.assertEqual(self.client.get(url, {'token': forged}).status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], PASSWORD_HASH_WORKERS=1)
+@override_settings(BACKGROUND_TASKS_EAGER=True, BACKGROUND_JOB_PAUSE=0)
+class BulkStudentImportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='registrar', is_staff=True)
+        make_student(1)
+
+    def row(self, username, **extra):
+        return {'username': username, 'password': 'secret-pass', 'first_name': 'New', 'last_name': 'BSIT',
+                'year_level': '1st Year', **extra}
+
+    def test_import_reports_row_errors(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        rows = [self.row('new1'), self.row('new2', email='not-an-email'), self.row('student1'), self.row('new3')]
+        response = client.post(reverse('student-import'), rows, format='json')
+        self.assertEqual(response.status_code, 202)
+        # Validation errors come back at once; nothing is hashed in the request.
+        self.assertEqual([error['row'] for error in response.json()['result']['errors']], [2, 3])
+        self.assertFalse(User.objects.filter(username='new1').exists())
+        self.assertNotIn('secret-pass', response.content.decode())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('student-import'), rows, format='json')
+        job = BackgroundJob.objects.get(id=response.json()['id'])
+        self.assertEqual((job.status, job.processed), (BackgroundJob.COMPLETED, 2))
+        self.assertEqual((job.result['created'], job.result['failed']), (2, 2))
+        self.assertEqual(job.payload, {})
+        self.assertTrue(User.objects.get(username='new3').check_password('secret-pass'))
+        self.assertEqual(Student.objects.get(user__username='new1').year_level, '1st Year')
+
+    def test_failed_import_keeps_no_plaintext_passwords(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch('api.jobs.insert_rows', side_effect=RuntimeError('disk full')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post(reverse('student-import'), [self.row('new1'), self.row('new2')], format='json')
+        job = BackgroundJob.objects.get(id=response.json()['id'])
+        self.assertEqual(job.status, BackgroundJob.FAILED)
+        self.assertNotIn('secret-pass', json.dumps(job.payload))
+        self.assertEqual(len(job.payload['rows']), 2)
+
+        job = run_job(job.id, resume=True)
+        self.assertEqual((job.status, job.result['created'], job.payload), (BackgroundJob.COMPLETED, 2, {}))
+        self.assertTrue(User.objects.get(username='new2').check_password('secret-pass'))
+
+    def test_dry_run_only_validates(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post(reverse('student-import') + '?dry_run=1', [self.row('new1'), self.row('student1')], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['valid'], response.json()['failed']), (1, 1))
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_requires_admin(self):
+        response = self.client.post(reverse('student-import'), [self.row('new1')], content_type='application/json')
+        self.assertIn(response.status_code, (401, 403))
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, BACKGROUND_JOB_PAUSE=0)
+class OpenClearanceForCohortTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_students(2)
+        self.newcomers = [make_student(n, year_level='1st Year') for n in (10, 11, 12)]
+
+    def test_open_for_cohort(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='registrar', is_staff=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('open-clearance-for-cohort', args=[self.clearance.id]), {'chunk_size': 2}, format='json')
+        self.assertEqual(response.status_code, 202)
+
+        job = client.get(reverse('background-job-detail', args=[response.json()['id']])).json()
+        self.assertEqual((job['status'], job['processed'], job['total']), ('Completed', 5, 5))
+        self.assertEqual(StudentClearance.objects.filter(clearance=self.clearance).count(), 5)
+        self.assertEqual(ClearanceSignature.objects.filter(clearance__clearance=self.clearance).count(), 10)
+        summary = ClearanceProgress.objects.get(student=self.newcomers[0])
+        self.assertEqual((summary.total, summary.pending), (2, 2))
+        self.assertIn(self.newcomers[0].clearance_signature.get(programs=self.library).id, set(
+            ClearanceSignature.objects.filter(search_filters('Library', None, None)).values_list('id', flat=True)
+        ))
+
+    def test_resume_from_cursor(self):
+        job = BackgroundJob.objects.create(
+            kind='open_clearance', status=BackgroundJob.FAILED, cursor=self.newcomers[0].id, processed=3, total=5,
+            params={'clearance_id': self.clearance.id, 'year_level': '1st Year'},
+        )
+        self.assertIsNone(run_job(job.id))
+        job = run_job(job.id, resume=True)
+        self.assertEqual((job.status, job.processed), ('Completed', 5))
+        self.assertFalse(StudentClearance.objects.filter(student=self.newcomers[0]).exists())
+        self.assertEqual(StudentClearance.objects.filter(student__in=self.newcomers[1:]).count(), 2)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, BACKGROUND_JOB_PAUSE=0)
+class BroadcastNotificationTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_students(3, last_name='BSIT')
+        self.add_students(2, last_name='BIT')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def broadcast(self, **filters):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('broadcast-notification'), {
+                'title': 'Deadline', 'message': 'Clearances close Friday.', 'chunk_size': 2, **filters,
+            }, format='json')
+        self.assertEqual(response.status_code, 202)
+        return BackgroundJob.objects.get(id=response.json()['id'])
+
+    def test_targets_department(self):
+        job = self.broadcast(department='BSIT', year_level='3rd Year')
+        self.assertEqual((job.status, job.total, job.processed), ('Completed', 3, 3))
+        self.assertEqual(
+            set(Notification.objects.values_list('user__last_name', flat=True)), {'BSIT'},
+        )
+
+    def test_targets_program_status(self):
+        User.objects.get(username='student4').clearance_signature.filter(programs=self.library).update(status='Approved')
+        self.broadcast(program_id=self.library.id, clearance_status='Pending')
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertFalse(Notification.objects.filter(user__username='student4').exists())
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+
+
+class NotificationStreamTests(ClearanceFixtureMixin, TestCase):
+    def test_changes_are_published_after_commit(self):
+        self.add_students(1)
+        student = User.objects.get(username='student1')
+        broker = RecordingBroker()
+        with mock.patch('api.events._broker', broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                Notification.objects.create(user=student, title='Hello', message='World')
+                signature = student.clearance_signature.first()
+                signature.status = 'Approved'
+                signature.save()
+                self.assertEqual(broker.published, [])
+
+        channels = {channel for channel, _ in broker.published}
+        self.assertEqual(channels, {f'user:{student.id}'})
+        self.assertEqual([event['type'] for _, event in broker.published], ['notification', 'clearance_signature'])
+        self.assertEqual(broker.published[1][1]['data']['status'], 'Approved')
+
+    @override_settings(NOTIFICATION_STREAM=True)
+    @mock.patch('api.events._broker', InMemoryBroker())
+    async def test_stream_replays_and_pushes(self):
+        student = await sync_to_async(make_student)(1)
+        missed = await Notification.objects.acreate(user=student, title='Missed', message='While offline')
+        response = await self.async_client.get(
+            reverse('user-notification-stream', args=[student.id]), headers={'Last-Event-ID': str(missed.id - 1)},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = response.streaming_content
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        self.assertIn(f'id: {missed.id}\n'.encode(), await anext(chunks))
+
+        get_broker().publish(f'user:{student.id}', {'type': 'clearance_signature', 'data': {'id': 1, 'status': 'Approved'}})
+        self.assertEqual(
+            await asyncio.wait_for(anext(chunks), 1),
+            b'event: clearance_signature\ndata: {"id": 1, "status": "Approved"}\n\n',
+        )
+        await chunks.aclose()
+
+    async def test_cache_broker_subscribes_without_blocking_the_loop(self):
+        broker = CacheBroker()
+        broker.poll_interval = 0.01
+        subscription = await broker.asubscribe('user:1')
+        await sync_to_async(broker.publish)('user:1', {'type': 'notification', 'id': 1, 'data': {}})
+        self.assertEqual(await subscription.get(1), {'type': 'notification', 'id': 1, 'data': {}})
+        self.assertIsNone(await subscription.get(0.05))
+
+    async def test_stream_is_off_by_default(self):
+        student = await sync_to_async(make_student)(1)
+        response = await self.async_client.get(reverse('user-notification-stream', args=[student.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_requires_a_cross_process_broker(self):
+        with override_settings(NOTIFICATION_STREAM=True, EVENT_BROKER='api.events.InMemoryBroker'):
+            self.assertEqual([error.id for error in check_event_broker(None)], ['api.E001'])
+        with override_settings(NOTIFICATION_STREAM=True, EVENT_BROKER='api.events.CacheBroker'):
+            # The test settings' local-memory cache is per process.
+            self.assertEqual([error.id for error in check_event_broker(None)], ['api.E001'])
+            with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+            }}):
+                # Shared, but its incr() is not atomic across processes.
+                self.assertEqual([error.id for error in check_event_broker(None)], ['api.E001'])
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379',
+            }}):
+                self.assertEqual(check_event_broker(None), [])
+        with override_settings(NOTIFICATION_STREAM=False, EVENT_BROKER='api.events.InMemoryBroker'):
+            self.assertEqual(check_event_broker(None), [])
+
+
+class MetricsTests(ClearanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_requests_are_labelled_by_route(self):
+        self.add_students(2)
+        for _ in range(3):
+            self.client.get(f'/api/clearances/{self.clearance.id}/')
+        self.client.get('/api/clearances/999999/')
+        body = self.client.get(reverse('metrics')).content.decode()
+
+        labels = 'route="api/clearances/<int:id>/",name="clearance-detail",method="GET"'
+        self.assertIn(f'api_http_requests_total{{{labels},status="200"}} 3', body)
+        self.assertIn(f'api_http_requests_total{{{labels},status="404"}} 1', body)
+        self.assertIn(f'api_http_request_duration_seconds_count{{{labels}}} 4', body)
+        self.assertIn(f'api_http_request_db_queries_bucket{{{labels},le="+Inf"}} 4', body)
+        self.assertNotIn(str(self.clearance.id) + '/"', body)
+
+    def test_cache_reads_are_exported(self):
+        staff_signatures.invalidate()
+        for _ in range(3):
+            get_staff_signature(self.staff.id)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('api_cache_reads_total{cache="staff-signatures",result="miss"} 1', body)
+        self.assertIn('api_cache_reads_total{cache="staff-signatures",result="hit"} 2', body)
+
+    def test_aggregates_worker_files(self):
+        host = socket.gethostname()
+        dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('programs-list'))
+            registry.maybe_flush(force=True)
+            own = registry.snapshot_path(directory)
+            worker = os.path.join(directory, f'{host}-{os.getppid()}-b0b0.json')
+            stale = [
+                os.path.join(directory, f'{host}-{dead.stdout.strip()}-dead.json'),
+                # An earlier process that had this one's pid.
+                os.path.join(directory, f'{host}-{os.getpid()}-0ld.json'),
+                os.path.join(directory, f'{os.getpid()}.json'),
+            ]
+            for path in [worker] + stale:
+                shutil.copy(own, path)
+            body = self.client.get(reverse('metrics')).content.decode()
+            remaining = set(os.listdir(directory))
+        self.assertIn('api_http_requests_total{route="api/programs/",name="programs-list",method="GET",status="200"} 2', body)
+        self.assertEqual(remaining, {os.path.basename(own), os.path.basename(worker), f'{os.getpid()}.json'})
+
+    async def test_asgi_requests_count_queries(self):
+        await self.async_client.get(f'/api/clearances/{self.clearance.id}/')
+        body = (await self.async_client.get(reverse('metrics'))).content.decode()
+        labels = 'route="api/clearances/<int:id>/",name="clearance-detail",method="GET"'
+        self.assertIn(f'api_http_request_db_queries_bucket{{{labels},le="+Inf"}} 1', body)
+        self.assertNotIn(f'api_http_request_db_queries_bucket{{{labels},le="0"}} 1', body)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], PASSWORD_HASH_WORKERS=1,
+    BACKGROUND_TASKS_EAGER=True, BACKGROUND_JOB_PAUSE=0,
+)
+class RouteBenchmarkTests(TestCase):
+    def test_every_route_has_a_working_case(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            staff = bench.prepare_dataset(6, programs=3, clearances=2, notifications=1)
+            results = bench.run_route_benchmark(staff, repeat=1)
+
+        failed = {name: result['status'] for name, result in results.items() if result['status'] >= 400}
+        self.assertEqual(failed, {})
+        covered = {name.split(' ', 1)[1] for name in results} | set(bench.SKIPPED_ROUTES)
+        self.assertEqual(covered, {str(pattern.pattern) for pattern in urlpatterns})
+
+
+class SQLiteConnectionTests(TestCase):
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            values = {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('synchronous', 'busy_timeout', 'cache_size', 'temp_store')
+            }
+        self.assertEqual(values, {
+            'synchronous': 1, 'busy_timeout': int(settings.DATABASES['default']['OPTIONS']['timeout'] * 1000),
+            'cache_size': settings.SQLITE_PRAGMAS['cache_size'], 'temp_store': 2,
+        })
+
+    @skipIf(settings.SQLITE_PATH, "Only the checked-in database is protected.")
+    def test_checked_in_database_keeps_its_journal_mode(self):
+        path = settings.BASE_DIR / 'db.sqlite3'
+        header = path.read_bytes()[:100]
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c', 'from django.db import connection; connection.ensure_connection()'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(path.read_bytes()[:100], header)
+
+    def test_concurrent_writers_are_not_locked_out(self):
+        # Regression guard: the configured connection settings must let
+        # several processes write without "database is locked".
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'bench_writes', '--profile', 'tuned',
+             '--processes', '3', '--writes', '30', '--students', '30', '--fail-on-errors'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+@override_settings(READ_REPLICAS=['replica'], READ_REPLICA_STICKY_SECONDS=5)
+class ReadReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        self.seen = []
+        # Writes earlier in the test run pinned this thread to the primary.
+        self.addCleanup(routers._state.reset, routers._state.set(None))
+
+    def view(self, request):
+        if request.method == 'POST':
+            self.router.db_for_write(Notification)
+        self.seen.append(self.router.db_for_read(Notification))
+        return HttpResponse()
+
+    def request(self, method, address):
+        middleware = ReadYourWritesMiddleware(self.view)
+        return middleware(getattr(self.factory, method)('/', REMOTE_ADDR=address))
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        self.request('get', '10.0.0.1')
+        self.request('post', '10.0.0.1')
+        self.request('get', '10.0.0.1')
+        self.request('get', '10.0.0.2')
+        self.assertEqual(self.seen, ['replica', 'default', 'default', 'replica'])
+
+    def test_reads_in_a_transaction_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Notification), 'replica')
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Notification), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Notification), 'default')
+
+    def test_copy_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(primary)) as db, db:
+                db.execute('CREATE TABLE t (n INTEGER)')
+                db.executemany('INSERT INTO t VALUES (?)', [(n,) for n in range(100)])
+            copy_database(primary, replica, pages=1)
+            with closing(sqlite3.connect(replica)) as db:
+                self.assertEqual(db.execute('SELECT count(*) FROM t').fetchone(), (100,))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+@mock.patch.object(APIView, 'authentication_classes', [StatelessJWTAuthentication])
+class StatelessAuthenticationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='registrar', password='secret-pass', first_name='Reg', is_staff=True, email='reg@example.com',
+        )
+
+    def login(self):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'registrar', 'password': 'secret-pass'})
+        return response.json()['access']
+
+    def test_login_adds_user_claims(self):
+        token = AccessToken(self.login())
+        self.assertEqual(
+            {claim: token[claim] for claim in USER_CLAIMS},
+            {'username': 'registrar', 'first_name': 'Reg', 'last_name': '', 'is_staff': True, 'is_superuser': False},
+        )
+
+    def test_authenticated_request_skips_user_query(self):
+        headers = {'Authorization': f'Bearer {self.login()}'}
+        # Warms the programs and token denylist caches.
+        self.client.get(reverse('programs-list'), headers=headers)
+        with CaptureQueriesContext(connection) as anonymous:
+            self.client.get(reverse('programs-list'))
+        with CaptureQueriesContext(connection) as authenticated:
+            self.client.get(reverse('programs-list'), headers=headers)
+        self.assertEqual(len(authenticated), len(anonymous))
+
+        # Admin-only routes are authorised from the is_staff claim.
+        job = BackgroundJob.objects.create(kind='open_clearance')
+        response = self.client.get(reverse('background-job-detail', args=[job.id]), headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unclaimed_attributes_load_the_user_once(self):
+        user = ClaimsUser(AccessToken(self.login()))
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_staff)
+            self.assertEqual(user.username, 'registrar')
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'reg@example.com')
+            self.assertIsNotNone(user.date_joined)
+
+    def test_tokens_without_claims_fall_back_to_the_user(self):
+        user = ClaimsUser(AccessToken.for_user(self.admin))
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_staff)
+            self.assertEqual(user.first_name, 'Reg')
+
+    def test_privilege_changes_revoke_issued_tokens(self):
+        cache.clear()
+        job = BackgroundJob.objects.create(kind='open_clearance')
+        url = reverse('background-job-detail', args=[job.id])
+
+        def issued_earlier():
+            # Revocation cutoffs are compared in whole seconds.
+            refresh = ClaimsRefreshToken.for_user(self.admin)
+            refresh.current_time -= timedelta(seconds=10)
+            refresh.set_iat(at_time=refresh.current_time)
+            return {'Authorization': f'Bearer {refresh.access_token}'}
+
+        headers = issued_earlier()
+        self.admin.first_name = 'Registrar'
+        self.admin.save()
+        self.assertEqual(self.client.get(url, headers=headers).status_code, 200)
+
+        self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(self.client.get(url, headers=headers).status_code, 401)
+
+        RevokedToken.objects.all().delete()
+        headers = issued_earlier()
+        user = User.objects.get(pk=self.admin.pk)
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get(reverse('programs-list'), headers=headers).status_code, 401)
+        self.assertEqual(RevokedToken.objects.get().reason, 'Changed is_active.')
+
+    def test_deleting_a_user_revokes_their_tokens(self):
+        cache.clear()
+        refresh = ClaimsRefreshToken.for_user(self.admin)
+        refresh.current_time -= timedelta(seconds=10)
+        refresh.set_iat(at_time=refresh.current_time)
+        headers = {'Authorization': f'Bearer {refresh.access_token}'}
+        revoke_user_tokens(self.admin, reason='Earlier revocation.')
+
+        user_id = self.admin.pk
+        self.admin.delete()
+        # Revocations are kept for the deleted user, not cascaded away.
+        self.assertEqual(
+            sorted(RevokedToken.objects.filter(user_id=user_id).values_list('reason', flat=True)),
+            ['Earlier revocation.', 'User deleted.'],
+        )
+        self.assertEqual(self.client.get(reverse('programs-list'), headers=headers).status_code, 401)
+
+
+class TokenDenylistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='registrar', is_staff=True)
+        self.student = make_student(1)
+        self.client = APIClient()
+
+    def revoke(self, **data):
+        admin_client = APIClient()
+        admin_client.force_authenticate(self.admin)
+        return admin_client.post(reverse('revoke-token'), data, format='json')
+
+    def get_as(self, token):
+        return self.client.get(reverse('user-notifications', args=[self.student.id]), HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_revoked_token_is_rejected_without_a_query(self):
+        refresh = ClaimsRefreshToken.for_user(self.student)
+        access, other = str(refresh.access_token), str(ClaimsRefreshToken.for_user(self.student).access_token)
+        self.assertEqual(self.get_as(access).status_code, 200)
+
+        response = self.revoke(token=access, reason='Leaked')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['jti'], AccessToken(access)['jti'])
+        self.assertEqual(self.get_as(access).status_code, 401)
+        self.assertEqual(self.get_as(other).status_code, 200)
+
+        self.get_as(access)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_as(access).status_code, 401)
+        self.assertEqual(len(queries), 0)
+
+    def test_revoking_a_user_cuts_off_every_token_issued_so_far(self):
+        refresh = ClaimsRefreshToken.for_user(self.student)
+        refresh.current_time -= timedelta(seconds=10)
+        refresh.set_iat(at_time=refresh.current_time)
+        RevokedToken.objects.filter(pk=self.revoke(user=self.student.id).data['id']).update(
+            created_at=timezone.now() - timedelta(seconds=5),
+        )
+        token_denylist.invalidate()
+        self.assertEqual(self.get_as(str(refresh.access_token)).status_code, 401)
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        # Tokens issued after the cutoff work again.
+        later = ClaimsRefreshToken.for_user(self.student)
+        self.assertEqual(self.get_as(str(later.access_token)).status_code, 200)
+
+    def test_user_cutoff_covers_tokens_from_the_same_second(self):
+        cutoff = int(timezone.now().timestamp()) - 60
+        revoked = self.revoke(user=self.student.id).data
+        RevokedToken.objects.filter(pk=revoked['id']).update(
+            created_at=datetime.fromtimestamp(cutoff + 0.5, tz=dt_timezone.utc),
+        )
+        token_denylist.invalidate()
+        for iat, status_code in ((cutoff - 1, 401), (cutoff, 401), (cutoff + 1, 200)):
+            access = AccessToken.for_user(self.student)
+            access['iat'] = iat
+            self.assertEqual(self.get_as(str(access)).status_code, status_code, iat)
+
+    def test_login_right_after_revocation_gets_a_valid_token(self):
+        self.revoke(user=self.student.id)
+        refresh = ClaimsRefreshToken.for_user(self.student)
+        self.assertEqual(self.get_as(str(refresh.access_token)).status_code, 200)
+
+    def test_requires_exactly_one_target(self):
+        self.assertEqual(self.revoke().status_code, 400)
+        token = str(AccessToken.for_user(self.student))
+        self.assertEqual(self.revoke(token=token, user=self.student.id).status_code, 400)
+        self.assertEqual(self.revoke(token='not-a-token').status_code, 400)
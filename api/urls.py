@@ -1,12 +1,16 @@
 from django.urls import path
 from . import views
+from .metrics import metrics_view
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
+    path('metrics/', metrics_view, name='metrics'),
     path('programs/', views.ProgramsListAPIView.as_view(), name='programs-list'),
     path('register/', views.RegisterUserAPIView.as_view(), name='register'),
+    path('students/import/', views.BulkStudentImportView.as_view(), name='student-import'),
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('tokens/revoke/', views.RevokeTokenView.as_view(), name='revoke-token'),
 
     path('user/<int:user_id>/', views.GetUserByIdView.as_view(), name='get_user_by_id'),
     path('upload-signature/', views.SignatureUploadView.as_view(), name='upload-signature'),
@@ -17,15 +21,22 @@ urlpatterns = [
 
     path('clearances/', views.ClearanceListView.as_view(), name='clearance-list'),
     path('clearances/create/', views.ClearanceCreateView.as_view(), name='create-clearance'),
+    path('clearances/<int:id>/open/', views.OpenClearanceForCohortView.as_view(), name='open-clearance-for-cohort'),
+    path('jobs/<int:id>/', views.BackgroundJobDetailView.as_view(), name='background-job-detail'),
     path('clearance/latest/', views.LatestClearanceView.as_view(), name='latest-clearance'),
     path('clearances/<int:id>/', views.ClearanceDetailView.as_view(), name='clearance-detail'),
     path('student-clearance/request-latest/', views.RequestLatestClearanceView.as_view(), name='request-latest-clearance'),
     path('student-clearance/<int:student_id>/', views.StudentClearanceByStudentView.as_view(), name='student-clearance-by-student'),
     path('student-clearances/', views.StudentClearanceListView.as_view(), name='student-clearance-list'),
+    path('student-clearances/export/', views.StudentClearanceExportView.as_view(), name='student-clearance-export'),
+    path('student-clearances/<int:pk>/qr-code/', views.StudentClearanceQRCodeView.as_view(), name='student-clearance-qr-code'),
+    path('clearance-qr/verify/', views.VerifyClearanceQRCodeView.as_view(), name='verify-clearance-qr-code'),
     path("student-clearances/<int:pk>/update-status/", views.UpdateStudentClearanceStatus.as_view(), name="update-student-clearance-status"),
     path('students/count/', views.StudentCountView.as_view(), name='student-count'),
+    path('clearance-progress/', views.ClearanceProgressListView.as_view(), name='clearance-progress'),
 
     path('clearance-signatures/', views.ClearanceSignatureListView.as_view(), name='clearance-signatures'),
+    path('clearance-signatures/export/', views.ClearanceSignatureExportView.as_view(), name='clearance-signatures-export'),
     path('clearance-signatures/create/<int:student_id>/<int:program_id>/', views.ClearanceSignatureCreateView.as_view(), name='create-clearance-signature'),
     path(
     'clearance-signatures/status/<int:clearance_id>/<int:student_id>/<int:program_id>/',
@@ -34,16 +45,27 @@ urlpatterns = [
 ),
 
     path('clearance-signatures/<int:signature_id>/update-status/', views.UpdateClearanceSignatureStatusView.as_view()),
+    path('clearance-signatures/bulk-update-status/', views.BulkUpdateClearanceSignatureStatusView.as_view(), name='bulk-update-clearance-signature-status'),
     path('clearance-signatures/<str:program_name>/<str:last_name>/<str:year_level>/', views.ClearanceSignatureByParamsView.as_view(), name='clearance-signatures-by-params'),
 
     path("feedback/<int:program_id>/<int:user_id>/", views.LatestFeedbackView.as_view(), name="latest-feedback"),
 
+    path("notifications/broadcast/", views.BroadcastNotificationView.as_view(), name="broadcast-notification"),
+    path("notifications/<int:user_id>/stream/", views.NotificationStreamView.as_view(), name="user-notification-stream"),
     path("notifications/<int:user_id>/", views.UserNotificationsView.as_view(), name="user-notifications"),
 
     path("clearance-signatures/update/<int:id>/", views.UpdateClearanceSignatureView.as_view(), name="update-clearance-signature"),
 
     path("users/by-first-name/<str:first_name>/", views.UserByFirstNameView.as_view(), name="user-by-first-name"),
 
+    path('clubs/', views.ClubListView.as_view(), name='club-list'),
+    path('clubs/<slug:slug>/signatures/', views.ClubSignatureQueueView.as_view(), name='club-signature-queue'),
+    path(
+        'clubs/<slug:slug>/signatures/<int:signature_id>/update-status/',
+        views.UpdateClubSignatureStatusView.as_view(),
+        name='update-club-signature-status'
+    ),
+
     path('clearance/iron-club/', views.IronClubSignatureByParamsView.as_view(), name='iron-club-clearance'),
 
     path(
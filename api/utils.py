@@ -1,25 +1,111 @@
 # utils.py
-import qrcode
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
-from django.core.files import File
 
-def generate_qr_code(user, pension_status):
-    qr_data = f"Name: {user.first_name} {user.last_name}\n"
-    qr_data += f"Mobile: {user.profile.mobile_num}\n"
-    qr_data += f"Address: {user.profile.address}\n"
-    qr_data += f"Pension Status: {pension_status.status}\n"
-    qr_data += f"Date Submitted: {pension_status.date_submitted.strftime('%Y-%m-%d')}"
+import qrcode
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+QR_SALT = 'api.clearance-qr'
+QR_DIRECTORY = 'qrcodes'
+# Part of the cache key: bump it whenever render_qr_png's output changes.
+QR_RENDER_VERSION = 1
+# Below this many missing images a process pool costs more than it saves.
+QR_POOL_THRESHOLD = 32
+
+
+def clearance_token(student_clearance):
+    """
+    Signed, URL-safe token naming a StudentClearance and the status it had
+    when issued. It is deterministic, so an unchanged clearance always
+    yields the same token, and therefore the same QR image.
+    """
+    payload = {
+        'id': student_clearance.id,
+        'student': student_clearance.student_id,
+        'clearance': student_clearance.clearance_id,
+        'status': student_clearance.status,
+    }
+    return signing.Signer(salt=QR_SALT).sign_object(payload, compress=True)
 
+
+def read_clearance_token(token):
+    """Payload of a token from clearance_token(); raises signing.BadSignature."""
+    return signing.Signer(salt=QR_SALT).unsign_object(token)
+
+
+def render_qr_png(data):
+    # Module-level and free of Django state so process-pool workers can run it.
     qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=8,
         border=4,
     )
-    qr.add_data(qr_data)
+    qr.add_data(data)
     qr.make(fit=True)
 
-    img = qr.make_image(fill='black', back_color='white')
+    img = qr.make_image(fill_color='black', back_color='white')
     buffer = BytesIO()
     img.save(buffer, format="PNG")
-    return File(buffer, name=f"{user.username}_qr_code.png")
+    return buffer.getvalue()
+
+
+def qr_name(token):
+    digest = hashlib.sha256(f'{QR_RENDER_VERSION}:{token}'.encode()).hexdigest()
+    return f'{QR_DIRECTORY}/{digest[:2]}/{digest}.png'
+
+
+def generate_clearance_qr(student_clearance):
+    """Token and stored PNG name for one StudentClearance, rendering only on a cache miss."""
+    results, _ = generate_clearance_qrs([student_clearance])
+    return results[student_clearance.id]
+
+
+def generate_clearance_qrs(student_clearances, workers=None):
+    """
+    Render QR PNGs for many StudentClearance rows. Images are stored under
+    a hash of their token, so a clearance whose token is unchanged is never
+    re-rendered; the misses are spread over a process pool. Returns
+    ({student_clearance id: (token, name)}, number of images rendered).
+    """
+    results = {}
+    missing = {}
+    for student_clearance in student_clearances:
+        token = clearance_token(student_clearance)
+        name = qr_name(token)
+        results[student_clearance.id] = (token, name)
+        if name not in missing and not default_storage.exists(name):
+            missing[name] = token
+
+    if workers is None:
+        workers = getattr(settings, 'QR_RENDER_WORKERS', None) or os.cpu_count() or 1
+    names, tokens = list(missing), list(missing.values())
+    if workers > 1 and len(tokens) >= QR_POOL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            images = pool.map(render_qr_png, tokens, chunksize=max(1, len(tokens) // (workers * 4)))
+            for name, image in zip(names, images):
+                default_storage.save(name, ContentFile(image))
+    else:
+        for name, token in zip(names, tokens):
+            default_storage.save(name, ContentFile(render_qr_png(token)))
+    return results, len(missing)
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    make_password() for each password, spread over a process pool. Each
+    hash is deliberately slow CPU work, so this scales with cores where a
+    thread pool would not.
+    """
+    passwords = list(passwords)
+    if workers is None:
+        workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+    if workers <= 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
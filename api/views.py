@@ -1,14 +1,77 @@
 from rest_framework import generics, status
-from rest_framework.permissions import AllowAny
-from .models import Programs, Signature, Student, Clearance, StudentClearance, ClearanceSignature, Notification
-from .serializers import NotificationSerializer, FeedbackSerializer, ClearanceSignatureSerializer, ClearanceSignatureUpdateSerializer, StudentClearanceSerializer, ClearanceCreateSerializer, ProgramsSerializer, ClearanceSerializer, UserRegistrationSerializer, SignatureSerializer, UserSerializer, StudentSerializer
+from rest_framework.permissions import AllowAny, IsAdminUser
+from .models import CLEARANCE_STATUSES, Programs, Signature, Student, Clearance, StudentClearance, ClearanceSignature, ClearanceProgress, Notification, BackgroundJob, RevokedToken, Club
+from .serializers import DynamicFieldsMixin, ClubSerializer, RevokeTokenSerializer, BackgroundJobSerializer, BroadcastNotificationSerializer, ClearanceProgressSerializer, NotificationSerializer, FeedbackSerializer, ClearanceSignatureSerializer, ClearanceSignatureUpdateSerializer, StudentClearanceSerializer, ClearanceCreateSerializer, ProgramsSerializer, ClearanceSerializer, UserRegistrationSerializer, SignatureSerializer, UserSerializer, StudentSerializer
 from django.contrib.auth.models import User
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
-from rest_framework.parsers import MultiPartParser, FormParser
-from django.db.models import Q
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from django.conf import settings
+from django.db import transaction
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+import asyncio
+import json
 from itertools import chain
+from .jobs import start_import, start_job
+from .events import format_sse, get_broker, user_channel
+from .imports import IMPORT_FORMATS, parse_rows, validate_rows
+from .exports import CLEARANCE_SIGNATURE_COLUMNS, STUDENT_CLEARANCE_COLUMNS, OUTPUT_FORMATS, streaming_export
+from .search import like_filters, search_filters
+from .caches import clubs, get_club, get_current_clearance, get_current_clearance_siblings, get_staff_signature
+from .conditional import conditional_get, programs_etag, signature_etag, clearance_list_etag, clearance_etag, clearance_updated_at, latest_clearance_etag, latest_clearance_updated_at
+from .signals import StatusChange, clearance_signatures_changed
+from .images import schedule_receipt_processing
+from .utils import generate_clearance_qr, read_clearance_token
+from .pagination import KeysetPagination, CreatedAtKeysetPagination, DescendingIdKeysetPagination, StudentClearanceKeysetPagination
+
+
+def wants_sideload(request):
+    return request.query_params.get("sideload", "").lower() in ("1", "true", "yes")
+
+
+def dynamic_options(request, serializer_class):
+    # ?fields= / ?expand= for serializers that support sparse output; a
+    # sideloaded response defaults to collapsed (id-only) rows.
+    if not issubclass(serializer_class, DynamicFieldsMixin):
+        return {}
+    options = {}
+    for param in ("fields", "expand"):
+        if param in request.query_params:
+            options[param] = [part.strip() for part in request.query_params[param].split(",") if part.strip()]
+    if wants_sideload(request) and "expand" not in options:
+        options["expand"] = []
+    return options
+
+
+def list_response(request, queryset, serializer_class, pagination_class=KeysetPagination):
+    # Unpaginated unless the client opts in with ?cursor= or ?page_size=.
+    options = dynamic_options(request, serializer_class)
+    queryset = serializer_class.setup_eager_loading(queryset, **options)
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    instances = list(queryset) if page is None else page
+    data = serializer_class(instances, many=True, **options).data
+
+    included = None
+    if "expand" in options and wants_sideload(request):
+        included = serializer_class.get_sideloads(instances)
+
+    if page is not None:
+        response = paginator.get_paginated_response(data)
+        if included is not None:
+            response.data["included"] = included
+        return response
+    if included is not None:
+        return Response({"results": data, "included": included}, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_200_OK)
+
+
 class GetUserByIdView(APIView):
     permission_classes = [AllowAny]  # ✅ Works in class-based views like this
 
@@ -20,6 +83,7 @@ class GetUserByIdView(APIView):
         except User.DoesNotExist:
             return Response({'detail': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@conditional_get(etag_func=programs_etag)
 class ProgramsListAPIView(generics.ListAPIView):
     queryset = Programs.objects.all().order_by('created_at')
     serializer_class = ProgramsSerializer
@@ -39,18 +103,55 @@ class RegisterUserAPIView(generics.CreateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkStudentImportView(APIView):
+    """
+    Register many students at once. Send a CSV or JSON file as `file`
+    (with `input=csv|json` unless the extension says which), or a JSON
+    body of rows. Columns are those of the registration form. Rows are
+    validated here; the valid ones are registered by a background job,
+    whose result carries the per-row errors; poll jobs/<id>/.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        dry_run = str(request.query_params.get("dry_run", "")).lower() in ("1", "true", "yes")
+        try:
+            if upload is not None:
+                input_format = request.data.get("input") or upload.name.rsplit(".", 1)[-1].lower()
+                if input_format not in IMPORT_FORMATS:
+                    return Response({"error": f"input must be one of {', '.join(IMPORT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+                rows = parse_rows(upload.read(), input_format)
+            else:
+                rows = request.data if isinstance(request.data, list) else request.data.get("rows")
+                if not isinstance(rows, list):
+                    return Response({"error": "Send a file or a list of rows."}, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, UnicodeDecodeError) as exc:
+            return Response({"error": f"Could not parse the file: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        valid, errors = validate_rows(rows)
+        report = {"rows": len(rows), "valid": len(valid), "created": 0, "failed": len(errors), "errors": errors}
+        if dry_run or not valid:
+            return Response({**report, "dry_run": dry_run}, status=status.HTTP_200_OK)
+
+        job = start_import(valid, {'rows': len(rows), 'valid': len(valid)}, user=request.user, result=report)
+        return Response(BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
 class SignatureUploadView(generics.CreateAPIView):
     queryset = Signature.objects.all()
     serializer_class = SignatureSerializer
 
 
 
+@conditional_get(etag_func=signature_etag)
 class SignatureDetailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, staff_id):
         try:
-            signature = Signature.objects.get(staff_id=staff_id)
+            signature = get_staff_signature(staff_id)
             serializer = SignatureSerializer(signature)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Signature.DoesNotExist:
@@ -69,20 +170,26 @@ class StudentDetailByUserIdView(APIView):
 
 
 
+@conditional_get(etag_func=clearance_list_etag)
 class ClearanceListView(generics.ListAPIView):
     permission_classes = [AllowAny]
     queryset = Clearance.objects.all()
     serializer_class = ClearanceSerializer
+    pagination_class = CreatedAtKeysetPagination
 
+    def get(self, request, *args, **kwargs):
+        return list_response(request, self.get_queryset(), self.serializer_class, self.pagination_class)
 
+
+@conditional_get(etag_func=latest_clearance_etag, last_modified_func=latest_clearance_updated_at)
 class LatestClearanceView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
-        latest_clearance = Clearance.objects.order_by('-created_at').first()
+        latest_clearance = get_current_clearance()
         if not latest_clearance:
             return Response({'detail': 'No clearance found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = ClearanceSerializer(latest_clearance)
+        serializer = ClearanceSerializer(latest_clearance, **dynamic_options(request, ClearanceSerializer))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -99,13 +206,51 @@ class ClearanceCreateView(APIView):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class OpenClearanceForCohortView(APIView):
+    """
+    Pre-create StudentClearance and pending ClearanceSignature rows for
+    every eligible student, in the background. Optional filters:
+    year_level, major, department (course code).
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, id):
+        if not Clearance.objects.filter(id=id).exists():
+            return Response({'error': 'Clearance not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        params = {'clearance_id': id}
+        for name in ('year_level', 'major', 'department'):
+            if request.data.get(name):
+                params[name] = request.data[name]
+        if request.data.get('chunk_size'):
+            try:
+                params['chunk_size'] = max(1, int(request.data['chunk_size']))
+            except (TypeError, ValueError):
+                return Response({'error': 'chunk_size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = start_job('open_clearance', params, user=request.user)
+        return Response(BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class BackgroundJobDetailView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, id):
+        try:
+            job = BackgroundJob.objects.get(id=id)
+        except BackgroundJob.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(BackgroundJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+@conditional_get(etag_func=clearance_etag, last_modified_func=clearance_updated_at)
 class ClearanceDetailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, id):
         try:
             clearance = Clearance.objects.get(id=id)
-            serializer = ClearanceSerializer(clearance)
+            serializer = ClearanceSerializer(clearance, **dynamic_options(request, ClearanceSerializer))
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Clearance.DoesNotExist:
             return Response({'error': 'Clearance not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -121,12 +266,12 @@ class RequestLatestClearanceView(APIView):
         except User.DoesNotExist:
             return Response({"error": "Student not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        latest_clearance = Clearance.objects.order_by('-created_at').first()
+        latest_clearance = get_current_clearance()
 
         if not latest_clearance:
             return Response({"error": "No clearance available."}, status=status.HTTP_404_NOT_FOUND)
 
-        exists = StudentClearance.objects.filter(student=student, clearance=latest_clearance).exists()
+        exists = StudentClearance.objects.filter(student=student, clearance_id=latest_clearance.id).exists()
         if exists:
             return Response({"message": "Already requested."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -142,22 +287,24 @@ class StudentClearanceByStudentView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, student_id):
-        # Get the latest clearance based on created_at
-        latest_clearance = Clearance.objects.order_by('-created_at').first()
-        if not latest_clearance:
+        # Clearances sharing the latest clearance's academic year and semester
+        clearances = get_current_clearance_siblings()
+        if not clearances:
             return Response({'detail': 'No clearance records found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Filter student clearances matching latest clearance's academic year and semester
-        student_clearances = StudentClearance.objects.filter(
+        student_clearances = list(StudentClearance.objects.select_related('student').filter(
             student_id=student_id,
-            clearance__academic_year=latest_clearance.academic_year,
-            clearance__semester=latest_clearance.semester
-        )
+            clearance_id__in=clearances,
+        ))
 
-        if not student_clearances.exists():
+        if not student_clearances:
             return Response({'detail': 'No clearance records found for this student matching the latest clearance.'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = StudentClearanceSerializer(student_clearances, many=True)
+        # Reuse the cached clearances (programs included) instead of joining them again
+        for student_clearance in student_clearances:
+            student_clearance.clearance = clearances[student_clearance.clearance_id]
+
+        serializer = StudentClearanceSerializer(student_clearances, many=True, **dynamic_options(request, StudentClearanceSerializer))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -165,9 +312,101 @@ class StudentClearanceListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        student_clearances = StudentClearance.objects.select_related('student', 'clearance').order_by('-clearance__created_at')
-        serializer = StudentClearanceSerializer(student_clearances, many=True)
-        return Response(serializer.data)
+        student_clearances = StudentClearance.objects.select_related('student', 'clearance').order_by(
+            *StudentClearanceKeysetPagination.ordering
+        )
+        return list_response(request, student_clearances, StudentClearanceSerializer, StudentClearanceKeysetPagination)
+
+
+class StudentClearanceExportView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        output = request.query_params.get("output", "ndjson")
+        if output not in OUTPUT_FORMATS:
+            return Response({"error": "Invalid output format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The search index covers signatures only; these are the same
+        # icontains filters, on StudentClearance's student.
+        filters = like_filters(**search_terms(
+            last_name=request.query_params.get("last_name"),
+            year_level=request.query_params.get("year_level"),
+        ))
+        queryset = StudentClearance.objects.filter(filters)
+        return streaming_export(queryset, STUDENT_CLEARANCE_COLUMNS, output, "student-clearances")
+
+
+class ClearanceProgressListView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        params = request.query_params
+        progress = ClearanceProgress.objects.all()
+
+        if params.get("clearance_id"):
+            progress = progress.filter(clearance_id=params["clearance_id"])
+        if params.get("academic_year") or params.get("semester"):
+            # Resolve the term against the small Clearance table first so the
+            # summary lookup stays on the (clearance, completed) index.
+            clearances = Clearance.objects.all()
+            if params.get("academic_year"):
+                clearances = clearances.filter(academic_year=params["academic_year"])
+            if params.get("semester"):
+                clearances = clearances.filter(semester=params["semester"])
+            progress = progress.filter(clearance_id__in=list(clearances.values_list("id", flat=True)))
+        if params.get("completed") is not None:
+            progress = progress.filter(completed=params["completed"].lower() in ("1", "true", "yes"))
+        if params.get("student_id"):
+            progress = progress.filter(student_id=params["student_id"])
+
+        return list_response(request, progress, ClearanceProgressSerializer, DescendingIdKeysetPagination)
+
+
+class StudentClearanceQRCodeView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        try:
+            student_clearance = StudentClearance.objects.get(pk=pk)
+        except StudentClearance.DoesNotExist:
+            return Response({"error": "StudentClearance not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        token, name = generate_clearance_qr(student_clearance)
+        return Response({
+            "token": token,
+            "qr_code": request.build_absolute_uri(default_storage.url(name)),
+        }, status=status.HTTP_200_OK)
+
+
+class VerifyClearanceQRCodeView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # Signature check plus one indexed row lookup; no image work.
+        try:
+            payload = read_clearance_token(request.query_params.get("token", ""))
+        except signing.BadSignature:
+            return Response({"valid": False, "error": "Invalid token."}, status=status.HTTP_400_BAD_REQUEST)
+
+        student_clearance = (StudentClearance.objects
+                             .select_related("student", "clearance", "progress")
+                             .filter(id=payload["id"], student_id=payload["student"], clearance_id=payload["clearance"])
+                             .first())
+        if student_clearance is None:
+            return Response({"valid": False, "error": "Clearance no longer exists."}, status=status.HTTP_404_NOT_FOUND)
+
+        progress = getattr(student_clearance, "progress", None)
+        return Response({
+            "valid": True,
+            "student_clearance_id": student_clearance.id,
+            "student": f"{student_clearance.student.first_name} {student_clearance.student.last_name}".strip(),
+            "username": student_clearance.student.username,
+            "academic_year": student_clearance.clearance.academic_year,
+            "semester": student_clearance.clearance.semester,
+            "issued_status": payload["status"],
+            "status": student_clearance.status,
+            "completed": progress.completed if progress else None,
+        }, status=status.HTTP_200_OK)
 
 
 class UpdateStudentClearanceStatus(APIView):
@@ -216,15 +455,28 @@ class ClearanceSignatureCreateView(APIView):
 
         receipt = request.FILES.get("receipt")
 
-        clearance_signature = ClearanceSignature.objects.create(
-            student=student,
-            clearance=student_clearance,
-            programs=program,
-            signature=signature,
-            status=request.data.get("status", "Pending"),
-            feedback=request.data.get("feedback", ""),
-            receipt=receipt
-        )
+        # Fill in the row pre-created when the clearance was opened for the cohort, if any
+        clearance_signature = ClearanceSignature.objects.filter(clearance=student_clearance, programs=program).first()
+        if clearance_signature is None:
+            clearance_signature = ClearanceSignature.objects.create(
+                student=student,
+                clearance=student_clearance,
+                programs=program,
+                signature=signature,
+                status=request.data.get("status", "Pending"),
+                feedback=request.data.get("feedback", ""),
+                receipt=receipt
+            )
+        else:
+            clearance_signature.signature = signature
+            clearance_signature.status = request.data.get("status", "Pending")
+            clearance_signature.feedback = request.data.get("feedback", "")
+            if receipt is not None:
+                clearance_signature.receipt = receipt
+                clearance_signature.receipt_thumbnail = None
+            clearance_signature.save()
+        if receipt is not None:
+            schedule_receipt_processing(clearance_signature)
 
         serializer = ClearanceSignatureSerializer(clearance_signature)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -250,7 +502,7 @@ class GetClearanceSignatureView(APIView):
         if not signature:
             return Response({"message": "No signature yet"}, status=status.HTTP_200_OK)
 
-        serializer = ClearanceSignatureSerializer(signature)
+        serializer = ClearanceSignatureSerializer(signature, **dynamic_options(request, ClearanceSignatureSerializer))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -260,8 +512,24 @@ class ClearanceSignatureListView(APIView):
 
     def get(self, request):
         signatures = ClearanceSignature.objects.all()
-        serializer = ClearanceSignatureSerializer(signatures, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, signatures, ClearanceSignatureSerializer)
+
+
+class ClearanceSignatureExportView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        output = request.query_params.get("output", "ndjson")
+        if output not in OUTPUT_FORMATS:
+            return Response({"error": "Invalid output format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = clearance_signature_filters(
+            request.query_params.get("program_name"),
+            request.query_params.get("last_name"),
+            request.query_params.get("year_level"),
+        )
+        queryset = ClearanceSignature.objects.filter(filters)
+        return streaming_export(queryset, CLEARANCE_SIGNATURE_COLUMNS, output, "clearance-signatures")
 
 
 class UpdateClearanceSignatureStatusView(APIView):
@@ -284,12 +552,12 @@ class UpdateClearanceSignatureStatusView(APIView):
             if not staff_id:
                 return Response({"error": "staffId is required when approving."}, status=status.HTTP_400_BAD_REQUEST)
             try:
-                staff_signature = Signature.objects.get(staff__id=staff_id)
+                staff_signature = get_staff_signature(staff_id)
             except Signature.DoesNotExist:
                 return Response({"error": "Staff signature not found."}, status=status.HTTP_404_NOT_FOUND)
 
             # Check if signature has changed
-            if clearance_signature.signature != staff_signature:
+            if clearance_signature.signature_id != staff_signature.id:
                 clearance_signature.signature = staff_signature
 
         if new_status == "Rejected" and feedback:  # ✅ save reason
@@ -302,13 +570,99 @@ class UpdateClearanceSignatureStatusView(APIView):
             "message": "ClearanceSignature updated successfully.",
             "status": clearance_signature.status,
             "feedback": clearance_signature.feedback,  # ✅ return reason too
-            "signature_id": clearance_signature.signature.id if clearance_signature.signature else None
+            "signature_id": clearance_signature.signature_id
         }, status=status.HTTP_200_OK)
 
         return Response({
             "message": "ClearanceSignature updated successfully.",
             "status": clearance_signature.status,
-            "signature_id": clearance_signature.signature.id if clearance_signature.signature else None
+            "signature_id": clearance_signature.signature_id
+        }, status=status.HTTP_200_OK)
+
+
+class BulkUpdateClearanceSignatureStatusView(APIView):
+    permission_classes = [AllowAny]
+    max_items = 1000
+
+    def post(self, request):
+        new_status = request.data.get("status")
+        staff_id = request.data.get("staffId")
+        items = request.data.get("items")
+        if items is None:
+            items = [{"id": signature_id} for signature_id in request.data.get("ids") or []]
+
+        if new_status not in CLEARANCE_STATUSES:
+            return Response({"error": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items, list) or not items:
+            return Response({"error": "ids or items is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({"error": f"At most {self.max_items} items per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        staff_signature = None
+        if new_status == "Approved":
+            if not staff_id:
+                return Response({"error": "staffId is required when approving."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                staff_signature = get_staff_signature(staff_id)
+            except Signature.DoesNotExist:
+                return Response({"error": "Staff signature not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        feedback_by_id = {}
+        for item in items:
+            try:
+                feedback_by_id[int(item["id"])] = item.get("feedback")
+            except (TypeError, KeyError, ValueError):
+                return Response({"error": "Every item needs a numeric id."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        with transaction.atomic():
+            signatures = (ClearanceSignature.objects
+                          .select_for_update()
+                          .only("id", "student_id", "clearance_id", "status", "signature_id", "feedback")
+                          .in_bulk(list(feedback_by_id)))
+            changed, fields, status_changes = [], set(), []
+            for signature_id, feedback in feedback_by_id.items():
+                clearance_signature = signatures.get(signature_id)
+                if clearance_signature is None:
+                    results.append({"id": signature_id, "error": "ClearanceSignature not found."})
+                    continue
+
+                dirty = set()
+                if staff_signature is not None and clearance_signature.signature_id != staff_signature.id:
+                    clearance_signature.signature_id = staff_signature.id
+                    dirty.add("signature")
+                if new_status == "Rejected" and feedback and clearance_signature.feedback != feedback:
+                    clearance_signature.feedback = feedback
+                    dirty.add("feedback")
+                if clearance_signature.status != new_status:
+                    status_changes.append(StatusChange(
+                        clearance_signature.id, clearance_signature.student_id,
+                        clearance_signature.clearance_id, clearance_signature.status, new_status,
+                    ))
+                    clearance_signature.status = new_status
+                    dirty.add("status")
+
+                if dirty:
+                    changed.append(clearance_signature)
+                    fields |= dirty
+                results.append({
+                    "id": signature_id,
+                    "updated": bool(dirty),
+                    "status": clearance_signature.status,
+                    "feedback": clearance_signature.feedback,
+                    "signature_id": clearance_signature.signature_id,
+                })
+
+            if changed:
+                ClearanceSignature.objects.bulk_update(changed, sorted(fields), batch_size=500)
+            if status_changes:
+                # bulk_update skips post_save, so announce the transitions ourselves.
+                clearance_signatures_changed.send(sender=ClearanceSignature, changes=status_changes)
+
+        return Response({
+            "message": "ClearanceSignatures updated successfully.",
+            "updated": len(changed),
+            "results": results,
         }, status=status.HTTP_200_OK)
 
 
@@ -320,55 +674,59 @@ class StudentCountView(APIView):
         return Response({'student_count': student_count})
 
 
+def search_terms(**terms):
+    # 'none' is the frontend's placeholder for an empty path segment.
+    return {name: value for name, value in terms.items() if value and value != 'none'}
+
+
+def clearance_signature_filters(program_name, last_name, year_level):
+    return search_filters(**search_terms(program_name=program_name, last_name=last_name, year_level=year_level))
+
+
 class ClearanceSignatureByParamsView(APIView):
     permission_classes = [AllowAny]  # Optional: Require auth
     def get(self, request, program_name, last_name, year_level):
-        filters = Q()
+        filters = clearance_signature_filters(program_name, last_name, year_level)
+        queryset = ClearanceSignature.objects.filter(filters)
+        return list_response(request, queryset, ClearanceSignatureSerializer)
 
-        if program_name != 'none':
-            filters &= Q(programs__program_name__icontains=program_name)
-        if last_name != 'none':
-            filters &= Q(student__last_name__icontains=last_name)
-        if year_level != 'none':
-            filters &= Q(student__student_profile__year_level__icontains=year_level)
+def club_signatures(club):
+    # Equality joins on indexed columns: the club's program and the
+    # students' department codes.
+    if club.program_id is None:
+        return ClearanceSignature.objects.none()
+    return ClearanceSignature.objects.filter(
+        programs_id=club.program_id, student__student_profile__department__in=club.department_codes,
+    )
 
-        queryset = ClearanceSignature.objects.filter(filters)
-        serializer = ClearanceSignatureSerializer(queryset, many=True)
-        return Response(serializer.data)
 
-class IronClubSignatureByParamsView(APIView):
+class ClubListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        program_name = "Club Treasurer"  # NO Iron Club
-
-        # Always filter BIT students
-        filters = Q(programs__program_name__icontains=program_name) & \
-                  Q(student__last_name__icontains="BIT")
-
-        queryset = ClearanceSignature.objects.filter(filters)
-        serializer = ClearanceSignatureSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return Response(ClubSerializer(clubs.get().values(), many=True).data, status=status.HTTP_200_OK)
 
 
-class FuelClubSignatureByParamsView(APIView):
+class ClubSignatureQueueView(APIView):
+    """The signatures a club's treasurer signs: its program, for students of its departments."""
     permission_classes = [AllowAny]
 
-    def get(self, request):
-        program_name = "Club Treasurer"
-
-        filters = [
-            Q(programs__program_name__icontains=program_name) & Q(student__last_name__icontains=ln)
-            for ln in ["BTVTED-FSM", "BTLED-AP", "BTLED-HE"]
-        ]
-
-        queryset = ClearanceSignature.objects.filter(filters[0] | filters[1] | filters[2])
-        serializer = ClearanceSignatureSerializer(queryset, many=True)
-        return Response(serializer.data)
+    def get(self, request, slug):
+        try:
+            club = get_club(slug)
+        except Club.DoesNotExist:
+            return Response({"error": "Club not found."}, status=status.HTTP_404_NOT_FOUND)
+        return list_response(request, club_signatures(club), ClearanceSignatureSerializer)
 
 
+class IronClubSignatureByParamsView(ClubSignatureQueueView):
+    def get(self, request):
+        return super().get(request, "iron-club")
 
 
+class FuelClubSignatureByParamsView(ClubSignatureQueueView):
+    def get(self, request):
+        return super().get(request, "fuel-club")
 
 
 class LatestFeedbackView(APIView):
@@ -399,8 +757,7 @@ class UserNotificationsView(APIView):
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
         notifications = Notification.objects.filter(user=user).order_by("-created_at")
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, notifications, NotificationSerializer, CreatedAtKeysetPagination)
 
     def post(self, request, user_id):
         try:
@@ -417,6 +774,95 @@ class UserNotificationsView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class NotificationStreamView(View):
+    """
+    Server-Sent Events for one user: `notification` events for new
+    Notification rows and `clearance_signature` events for status changes.
+    Replays notifications newer than Last-Event-ID (or ?since=) first, so a
+    reconnecting EventSource misses nothing. Serve it under ASGI
+    (backend.asgi) with settings.NOTIFICATION_STREAM on; each stream ends
+    after `max_duration` seconds and the browser reconnects.
+    """
+    heartbeat = 15
+    max_duration = 300
+    replay_limit = 100
+
+    async def get(self, request, user_id):
+        if not settings.NOTIFICATION_STREAM:
+            return JsonResponse({"error": "Notification stream is disabled."}, status=404)
+        if not await User.objects.filter(id=user_id).aexists():
+            return JsonResponse({"error": "User not found"}, status=404)
+        last_id = request.headers.get("Last-Event-ID") or request.GET.get("since")
+        try:
+            last_id = int(last_id) if last_id is not None else None
+        except ValueError:
+            last_id = None
+
+        # Subscribe before reading the backlog so nothing falls in between.
+        subscription = await get_broker().asubscribe(user_channel(user_id))
+        backlog = []
+        if last_id is not None:
+            backlog = [n async for n in Notification.objects.filter(user_id=user_id, id__gt=last_id).order_by("id")[:self.replay_limit]]
+
+        response = StreamingHttpResponse(self.stream(subscription, backlog), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, subscription, backlog):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_duration
+        replayed = 0
+        try:
+            yield "retry: 3000\n\n"
+            for data in NotificationSerializer(backlog, many=True).data:
+                replayed = data["id"]
+                yield format_sse("notification", json.dumps(data, cls=DjangoJSONEncoder), data["id"])
+            while loop.time() < deadline:
+                event = await subscription.get(min(self.heartbeat, max(0, deadline - loop.time())))
+                if event is None:
+                    yield ": keep-alive\n\n"
+                elif event["type"] != "notification" or event["id"] > replayed:
+                    yield format_sse(event["type"], json.dumps(event["data"], cls=DjangoJSONEncoder), event.get("id"))
+        finally:
+            subscription.close()
+
+
+class BroadcastNotificationView(APIView):
+    """
+    Send one notification to every student matching the filters (see
+    BroadcastNotificationSerializer). Rows are written by a background
+    job; poll jobs/<id>/ for progress.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = BroadcastNotificationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        job = start_job('broadcast_notification', serializer.validated_data, user=request.user)
+        return Response(BackgroundJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class RevokeTokenView(APIView):
+    """
+    Cut off a token (`token`) or every token a user was issued so far
+    (`user`), e.g. a compromised or graduated account. Enforced by every
+    worker within one cache version check; see api.caches.token_denylist.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = RevokeTokenSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            # Rows past expires_at only cover tokens that no longer validate.
+            RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+            serializer.save(created_by_id=request.user.id)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
 class UpdateClearanceSignatureView(generics.UpdateAPIView):
     permission_classes = [AllowAny]
     queryset = ClearanceSignature.objects.all()
@@ -438,17 +884,18 @@ class UserByFirstNameView(APIView):
 
 
 
-class UpdateIronClubSignatureStatusView(APIView):
+class UpdateClubSignatureStatusView(APIView):
     permission_classes = [AllowAny]
 
-    def patch(self, request, signature_id):
+    def patch(self, request, slug, signature_id):
         try:
-            clearance_signature = ClearanceSignature.objects.get(
-                id=signature_id,
-                programs__program_name__icontains="Club Treasurer"
-            )
+            club = get_club(slug)
+        except Club.DoesNotExist:
+            return Response({"error": "Club not found."}, status=404)
+        try:
+            clearance_signature = club_signatures(club).get(id=signature_id)
         except ClearanceSignature.DoesNotExist:
-            return Response({"error": "Iron Club ClearanceSignature not found."}, status=404)
+            return Response({"error": f"{club.name} ClearanceSignature not found."}, status=404)
 
         new_status = request.data.get("status")
         staff_id = request.data.get("staffId")
@@ -461,7 +908,7 @@ class UpdateIronClubSignatureStatusView(APIView):
             if not staff_id:
                 return Response({"error": "staffId is required when approving."}, status=400)
             try:
-                staff_signature = Signature.objects.get(staff__id=staff_id)
+                staff_signature = get_staff_signature(staff_id)
                 clearance_signature.signature = staff_signature
             except Signature.DoesNotExist:
                 return Response({"error": "Staff signature not found."}, status=404)
@@ -473,55 +920,21 @@ class UpdateIronClubSignatureStatusView(APIView):
         clearance_signature.save()
 
         return Response({
-            "message": "Iron Club ClearanceSignature updated successfully.",
+            "message": f"{club.name} ClearanceSignature updated successfully.",
             "status": clearance_signature.status,
             "feedback": clearance_signature.feedback,
-            "signature_id": clearance_signature.signature.id if clearance_signature.signature else None
+            "signature_id": clearance_signature.signature_id
         }, status=200)
 
 
-
-class UpdateFuelClubSignatureStatusView(APIView):
-    permission_classes = [AllowAny]
-
+class UpdateIronClubSignatureStatusView(UpdateClubSignatureStatusView):
     def patch(self, request, signature_id):
-        try:
-            clearance_signature = ClearanceSignature.objects.get(
-                id=signature_id,
-                programs__program_name__icontains="Club Treasurer"
-            )
-        except ClearanceSignature.DoesNotExist:
-            return Response({"error": "Fuel Club ClearanceSignature not found."}, status=404)
-
-        new_status = request.data.get("status")
-        staff_id = request.data.get("staffId")
-        feedback = request.data.get("feedback")
-
-        if new_status not in ["Approved", "Pending", "Rejected"]:
-            return Response({"error": "Invalid status."}, status=400)
-
-        if new_status == "Approved":
-            if not staff_id:
-                return Response({"error": "staffId is required when approving."}, status=400)
-            try:
-                staff_signature = Signature.objects.get(staff__id=staff_id)
-                clearance_signature.signature = staff_signature
-            except Signature.DoesNotExist:
-                return Response({"error": "Staff signature not found."}, status=404)
-
-        if new_status == "Rejected" and feedback:
-            clearance_signature.feedback = feedback
+        return super().patch(request, "iron-club", signature_id)
 
-        clearance_signature.status = new_status
-        clearance_signature.save()
-
-        return Response({
-            "message": "Fuel Club ClearanceSignature updated successfully.",
-            "status": clearance_signature.status,
-            "feedback": clearance_signature.feedback,
-            "signature_id": clearance_signature.signature.id if clearance_signature.signature else None
-        }, status=200)
 
+class UpdateFuelClubSignatureStatusView(UpdateClubSignatureStatusView):
+    def patch(self, request, signature_id):
+        return super().patch(request, "fuel-club", signature_id)
 
 
 class ClearanceDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
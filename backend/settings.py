@@ -28,9 +28,15 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['*']
 
+# With JWT_STATELESS_AUTH=1 request.user is built from the token's claims
+# instead of a User query per request (api/authentication.py), so is_active,
+# is_staff and is_superuser are those at login until the token is revoked.
+JWT_STATELESS_AUTH = os.environ.get('JWT_STATELESS_AUTH', '0') == '1'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication' if JWT_STATELESS_AUTH
+        else 'api.authentication.DenylistJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -40,6 +46,9 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=50),
+    'TOKEN_OBTAIN_SERIALIZER': 'api.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.serializers.DenylistTokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'api.authentication.ClaimsUser',
 }
 
 
@@ -58,6 +67,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.routers.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,10 +103,72 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite tuned for several workers writing at once. WAL lets readers run
+# alongside the single writer; IMMEDIATE transactions take the write lock
+# at BEGIN, so two atomic() blocks that read then write queue up on the
+# busy timeout instead of failing with "database is locked". Every value
+# can be overridden from the environment (see api/bench.py for the
+# write-contention benchmark).
+SQLITE_PATH = os.environ.get('SQLITE_PATH', '')
+# Unlike the other pragmas, journal_mode is written into the database file,
+# so by default it is only switched for a database named by SQLITE_PATH,
+# never for the db.sqlite3 checked into the repository.
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL' if SQLITE_PATH else '')
+SQLITE_PRAGMAS = {
+    **({'journal_mode': SQLITE_JOURNAL_MODE} if SQLITE_JOURNAL_MODE else {}),
+    # NORMAL is durable in WAL mode except for the last commits on power loss.
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    # Negative means KiB, per connection.
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -20000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SQLITE_PATH or BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds a connection waits for the write lock (busy_timeout).
+            'timeout': float(os.environ.get('SQLITE_TIMEOUT', 20)),
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+        # 0 closes the connection after each request, which ASGI (the
+        # notification stream, backend/asgi.py) requires. Under WSGI only,
+        # set DB_CONN_MAX_AGE (e.g. 600) to reuse connections instead of
+        # reopening them and re-running the pragmas on every request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Read replicas: comma-separated SQLite files refreshed from the primary by
+# `manage.py sync_replicas`. api.routers sends reads to them, except for a
+# client's reads within READ_REPLICA_STICKY_SECONDS of their last write.
+READ_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get('SQLITE_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            'init_command': DATABASES['default']['OPTIONS']['init_command'] + ';PRAGMA query_only=1',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+READ_REPLICA_STICKY_SECONDS = int(os.environ.get('READ_REPLICA_STICKY_SECONDS', 5))
+
+# Point every worker at the same backend (e.g. Redis or a file-based cache)
+# in production; the default local-memory cache is private to each process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -140,6 +213,38 @@ STATIC_ROOT = BASE_DIR / "static"
 STATICFILES_DIR = (os.path.join(BASE_DIR, 'static'))
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Seconds after a content-addressed file is saved during which releasing it
+# leaves it on disk (a row about to refer to it may not have committed);
+# `manage.py media_gc` collects it later if it stays unreferenced.
+MEDIA_RELEASE_GRACE_SECONDS = int(os.environ.get('MEDIA_RELEASE_GRACE_SECONDS', 120))
+
+# Worker threads for off-request jobs such as receipt image processing (api/tasks.py).
+BACKGROUND_TASK_WORKERS = int(os.environ.get('BACKGROUND_TASK_WORKERS', 2))
+BACKGROUND_TASKS_EAGER = os.environ.get('BACKGROUND_TASKS_EAGER', '') == '1'
+# Seconds a chunked job (api/jobs.py) sleeps between chunks to spread its writes.
+BACKGROUND_JOB_PAUSE = float(os.environ.get('BACKGROUND_JOB_PAUSE', 0.05))
+
+# Processes for batch QR rendering (api/utils.py); 0 means one per CPU.
+QR_RENDER_WORKERS = int(os.environ.get('QR_RENDER_WORKERS', 0))
+
+# Processes for password hashing during bulk student import (api/imports.py); 0 means one per CPU.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+
+# Server-Sent Events at notifications/<id>/stream/, served under ASGI
+# (uvicorn backend.asgi:application). Off by default: the stream needs an
+# EVENT_BROKER that reaches it from the WSGI workers, i.e. CacheBroker over
+# a Redis or Memcached CACHE_BACKEND they all share; the api.E001 check
+# enforces that. The in-memory broker only suits a single ASGI process
+# serving everything.
+NOTIFICATION_STREAM = os.environ.get('NOTIFICATION_STREAM', '0') == '1'
+EVENT_BROKER = os.environ.get('EVENT_BROKER', 'api.events.CacheBroker')
+
+# Per-route request metrics, scraped from /api/metrics/ (api/metrics.py). Set
+# METRICS_DIR to a directory all workers can write to so the scrape sums
+# every process; METRICS_TOKEN, if set, must be sent as a Bearer token.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field